@@ -0,0 +1,465 @@
+import csv
+import math
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import RedesBa
+
+# ==========================================
+# Lectura de datos por bloques
+# ==========================================
+
+def _codificar_bloque(rc, columnas, datos):
+    """
+    Convierte un bloque (lista de columnas) en un arreglo (n, V) de códigos
+    en el orden de rc.variables; -1 = dato faltante.
+    """
+    n = len(datos[0]) if datos else 0
+    codigos = np.full((n, len(rc.variables)), -1, dtype=np.int64)
+    for var, columna in zip(columnas, datos):
+        if var not in rc.indice:
+            continue
+        columna_codificada = RedesBa._codificar_columna(rc, var, columna)
+        if (columna_codificada == -2).any():
+            malo = np.asarray(columna)[columna_codificada == -2][0]
+            raise ValueError(f"Valor {malo!r} fuera del dominio de {var}")
+        codigos[:, rc.indice[var]] = columna_codificada
+    return codigos
+
+def _bloques_csv(ruta, tam_bloque):
+    """
+    Lee un CSV con encabezado (nombres de variables) y valores como texto;
+    las celdas vacías son datos faltantes.
+    """
+    with open(ruta, newline='', encoding='utf-8') as f:
+        lector = csv.reader(f)
+        columnas = next(lector)
+        filas = []
+        for fila in lector:
+            filas.append([v if v != '' else None for v in fila])
+            if len(filas) == tam_bloque:
+                yield columnas, [np.array(c, dtype=object) for c in zip(*filas)]
+                filas = []
+        if filas:
+            yield columnas, [np.array(c, dtype=object) for c in zip(*filas)]
+
+def bloques_datos(datos, red, columnas=None, tam_bloque=1000000):
+    """
+    Recorre un conjunto de datos por bloques de a lo sumo tam_bloque filas y
+    devuelve cada bloque como arreglo (n, V) de códigos en el orden de
+    red['variables'] (-1 = faltante). `datos` puede ser:
+      - la ruta de un CSV con encabezado (valores como texto)
+      - la ruta de un .npy (se abre con mmap, sin cargarlo entero)
+      - un arreglo 2D (códigos enteros o valores) con `columnas`
+      - un iterable de arreglos 2D (bloques) con `columnas`
+    Sin `columnas`, los arreglos se interpretan en el orden de red['variables'].
+    """
+    rc = RedesBa.compilar_red(red)
+    if isinstance(datos, str) and datos.lower().endswith('.csv'):
+        for nombres, bloque in _bloques_csv(datos, tam_bloque):
+            yield _codificar_bloque(rc, nombres, bloque)
+        return
+
+    if isinstance(datos, str):
+        datos = np.load(datos, mmap_mode='r')
+    columnas = list(rc.variables) if columnas is None else list(columnas)
+    fuentes = [datos] if isinstance(datos, np.ndarray) else datos
+    for fuente in fuentes:
+        fuente = np.asarray(fuente) if not isinstance(fuente, np.ndarray) else fuente
+        for inicio in range(0, len(fuente), tam_bloque):
+            bloque = np.asarray(fuente[inicio:inicio + tam_bloque])
+            yield _codificar_bloque(rc, columnas, [bloque[:, k] for k in range(len(columnas))])
+
+# ==========================================
+# Conteos y estimación de parámetros
+# ==========================================
+
+def contar_familia(codigos, i, padres, cardinalidades, pesos=None):
+    """
+    Conteos N(padres, x_i) de un bloque de códigos con np.bincount sobre el
+    índice de base mixta de cada combinación de padres.
+    Las filas con algún dato faltante en la familia se ignoran.
+    pesos: peso de cada fila (por defecto 1)
+    Devuelve un arreglo (combinaciones de padres, valores de i).
+    """
+    familia = list(padres) + [i]
+    cards = [int(cardinalidades[j]) for j in familia]
+    columnas = codigos[:, familia]
+    completas = (columnas >= 0).all(axis=1)
+    if not completas.all():
+        columnas = columnas[completas]
+        if pesos is not None:
+            pesos = np.asarray(pesos, dtype=float)[completas]
+    pasos = np.cumprod([1] + cards[:0:-1])[::-1]
+    indice = columnas @ pasos
+    return np.bincount(indice, weights=pesos, minlength=int(np.prod(cards))).reshape(-1, cards[-1]).astype(float)
+
+def contar_red(red, datos, columnas=None, tam_bloque=1000000):
+    """
+    Conteos de todas las familias de la red, acumulados bloque a bloque.
+    Devuelve una lista de arreglos en el orden de red['variables'].
+    """
+    rc = RedesBa.compilar_red(red)
+    conteos = [np.zeros((int(np.prod(rc.cardinalidades[p])), int(c))) for p, c in zip(rc.padres_idx, rc.cardinalidades)]
+    for codigos in bloques_datos(datos, red, columnas, tam_bloque):
+        for i in range(len(rc.variables)):
+            conteos[i] += contar_familia(codigos, i, rc.padres_idx[i], rc.cardinalidades)
+    return conteos
+
+def estimar_tablas(conteos, metodo='mle', alfa=1.0):
+    """
+    Convierte conteos (combinaciones de padres, valores) en probabilidades.
+    metodo: 'mle' (máxima verosimilitud; filas sin datos quedan uniformes),
+            'dirichlet' (se suma `alfa` a cada celda) o
+            'bdeu' (`alfa` es el tamaño de muestra equivalente, repartido
+            como alfa / (filas * valores) por celda)
+    """
+    if metodo not in ('mle', 'dirichlet', 'bdeu'):
+        raise ValueError(f"Método desconocido: {metodo}. Opciones: ['mle', 'dirichlet', 'bdeu']")
+    tablas = []
+    for c in conteos:
+        if metodo == 'dirichlet':
+            c = c + alfa
+        elif metodo == 'bdeu':
+            c = c + alfa / c.size
+        totales = c.sum(axis=1, keepdims=True)
+        uniforme = np.full_like(c, 1.0 / c.shape[1])
+        tablas.append(np.divide(c, totales, out=uniforme, where=totales > 0))
+    return tablas
+
+def ajustar_parametros(red, datos, metodo='mle', alfa=1.0, columnas=None, tam_bloque=1000000):
+    """
+    Ajusta todas las TDP de la red (con su estructura actual) a partir de datos.
+    Ver bloques_datos para los formatos aceptados y estimar_tablas para los
+    métodos. Los datos se leen por bloques, por lo que no se cargan enteros.
+    Modifica la red con establecer_tabla y la devuelve.
+    """
+    conteos = contar_red(red, datos, columnas, tam_bloque)
+    for var, tabla in zip(list(red['variables']), estimar_tablas(conteos, metodo, alfa)):
+        forma = [len(red['valores'][v]) for v in red['padres'][var] + [var]]
+        RedesBa.establecer_tabla(red, var, tabla.reshape(forma))
+    return red
+
+
+# ==========================================
+# Expectation-Maximization con datos faltantes
+# ==========================================
+
+def patrones_datos(datos, red, columnas=None, tam_bloque=1000000):
+    """
+    Agrupa las filas por patrón de evidencia (códigos con -1 = faltante).
+    Devuelve (patrones, repeticiones): un arreglo (P, V) con los patrones
+    distintos y cuántas filas tiene cada uno.
+    """
+    patrones = np.zeros((0, len(red['variables'])), dtype=np.int64)
+    repeticiones = np.zeros(0)
+    for codigos in bloques_datos(datos, red, columnas, tam_bloque):
+        unicos, cuantos = np.unique(codigos, axis=0, return_counts=True)
+        todos = np.concatenate([patrones, unicos])
+        patrones, inversa = np.unique(todos, axis=0, return_inverse=True)
+        repeticiones = np.bincount(inversa.reshape(-1), weights=np.concatenate([repeticiones, cuantos]),
+                                   minlength=len(patrones))
+    return patrones, repeticiones
+
+def _paso_e(rc, patrones, repeticiones, orden):
+    """
+    Paso E sobre un grupo de patrones: conteos esperados de cada familia y
+    log-verosimilitud de los patrones. Se ejecuta en un proceso del pool.
+    Las familias completamente observadas en un patrón se cuentan directamente;
+    el resto se infiere por lotes con RedesBa.conjunta_lote.
+    Devuelve (conteos, log_verosimilitud, filas con evidencia imposible).
+    """
+    columnas = list(rc.variables)
+    prob_e = RedesBa.conjunta_lote([], patrones, rc, columnas, orden)
+    posibles = prob_e > 0
+    imposibles = float(repeticiones[~posibles].sum())
+    patrones, repeticiones, prob_e = patrones[posibles], repeticiones[posibles], prob_e[posibles]
+    log_verosimilitud = float(repeticiones @ np.log(prob_e))
+
+    conteos = []
+    for i in range(len(columnas)):
+        padres = rc.padres_idx[i]
+        familia = list(padres) + [i]
+        c = contar_familia(patrones, i, padres, rc.cardinalidades, repeticiones)
+        incompletas = (patrones[:, familia] < 0).any(axis=1)
+        if incompletas.any():
+            vars_familia = [columnas[j] for j in familia]
+            conjunta = RedesBa.conjunta_lote(vars_familia, patrones[incompletas], rc, columnas, orden)
+            pesos = repeticiones[incompletas] / prob_e[incompletas]
+            c += np.tensordot(pesos, conjunta, axes=1).reshape(c.shape)
+        conteos.append(c)
+    return conteos, log_verosimilitud, imposibles
+
+def algoritmo_em(red, datos, metodo='mle', alfa=1.0, max_iteraciones=100, tolerancia=1e-6,
+                 columnas=None, tam_bloque=1000000, procesos=1, orden='min_fill'):
+    """
+    Ajusta las TDP de la red con Expectation-Maximization cuando los datos
+    tienen valores faltantes (-1, None, NaN o celda vacía; ver bloques_datos).
+    Parte de las TDP actuales de la red. Las filas se agrupan por patrón de
+    evidencia, de modo que cada patrón distinto se infiere una sola vez por
+    iteración. Por defecto el paso E corre en el proceso actual; con
+    `procesos` > 1 (o None = núcleos disponibles) los patrones se reparten
+    entre un ProcessPoolExecutor, lo que solo compensa con muchos patrones.
+    metodo y alfa: estimador del paso M (ver estimar_tablas)
+    Se detiene cuando la log-verosimilitud mejora menos que `tolerancia`
+    (relativa). Las filas imposibles bajo las TDP actuales se descartan.
+    Modifica la red y devuelve un diccionario con 'red', 'log_verosimilitud'
+    (por iteración), 'iteraciones', 'convergio' y 'filas_descartadas'.
+    """
+    patrones, repeticiones = patrones_datos(datos, red, columnas, tam_bloque)
+    rc = RedesBa.compilar_red(red)
+    trabajadores = max(1, min(procesos or os.cpu_count() or 1, len(patrones)))
+    grupos = [g for g in np.array_split(np.arange(len(patrones)), trabajadores) if len(g)]
+
+    historial = []
+    convergio = False
+    descartadas = 0.0
+    pool = ProcessPoolExecutor(max_workers=trabajadores) if trabajadores > 1 else None
+    try:
+        for _ in range(max_iteraciones):
+            argumentos = [(rc, patrones[g], repeticiones[g], orden) for g in grupos]
+            if pool is None:
+                resultados = [_paso_e(*a) for a in argumentos]
+            else:
+                resultados = list(pool.map(_paso_e, *zip(*argumentos)))
+
+            conteos = [sum(partes) for partes in zip(*[r[0] for r in resultados])]
+            historial.append(sum(r[1] for r in resultados))
+            descartadas = sum(r[2] for r in resultados)
+            tablas = estimar_tablas(conteos, metodo, alfa)
+            rc = RedesBa.RedCompilada(rc.variables, rc.valores, rc.padres, tablas)
+
+            if len(historial) > 1 and abs(historial[-1] - historial[-2]) <= tolerancia * abs(historial[-2]):
+                convergio = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    for var in rc.variables:
+        RedesBa.establecer_tabla(red, var, rc.tabla(var))
+    return {'red': red, 'log_verosimilitud': historial, 'iteraciones': len(historial),
+            'convergio': convergio, 'filas_descartadas': descartadas}
+
+
+# ==========================================
+# Aprendizaje de estructura (ascenso de colina)
+# ==========================================
+
+PUNTAJES = ('bic', 'bdeu')
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+
+class _Puntuador:
+    """
+    Puntaje de una familia (i, padres) a partir de los patrones de datos
+    agrupados; las filas con faltantes en la familia se ignoran.
+    """
+    def __init__(self, patrones, repeticiones, cardinalidades, puntaje, ess):
+        self.patrones = np.asfortranarray(patrones)
+        self.repeticiones = repeticiones
+        self.cardinalidades = cardinalidades
+        self.puntaje = puntaje
+        self.ess = ess
+
+    def __call__(self, clave):
+        i, padres = clave
+        c = contar_familia(self.patrones, i, padres, self.cardinalidades, self.repeticiones)
+        q, r = c.shape
+        totales = c.sum(axis=1)
+        if self.puntaje == 'bic':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_verosimilitud = np.nansum(c * np.log(c / totales[:, None]))
+            n = totales.sum()
+            return float(log_verosimilitud - 0.5 * math.log(max(n, 1.0)) * q * (r - 1))
+        a_j = self.ess / q
+        a_jk = self.ess / (q * r)
+        return float((_lgamma(a_j) - _lgamma(a_j + totales)).astype(float).sum()
+                     + (_lgamma(a_jk + c) - _lgamma(a_jk)).astype(float).sum())
+
+_PUNTUADOR = None
+
+def _iniciar_puntuador(puntuador):
+    global _PUNTUADOR
+    _PUNTUADOR = puntuador
+
+def _puntuar(clave):
+    return _PUNTUADOR(clave)
+
+def _alcanzable(hijos, origen, destino):
+    """
+    Indica si hay un camino dirigido origen -> ... -> destino.
+    """
+    pila, vistos = [origen], {origen}
+    while pila:
+        n = pila.pop()
+        if n == destino:
+            return True
+        for h in hijos[n]:
+            if h not in vistos:
+                vistos.add(h)
+                pila.append(h)
+    return False
+
+def _movimientos(padres, max_padres):
+    """
+    Movimientos válidos (sin ciclos) sobre el grafo dado por `padres`
+    (lista de conjuntos): ('+', j, i) agrega j -> i, ('-', j, i) lo quita
+    y ('r', j, i) lo invierte.
+    """
+    n = len(padres)
+    hijos = [set() for _ in range(n)]
+    for i, ps in enumerate(padres):
+        for j in ps:
+            hijos[j].add(i)
+    movimientos = []
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            if j in padres[i]:
+                movimientos.append(('-', j, i))
+                if len(padres[j]) < max_padres:
+                    hijos[j].discard(i)
+                    if not _alcanzable(hijos, j, i):
+                        movimientos.append(('r', j, i))
+                    hijos[j].add(i)
+            elif i not in padres[j] and len(padres[i]) < max_padres and not _alcanzable(hijos, i, j):
+                movimientos.append(('+', j, i))
+    return movimientos
+
+def _aplicar(padres, movimiento):
+    """
+    Devuelve las familias modificadas por el movimiento: {i: nuevos padres}.
+    """
+    tipo, j, i = movimiento
+    if tipo == '+':
+        return {i: padres[i] | {j}}
+    if tipo == '-':
+        return {i: padres[i] - {j}}
+    return {i: padres[i] - {j}, j: padres[j] | {i}}
+
+def _inverso(movimiento):
+    tipo, j, i = movimiento
+    return {'+': ('-', j, i), '-': ('+', j, i), 'r': ('r', i, j)}[tipo]
+
+def aprender_estructura(datos, valores, puntaje='bic', ess=1.0, max_padres=3, tabu=10, paciencia=None,
+                        reinicios=0, perturbaciones=None, max_iteraciones=1000, metodo='mle',
+                        alfa=1.0, columnas=None, tam_bloque=1000000, procesos=1, semilla=None):
+    """
+    Aprende la estructura de una red bayesiana por ascenso de colina con
+    movimientos de agregar, quitar e invertir arcos.
+    valores: diccionario variable -> lista de valores posibles (su orden define
+             el de las columnas cuando los datos son un arreglo sin `columnas`)
+    puntaje: 'bic' o 'bdeu' (con tamaño de muestra equivalente `ess`)
+    tabu: cantidad de movimientos recientes cuyo inverso queda prohibido
+    paciencia: pasos seguidos sin mejorar el mejor grafo que la búsqueda
+               tolera (aceptando movimientos que empeoran) antes de
+               detenerse; 0 = ascenso de colina puro, None = igual a `tabu`
+    reinicios: nuevas búsquedas desde el mejor grafo con `perturbaciones`
+               movimientos aleatorios (por defecto, uno por variable)
+    procesos: evalúa los puntajes de las familias nuevas en un
+              ProcessPoolExecutor (1 = sin pool, None = núcleos disponibles)
+    Los datos se agrupan por patrón una sola vez y los puntajes de cada
+    familia se guardan, de modo que un movimiento solo recalcula las
+    familias cuyos padres cambian.
+    Devuelve una red nueva con la estructura aprendida y las TDP ajustadas
+    con `metodo` y `alfa` (ver estimar_tablas).
+    """
+    if puntaje not in PUNTAJES:
+        raise ValueError(f"Puntaje desconocido: {puntaje}. Opciones: {list(PUNTAJES)}")
+    if paciencia is None:
+        paciencia = tabu
+    esqueleto = RedesBa.crear_red_bayesiana()
+    for var, dominio in valores.items():
+        RedesBa.agregar_variable(esqueleto, var, list(dominio))
+    variables = esqueleto['variables']
+    n = len(variables)
+    patrones, repeticiones = patrones_datos(datos, esqueleto, columnas, tam_bloque)
+    cardinalidades = [len(esqueleto['valores'][v]) for v in variables]
+    puntuador = _Puntuador(patrones, repeticiones, cardinalidades, puntaje, ess)
+
+    cache = {}
+    trabajadores = procesos or os.cpu_count() or 1
+    pool = None
+    if trabajadores > 1:
+        pool = ProcessPoolExecutor(max_workers=trabajadores, initializer=_iniciar_puntuador,
+                                   initargs=(puntuador,))
+
+    def puntuar(claves):
+        nuevas = list({c for c in claves if c not in cache})
+        if pool is None or len(nuevas) < 2:
+            resultados = map(puntuador, nuevas)
+        else:
+            resultados = pool.map(_puntuar, nuevas, chunksize=max(1, len(nuevas) // (4 * trabajadores)))
+        cache.update(zip(nuevas, resultados))
+
+    def clave(i, ps):
+        return (i, tuple(sorted(ps)))
+
+    def ascender(padres):
+        puntuar([clave(i, ps) for i, ps in enumerate(padres)])
+        actual = sum(cache[clave(i, ps)] for i, ps in enumerate(padres))
+        mejor, mejor_padres = actual, list(padres)
+        prohibidos = deque(maxlen=tabu)
+        sin_mejora = 0
+        for _ in range(max_iteraciones):
+            candidatos = [(m, _aplicar(padres, m)) for m in _movimientos(padres, max_padres)
+                          if m not in prohibidos]
+            puntuar([clave(i, ps) for _, cambios in candidatos for i, ps in cambios.items()])
+            elegido, delta = None, -math.inf
+            for m, cambios in candidatos:
+                d = sum(cache[clave(i, ps)] - cache[clave(i, padres[i])] for i, ps in cambios.items())
+                if d > delta:
+                    elegido, delta = (m, cambios), d
+            if elegido is None or (delta <= 1e-9 and paciencia == 0):
+                break
+            padres = list(padres)
+            for i, ps in elegido[1].items():
+                padres[i] = ps
+            prohibidos.append(_inverso(elegido[0]))
+            actual += delta
+            if actual > mejor + 1e-9:
+                mejor, mejor_padres, sin_mejora = actual, list(padres), 0
+            else:
+                sin_mejora += 1
+                if sin_mejora >= paciencia:
+                    break
+        return mejor, mejor_padres
+
+    try:
+        mejor, mejor_padres = ascender([frozenset() for _ in range(n)])
+        rng = random.Random(semilla)
+        for _ in range(reinicios):
+            padres = list(mejor_padres)
+            for _ in range(n if perturbaciones is None else perturbaciones):
+                movimientos = _movimientos(padres, max_padres)
+                if not movimientos:
+                    break
+                for i, ps in _aplicar(padres, rng.choice(movimientos)).items():
+                    padres[i] = ps
+            puntos, padres = ascender(padres)
+            if puntos > mejor + 1e-9:
+                mejor, mejor_padres = puntos, padres
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Red resultante, con las variables en orden topológico
+    red = RedesBa.crear_red_bayesiana()
+    for i in RedesBa._ordenar_topologicamente(list(range(n)), mejor_padres):
+        RedesBa.agregar_variable(red, variables[i], list(esqueleto['valores'][variables[i]]))
+    for i in range(n):
+        RedesBa.establecer_padres(red, variables[i], [variables[j] for j in sorted(mejor_padres[i])])
+    for var in red['variables']:
+        i = variables.index(var)
+        padres_idx = [variables.index(p) for p in red['padres'][var]]
+        conteos = contar_familia(patrones, i, padres_idx, cardinalidades, repeticiones)
+        tabla = estimar_tablas([conteos], metodo, alfa)[0]
+        forma = [cardinalidades[j] for j in padres_idx + [i]]
+        RedesBa.establecer_tabla(red, var, tabla.reshape(forma))
+    return red
@@ -0,0 +1,589 @@
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import RedesBa
+
+# ==========================================
+# Muestreo vectorizado sobre la red compilada
+# ==========================================
+
+Z_95 = 1.959963984540054
+
+def _crear_rng(semilla):
+    """
+    Acepta una semilla (int o None) o un np.random.Generator ya creado.
+    """
+    if isinstance(semilla, np.random.Generator):
+        return semilla
+    return np.random.default_rng(semilla)
+
+def _pasos_fila(rc, i):
+    """
+    Pasos para convertir los códigos de los padres de i en el número de fila
+    de su TDP vista como matriz (combinaciones de padres, valores de i).
+    """
+    return rc.pasos[i][:-1] // rc.cardinalidades[i]
+
+def _filas(rc, i, muestras):
+    if len(rc.padres_idx[i]) == 0:
+        return np.zeros(len(muestras), dtype=np.int64)
+    return muestras[:, rc.padres_idx[i]] @ _pasos_fila(rc, i)
+
+def _muestrear_categorica(probs, rng):
+    """
+    Un código por fila de `probs` (matriz n x k con filas que suman 1).
+    """
+    acumuladas = np.cumsum(probs, axis=1)
+    u = rng.random(len(probs)) * acumuladas[:, -1]
+    codigos = (u[:, None] >= acumuladas).sum(axis=1)
+    return np.minimum(codigos, probs.shape[1] - 1)
+
+def _muestrear(rc, evidencia, n, rng, propuestas=None, rechazo=False, virtuales=None):
+    """
+    Genera n muestras (columnas en el orden de rc.variables); las variables
+    se muestrean en el orden topológico rc.topologico.
+    evidencia: diccionario índice -> código
+    propuestas: tablas (misma forma que rc.tablas) de las que se muestrean las
+                variables no observadas; por defecto las propias TDP. Con
+                None en una posición se usa la TDP de esa variable
+    Las TDP compactas se evalúan sobre las filas muestreadas, sin expandirlas.
+    rechazo: si es True también se muestrean las variables observadas y las
+             muestras inconsistentes reciben peso 0 (muestreo lógico)
+    virtuales: evidencia virtual {índice: vector de verosimilitud}; cada
+               muestra se pondera por la verosimilitud de su valor
+    Devuelve (muestras, log_pesos).
+    """
+    muestras = np.zeros((n, len(rc.variables)), dtype=np.int64)
+    log_pesos = np.zeros(n)
+    with np.errstate(divide='ignore'):
+        for i in rc.topologico:
+            card = int(rc.cardinalidades[i])
+            if i in rc.compactas:
+                # TDP de cada fila calculada a partir de los padres muestreados
+                tdp = rc.compactas[i].probabilidades(muestras[:, rc.padres_idx[i]])
+                filas = np.arange(n)
+            else:
+                filas = _filas(rc, i, muestras)
+                tdp = rc.tablas[i].reshape(-1, card)
+            if i in evidencia and not rechazo:
+                muestras[:, i] = evidencia[i]
+                log_pesos += np.log(tdp[filas, evidencia[i]])
+                continue
+
+            if propuestas is None or propuestas[i] is None:
+                muestras[:, i] = _muestrear_categorica(tdp[filas], rng)
+            else:
+                q = propuestas[i].reshape(-1, card)[filas]
+                codigos = _muestrear_categorica(q, rng)
+                muestras[:, i] = codigos
+                filas_n = np.arange(n)
+                log_pesos += np.log(tdp[filas, codigos]) - np.log(q[filas_n, codigos])
+            if i in evidencia:
+                log_pesos[muestras[:, i] != evidencia[i]] = -np.inf
+        for i, vector in (virtuales or {}).items():
+            log_pesos += np.log(vector[muestras[:, i]])
+    return muestras, log_pesos
+
+class _Acumulador:
+    """
+    Sumas ponderadas para el estimador autonormalizado de P(X | e).
+    Los pesos se guardan relativos a exp(escala) para evitar underflow.
+    """
+    def __init__(self, card):
+        self.escala = -np.inf
+        self.suma_w = 0.0
+        self.suma_w2 = 0.0
+        self.suma_wx = np.zeros(card)
+        self.suma_w2x = np.zeros(card)
+        self.n = 0
+
+    def agregar(self, codigos_X, log_pesos):
+        self.n += len(log_pesos)
+        maximo = log_pesos.max() if len(log_pesos) else -np.inf
+        if maximo == -np.inf:
+            return
+        if maximo > self.escala:
+            factor = np.exp(self.escala - maximo) if self.escala > -np.inf else 0.0
+            self.suma_w *= factor
+            self.suma_wx *= factor
+            self.suma_w2 *= factor ** 2
+            self.suma_w2x *= factor ** 2
+            self.escala = maximo
+        w = np.exp(log_pesos - self.escala)
+        card = len(self.suma_wx)
+        self.suma_w += w.sum()
+        self.suma_w2 += (w ** 2).sum()
+        self.suma_wx += np.bincount(codigos_X, weights=w, minlength=card)
+        self.suma_w2x += np.bincount(codigos_X, weights=w ** 2, minlength=card)
+
+    def estimacion(self):
+        if self.suma_w == 0:
+            ceros = np.zeros_like(self.suma_wx)
+            return ceros, ceros, 0.0
+        p = self.suma_wx / self.suma_w
+        # Varianza del estimador autonormalizado: sum w^2 (1[x] - p)^2 / (sum w)^2
+        var = (self.suma_w2x * (1 - 2 * p) + p ** 2 * self.suma_w2) / self.suma_w ** 2
+        ess = self.suma_w ** 2 / self.suma_w2
+        return p, np.sqrt(np.maximum(var, 0.0)), ess
+
+def _preparar(X, e, red, podar, virtual=None, do=None):
+    """
+    Red compilada (intervenida y podada), evidencia {índice: código} y
+    evidencia virtual {índice: vector de verosimilitud} de una consulta.
+    """
+    red, e, verosimilitudes = RedesBa._preparar_consulta(e, red, virtual, do)
+    rc = RedesBa.compilar_red(red)
+    if podar and verosimilitudes:
+        # La evidencia virtual no d-separa: se conservan sus ancestros
+        rc = RedesBa._red_ancestral([X] + list(e) + list(verosimilitudes), rc)
+    elif podar:
+        rc, e = RedesBa.podar_red(X, e, rc)
+    evidencia = {}
+    for var, valor in e.items():
+        if var in rc.indice:
+            evidencia[rc.indice[var]] = rc.codificar(var, valor)
+    virtuales = {rc.indice[var]: vector for var, vector in verosimilitudes.items() if var in rc.indice}
+    return rc, evidencia, virtuales
+
+def _estimar(X, rc, evidencia, generador, n_muestras, ancho_ic, tam_lote, rng):
+    """
+    Muestrea por lotes hasta agotar n_muestras o hasta que el intervalo de
+    confianza del 95 % de todas las probabilidades sea más estrecho que ancho_ic.
+    """
+    i_X = rc.indice[X]
+    acumulador = _Acumulador(int(rc.cardinalidades[i_X]))
+    if None not in evidencia.values():
+        while acumulador.n < n_muestras:
+            n = min(tam_lote, n_muestras - acumulador.n)
+            muestras, log_pesos = generador(n, rng)
+            acumulador.agregar(muestras[:, i_X], log_pesos)
+            if ancho_ic is not None:
+                _, error, _ = acumulador.estimacion()
+                if acumulador.suma_w > 0 and 2 * Z_95 * error.max() <= ancho_ic:
+                    break
+
+    p, error, ess = acumulador.estimacion()
+    valores = rc.valores[X]
+    return {
+        'distribucion': dict(zip(valores, p.tolist())),
+        'error_estandar': dict(zip(valores, error.tolist())),
+        'muestras_efectivas': float(ess),
+        'muestras': acumulador.n,
+    }
+
+def muestreo_logico(X, e, red, n_muestras=100000, ancho_ic=None, tam_lote=10000, semilla=None, podar=True,
+                    virtual=None, do=None):
+    """
+    Muestreo lógico (hacia adelante con rechazo de las muestras que no
+    coinciden con la evidencia).
+    n_muestras: presupuesto máximo de muestras
+    ancho_ic: si se da, se detiene antes cuando el intervalo de confianza del
+              95 % de cada probabilidad es más estrecho que este valor
+    semilla: semilla o np.random.Generator para reproducir los resultados
+    virtual: evidencia virtual {variable: verosimilitudes}; en lugar de
+             rechazar, cada muestra se pondera por su verosimilitud
+    do: intervenciones {variable: valor} (ver RedesBa.intervenir)
+    Devuelve un diccionario con 'distribucion', 'error_estandar',
+    'muestras_efectivas' y 'muestras'.
+    """
+    rc, evidencia, virtuales = _preparar(X, e, red, podar, virtual, do)
+    generador = lambda n, rng: _muestrear(rc, evidencia, n, rng, rechazo=True, virtuales=virtuales)
+    return _estimar(X, rc, evidencia, generador, n_muestras, ancho_ic, tam_lote, _crear_rng(semilla))
+
+def ponderacion_verosimilitud(X, e, red, n_muestras=100000, ancho_ic=None, tam_lote=10000, semilla=None, podar=True,
+                              virtual=None, do=None):
+    """
+    Ponderación por verosimilitud: las variables observadas se fijan y cada
+    muestra pesa el producto de P(e_i | padres) (y de las verosimilitudes de la
+    evidencia virtual). Mismos parámetros y resultado que muestreo_logico.
+    """
+    rc, evidencia, virtuales = _preparar(X, e, red, podar, virtual, do)
+    generador = lambda n, rng: _muestrear(rc, evidencia, n, rng, virtuales=virtuales)
+    return _estimar(X, rc, evidencia, generador, n_muestras, ancho_ic, tam_lote, _crear_rng(semilla))
+
+def _propuesta_inicial(rc, evidencia, umbral):
+    """
+    Función de importancia inicial de AIS-BN: las TDP originales, con
+    distribución uniforme para los padres no observados de la evidencia y
+    probabilidades menores que `umbral` elevadas a `umbral`. Las variables con
+    TDP compacta no se adaptan (su propuesta es None: la propia TDP).
+    """
+    padres_evidencia = {int(p) for i in evidencia for p in rc.padres_idx[i]}
+    propuestas = []
+    for i in range(len(rc.variables)):
+        if i in rc.compactas:
+            propuestas.append(None)
+            continue
+        card = int(rc.cardinalidades[i])
+        q = np.array(rc.tablas[i], dtype=float).reshape(-1, card)
+        if i in padres_evidencia and i not in evidencia:
+            q[:] = 1.0 / card
+        q = np.maximum(q, umbral)
+        propuestas.append((q / q.sum(axis=1, keepdims=True)).reshape(-1))
+    return propuestas
+
+def muestreo_importancia_adaptativo(X, e, red, n_muestras=100000, ancho_ic=None, tam_lote=10000, semilla=None,
+                                    podar=True, etapas=10, muestras_etapa=2000, umbral=0.04, virtual=None, do=None):
+    """
+    Muestreo por importancia adaptativo al estilo AIS-BN (Cheng y Druzdzel, 2000).
+    Durante `etapas` rondas de `muestras_etapa` muestras la función de importancia
+    (una tabla por variable con la forma de su TDP) se acerca a P(x_i | padres, e)
+    estimada con las muestras ponderadas. Después se estima P(X | e) con la
+    función aprendida. Mismos parámetros y resultado que muestreo_logico; la
+    evidencia virtual entra en los pesos, también durante la adaptación.
+    """
+    rc, evidencia, virtuales = _preparar(X, e, red, podar, virtual, do)
+    rng = _crear_rng(semilla)
+    propuestas = _propuesta_inicial(rc, evidencia, umbral)
+
+    if None not in evidencia.values():
+        for k in range(etapas):
+            # Tasa de aprendizaje decreciente de AIS-BN: a * (b / a) ** (k / kmax)
+            tasa = 0.4 * (0.14 / 0.4) ** (k / max(etapas - 1, 1))
+            muestras, log_pesos = _muestrear(rc, evidencia, muestras_etapa, rng, propuestas, virtuales=virtuales)
+            if log_pesos.max() == -np.inf:
+                continue
+            w = np.exp(log_pesos - log_pesos.max())
+            for i in range(len(rc.variables)):
+                if i in evidencia or i in rc.compactas:
+                    continue
+                card = int(rc.cardinalidades[i])
+                celdas = _filas(rc, i, muestras) * card + muestras[:, i]
+                conteos = np.bincount(celdas, weights=w, minlength=rc.tablas[i].size).reshape(-1, card)
+                totales = conteos.sum(axis=1, keepdims=True)
+                q = propuestas[i].reshape(-1, card)
+                estimada = np.divide(conteos, totales, out=q.copy(), where=totales > 0)
+                propuestas[i] = (q + tasa * (estimada - q)).reshape(-1)
+
+    generador = lambda n, rng: _muestrear(rc, evidencia, n, rng, propuestas, virtuales=virtuales)
+    return _estimar(X, rc, evidencia, generador, n_muestras, ancho_ic, tam_lote, rng)
+
+
+# ==========================================
+# Muestreo de Gibbs con varias cadenas
+# ==========================================
+
+def _log_prob_familias(log_tablas, rc, estados, familias):
+    """
+    Suma de log P(x_f | padres(f)) sobre las variables f de `familias` para
+    cada fila de `estados`.
+    """
+    total = np.zeros(len(estados))
+    for f in familias:
+        card = int(rc.cardinalidades[f])
+        filas = _filas(rc, f, estados)
+        total += log_tablas[f].reshape(-1, card)[filas, estados[:, f]]
+    return total
+
+def _ejecutar_cadenas(rc, evidencia, i_X, bloques, n_iteraciones, quemado, n_cadenas, semilla, virtuales=None):
+    """
+    Ejecuta n_cadenas cadenas de Gibbs independientes a la vez (vectorizadas
+    sobre la primera dimensión de `estados`). Se ejecuta en un proceso del pool.
+    virtuales: evidencia virtual {índice: vector}, un término más de la
+               condicional completa de su variable
+    Devuelve un arreglo (n_iteraciones - quemado, n_cadenas) con los códigos de X.
+    """
+    rng = np.random.default_rng(semilla)
+    with np.errstate(divide='ignore'):
+        log_tablas = [np.log(t) for t in rc.tablas]
+        log_virtuales = {i: np.log(v) for i, v in (virtuales or {}).items()}
+
+    # Familias afectadas por cada bloque: sus variables y los hijos de estas
+    hijos = RedesBa._hijos(rc)
+    familias = []
+    combinaciones = []
+    for bloque in bloques:
+        afectadas = set(bloque)
+        for i in bloque:
+            afectadas.update(rc.indice[h] for h in hijos[rc.variables[i]])
+        familias.append(sorted(afectadas))
+        combos = np.array(list(itertools.product(
+            *[range(int(rc.cardinalidades[i])) for i in bloque]
+        )), dtype=np.int64)
+        # Logaritmo de la verosimilitud virtual de cada combinación del bloque
+        virtual_combos = np.zeros(len(combos))
+        for j, i in enumerate(bloque):
+            if i in log_virtuales:
+                virtual_combos += log_virtuales[i][combos[:, j]]
+        combinaciones.append((combos, virtual_combos))
+
+    # Estado inicial: una muestra hacia adelante con la evidencia fijada
+    estados, _ = _muestrear(rc, evidencia, n_cadenas, rng)
+
+    guardadas = np.zeros((max(n_iteraciones - quemado, 0), n_cadenas), dtype=np.int64)
+    for t in range(n_iteraciones):
+        for bloque, afectadas, (combos, virtual_combos) in zip(bloques, familias, combinaciones):
+            anteriores = estados[:, bloque].copy()
+            logits = np.empty((n_cadenas, len(combos)))
+            for c, combo in enumerate(combos):
+                estados[:, bloque] = combo
+                logits[:, c] = _log_prob_familias(log_tablas, rc, estados, afectadas) + virtual_combos[c]
+
+            maximo = logits.max(axis=1, keepdims=True)
+            validas = np.isfinite(maximo[:, 0])
+            nuevos = anteriores.copy()
+            if validas.any():
+                probs = np.exp(logits[validas] - maximo[validas])
+                nuevos[validas] = combos[_muestrear_categorica(probs, rng)]
+            # Las cadenas sin ninguna combinación posible conservan su estado
+            estados[:, bloque] = nuevos
+        if t >= quemado:
+            guardadas[t - quemado] = estados[:, i_X]
+    return guardadas
+
+def r_hat(cadenas, card):
+    """
+    Diagnóstico de convergencia de Gelman-Rubin para cada valor de X.
+    cadenas: arreglo (iteraciones, número de cadenas) con códigos de X.
+    """
+    n = cadenas.shape[0]
+    resultado = np.ones(card)
+    if n < 2 or cadenas.shape[1] < 2:
+        return np.full(card, np.nan)
+    for k in range(card):
+        y = (cadenas == k).astype(float)
+        medias = y.mean(axis=0)
+        W = y.var(axis=0, ddof=1).mean()
+        B = n * medias.var(ddof=1)
+        if W == 0:
+            resultado[k] = 1.0 if B == 0 else np.inf
+            continue
+        var_estimada = (n - 1) / n * W + B / n
+        resultado[k] = np.sqrt(var_estimada / W)
+    return resultado
+
+def muestreo_gibbs(X, e, red, n_iteraciones=2000, quemado=500, cadenas=4, cadenas_por_proceso=64,
+                   bloques=None, procesos=None, semilla=None, podar=True, virtual=None, do=None):
+    """
+    Muestreo de Gibbs sobre el manto de Markov de cada variable.
+    cadenas: número de tareas independientes; cada una avanza
+             `cadenas_por_proceso` cadenas vectorizadas con NumPy
+    bloques: lista de listas de variables que se muestrean conjuntamente;
+             las variables no incluidas se actualizan de una en una
+    procesos: tamaño del ProcessPoolExecutor (None = núcleos disponibles,
+              1 = sin pool, en el proceso actual)
+    virtual, do: evidencia virtual e intervenciones, como en muestreo_logico
+    Devuelve un diccionario con 'distribucion', 'error_estandar' (entre
+    cadenas), 'r_hat' por valor, 'r_hat_max' y 'muestras'.
+    """
+    rc, evidencia, virtuales = _preparar(X, e, red, podar, virtual, do)
+    i_X = rc.indice[X]
+    valores = rc.valores[X]
+    card = int(rc.cardinalidades[i_X])
+    if None in evidencia.values():
+        ceros = dict.fromkeys(valores, 0.0)
+        return {'distribucion': ceros, 'error_estandar': dict(ceros), 'r_hat': {}, 'r_hat_max': np.nan, 'muestras': 0}
+
+    # Bloques en índices, sin variables observadas; el resto de una en una
+    en_bloque = set()
+    bloques_idx = []
+    for bloque in bloques or []:
+        idx = [rc.indice[v] for v in bloque if v in rc.indice and rc.indice[v] not in evidencia]
+        if idx:
+            bloques_idx.append(idx)
+            en_bloque.update(idx)
+    for i in range(len(rc.variables)):
+        if i not in evidencia and i not in en_bloque:
+            bloques_idx.append([i])
+
+    semillas = np.random.SeedSequence(semilla).spawn(cadenas)
+    argumentos = [(rc, evidencia, i_X, bloques_idx, n_iteraciones, quemado, cadenas_por_proceso, s, virtuales)
+                  for s in semillas]
+    if procesos == 1:
+        resultados = [_ejecutar_cadenas(*a) for a in argumentos]
+    else:
+        trabajadores = min(procesos or os.cpu_count() or 1, cadenas)
+        with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+            resultados = list(pool.map(_ejecutar_cadenas, *zip(*argumentos)))
+
+    todas = np.concatenate(resultados, axis=1)
+    conteos = np.stack([(todas == k).mean(axis=0) for k in range(card)], axis=1)
+    p = conteos.mean(axis=0)
+    error = conteos.std(axis=0, ddof=1) / np.sqrt(conteos.shape[0]) if conteos.shape[0] > 1 else np.zeros(card)
+    rh = r_hat(todas, card)
+    return {
+        'distribucion': dict(zip(valores, p.tolist())),
+        'error_estandar': dict(zip(valores, error.tolist())),
+        'r_hat': dict(zip(valores, rh.tolist())),
+        'r_hat_max': float(np.nanmax(rh)) if not np.all(np.isnan(rh)) else np.nan,
+        'muestras': int(todas.size),
+    }
+
+
+# ==========================================
+# Propagación de creencias con ciclos (loopy BP)
+# ==========================================
+
+class GrafoFactores:
+    """
+    Grafo de factores de la red con la evidencia ya incorporada: un factor por
+    TDP (sin las variables observadas), un factor de una variable por cada
+    evidencia virtual y los mensajes factor -> variable y variable -> factor
+    de cada arista. Con `do` el grafo es el de la red intervenida.
+    """
+    def __init__(self, e, red, virtual=None, do=None):
+        red, e, verosimilitudes = RedesBa._preparar_consulta(e, red, virtual, do)
+        rc = RedesBa.compilar_red(red)
+        self.rc = rc
+        self.e = {k: v for k, v in e.items() if k in rc.indice}
+        self.factores = []
+        for var in rc.variables:
+            factor = RedesBa.make_factor_np(var, self.e, rc)
+            if factor.vars:
+                self.factores.append(factor)
+        for factor in RedesBa.factores_virtuales(verosimilitudes, self.e, rc):
+            if factor.vars:
+                self.factores.append(factor)
+
+        self.vecinos = {v: [] for v in rc.variables if v not in self.e}
+        for f, factor in enumerate(self.factores):
+            for i, v in enumerate(factor.vars):
+                self.vecinos[v].append((f, i))
+
+        self.cards = {v: len(rc.valores[v]) for v in self.vecinos}
+        self.mensajes_fv = [[np.full(self.cards[v], 1.0 / self.cards[v]) for v in f.vars] for f in self.factores]
+
+    def mensaje_vf(self, f, i):
+        """
+        Mensaje de la variable i del factor f hacia f: producto de los mensajes
+        que recibe la variable de sus otros factores.
+        """
+        v = self.factores[f].vars[i]
+        mensaje = np.ones(self.cards[v])
+        for g, j in self.vecinos[v]:
+            if g != f:
+                mensaje = mensaje * self.mensajes_fv[g][j]
+        total = mensaje.sum()
+        return mensaje / total if total > 0 else np.full(self.cards[v], 1.0 / self.cards[v])
+
+    def mensaje_fv(self, f, i):
+        """
+        Nuevo mensaje del factor f hacia su variable i: se multiplica la tabla
+        por los mensajes de las demás variables (por broadcasting) y se suma
+        sobre todos los ejes salvo el i.
+        """
+        factor = self.factores[f]
+        tabla = factor.tabla
+        n = len(factor.vars)
+        for j in range(n):
+            if j != i:
+                forma = [1] * n
+                forma[j] = -1
+                tabla = tabla * self.mensaje_vf(f, j).reshape(forma)
+        mensaje = tabla.sum(axis=tuple(j for j in range(n) if j != i))
+        total = mensaje.sum()
+        return mensaje / total if total > 0 else np.full(len(mensaje), 1.0 / len(mensaje))
+
+    def marginales(self):
+        """
+        Creencia normalizada de cada variable; las observadas reciben su indicador.
+        """
+        resultado = {}
+        for v in self.rc.variables:
+            if v in self.e:
+                codigo = self.rc.codificar(v, self.e[v])
+                resultado[v] = {val: 1.0 if k == codigo else 0.0 for k, val in enumerate(self.rc.valores[v])}
+                continue
+            creencia = np.ones(self.cards[v])
+            for f, i in self.vecinos[v]:
+                creencia = creencia * self.mensajes_fv[f][i]
+            resultado[v] = RedesBa.normaliza(dict(zip(self.rc.valores[v], creencia.tolist())))
+        return resultado
+
+def propagacion_creencias(e, red, max_iteraciones=100, tolerancia=1e-6, amortiguamiento=0.0,
+                          planificacion='residual', virtual=None, do=None):
+    """
+    Propagación de creencias con ciclos sobre el grafo de factores de la red.
+    amortiguamiento: peso del mensaje anterior al actualizar (0 = sin amortiguar)
+    planificacion: 'sincrona' (todos los mensajes en cada iteración) o 'residual'
+                   (primero el mensaje cuyo cambio pendiente es mayor; una
+                   iteración equivale a tantas actualizaciones como aristas)
+    Se detiene cuando el mayor residuo (norma infinito del cambio de un
+    mensaje) baja de `tolerancia`.
+    virtual, do: evidencia virtual e intervenciones (ver GrafoFactores)
+    Devuelve un diccionario con 'marginales' (todas las variables),
+    'convergio', 'iteraciones' e 'historial' (tiempo y residuo por iteración).
+    """
+    if planificacion not in ('sincrona', 'residual'):
+        raise ValueError(f"Planificación desconocida: {planificacion}. Opciones: ['sincrona', 'residual']")
+    grafo = GrafoFactores(e, red, virtual, do)
+    aristas = [(f, i) for f, factor in enumerate(grafo.factores) for i in range(len(factor.vars))]
+    historial = []
+    convergio = False
+
+    def actualizar(f, i, nuevo):
+        viejo = grafo.mensajes_fv[f][i]
+        mensaje = (1 - amortiguamiento) * nuevo + amortiguamiento * viejo
+        grafo.mensajes_fv[f][i] = mensaje
+        return float(np.abs(mensaje - viejo).max())
+
+    if planificacion == 'sincrona':
+        for iteracion in range(max_iteraciones):
+            inicio = time.perf_counter()
+            nuevos = [grafo.mensaje_fv(f, i) for f, i in aristas]
+            residuo = max((actualizar(f, i, m) for (f, i), m in zip(aristas, nuevos)), default=0.0)
+            historial.append({'iteracion': iteracion + 1, 'tiempo': time.perf_counter() - inicio, 'residuo': residuo})
+            if residuo < tolerancia:
+                convergio = True
+                break
+    else:
+        # Cola de prioridad con (-residuo, versión, f, i); las entradas con una
+        # versión vieja se descartan al sacarlas.
+        version = {a: 0 for a in aristas}
+        pendientes = {}
+        cola = []
+
+        def encolar(f, i):
+            nuevo = grafo.mensaje_fv(f, i)
+            residuo = float(np.abs(nuevo - grafo.mensajes_fv[f][i]).max())
+            version[(f, i)] += 1
+            pendientes[(f, i)] = nuevo
+            heapq.heappush(cola, (-residuo, version[(f, i)], f, i))
+
+        for f, i in aristas:
+            encolar(f, i)
+
+        for iteracion in range(max_iteraciones):
+            inicio = time.perf_counter()
+            residuo_max = 0.0
+            actualizaciones = 0
+            while cola and actualizaciones < len(aristas):
+                residuo, ver, f, i = heapq.heappop(cola)
+                if ver != version[(f, i)]:
+                    continue
+                if -residuo < tolerancia:
+                    heapq.heappush(cola, (residuo, ver, f, i))
+                    break
+                residuo_max = max(residuo_max, actualizar(f, i, pendientes.pop((f, i))))
+                actualizaciones += 1
+                # El mensaje se recalcula con el valor amortiguado restante
+                encolar(f, i)
+                # Cambió lo que recibe la variable: sus otros factores deben recalcularse
+                v = grafo.factores[f].vars[i]
+                for g, _ in grafo.vecinos[v]:
+                    if g != f:
+                        for j in range(len(grafo.factores[g].vars)):
+                            if grafo.factores[g].vars[j] != v:
+                                encolar(g, j)
+            pendiente_max = max((-r for r, ver, f, i in cola if ver == version[(f, i)]), default=0.0)
+            historial.append({
+                'iteracion': iteracion + 1,
+                'tiempo': time.perf_counter() - inicio,
+                'residuo': max(residuo_max, pendiente_max),
+                'actualizaciones': actualizaciones,
+            })
+            if pendiente_max < tolerancia:
+                convergio = True
+                break
+
+    return {
+        'marginales': grafo.marginales(),
+        'convergio': convergio,
+        'iteraciones': len(historial),
+        'historial': historial,
+    }
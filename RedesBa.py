@@ -1,6 +1,150 @@
+import contextlib
+import copy
+import functools
+import heapq
+import inspect
+import itertools
+import json
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+import numpy as np
+
+# ==========================================
+# Instrumentación de las consultas
+# ==========================================
+
+# Registros activos (ver instrumentar); con la lista vacía los motores no miden nada
+_REGISTROS = []
+
+class Instrumentacion:
+    """
+    Eventos de las consultas de inferencia hechas dentro de instrumentar().
+    Cada evento es un diccionario con 'tipo', 'consulta' (número de la
+    consulta), 't' (segundos desde la creación del registro) y sus datos:
+      consulta_inicio: función y parámetros simples de la consulta
+      factores_iniciales: tiempo de creación de los factores, cuántos y celdas
+      orden: orden de eliminación de las variables
+      eliminacion: variable, factores multiplicados, tiempos del producto y de
+                   la suma, celdas y bytes del producto y del resultado
+      producto_final: producto de los factores que quedan tras eliminar
+      arbol_uniones: número de cliques, anchura y mayor potencial del árbol
+      enumeracion: entradas de la caché de la enumeración memorizada
+      consulta_fin: duración, celdas y bytes del mayor factor intermedio y
+                    el error si la consulta falló
+    callback: función opcional a la que se pasa cada evento al emitirse
+    """
+    def __init__(self, callback=None):
+        self.eventos = []
+        self.callback = callback
+        self._inicio = time.perf_counter()
+        self._consulta = None
+        self._n_consultas = 0
+        self._pico = (0, 0)
+
+    def emitir(self, tipo, **datos):
+        evento = {'tipo': tipo, 'consulta': self._consulta, 't': time.perf_counter() - self._inicio}
+        evento.update(datos)
+        if 'celdas' in datos:
+            self._pico = max(self._pico, (datos['celdas'], datos.get('bytes', 0)))
+        self.eventos.append(evento)
+        if self.callback is not None:
+            self.callback(evento)
+
+    def consultas(self):
+        """
+        Eventos consulta_fin (resumen de cada consulta).
+        """
+        return [ev for ev in self.eventos if ev['tipo'] == 'consulta_fin']
+
+    def exportar(self, ruta):
+        """
+        Guarda los eventos en `ruta` como JSON Lines (un evento por línea).
+        """
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for evento in self.eventos:
+                f.write(json.dumps(evento, ensure_ascii=False, default=str) + '\n')
+
+@contextlib.contextmanager
+def instrumentar(callback=None):
+    """
+    Activa la instrumentación de las consultas hechas dentro del bloque:
+
+        with instrumentar() as registro:
+            inferencia_eliminacion_variables('X', e, red, motor='numpy')
+        registro.exportar('eventos.jsonl')
+    """
+    registro = Instrumentacion(callback)
+    _REGISTROS.append(registro)
+    try:
+        yield registro
+    finally:
+        _REGISTROS.remove(registro)
+
+def _emitir(tipo, **datos):
+    for registro in _REGISTROS:
+        registro.emitir(tipo, **datos)
+
+def _medidas_factor(factor):
+    """
+    (celdas, bytes) de un factor; para Factor, el tamaño del diccionario.
+    """
+    if isinstance(factor, FactorNP):
+        nbytes = factor.tabla.nbytes
+        if getattr(factor, 'signo', None) is not None:
+            nbytes += factor.signo.nbytes
+        return int(factor.tabla.size), int(nbytes)
+    return len(factor.cpt), sys.getsizeof(factor.cpt)
+
+def _instrumentada(funcion):
+    """
+    Decorador de las funciones de consulta: con instrumentación activa emite
+    consulta_inicio y consulta_fin. Las consultas anidadas (p. ej.
+    inferencia_lote sobre conjunta_lote) cuentan como una sola.
+    """
+    firma = inspect.signature(funcion)
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if not _REGISTROS or any(r._consulta is not None for r in _REGISTROS):
+            return funcion(*args, **kwargs)
+        parametros = {}
+        for nombre, valor in firma.bind(*args, **kwargs).arguments.items():
+            if nombre == 'e' and isinstance(valor, dict):
+                parametros['evidencia'] = list(valor)
+            elif valor is None or isinstance(valor, (str, int, float, bool)):
+                parametros[nombre] = valor
+            elif nombre in ('vars_consulta', 'vars_map'):
+                parametros[nombre] = list(valor)
+        registros = list(_REGISTROS)
+        for registro in registros:
+            registro._n_consultas += 1
+            registro._consulta = registro._n_consultas
+            registro._pico = (0, 0)
+            registro.emitir('consulta_inicio', funcion=funcion.__name__, **parametros)
+        inicio = time.perf_counter()
+        error = None
+        try:
+            return funcion(*args, **kwargs)
+        except Exception as ex:
+            error = f"{type(ex).__name__}: {ex}"
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            for registro in registros:
+                fin = {'funcion': funcion.__name__, 'duracion_s': duracion,
+                       'pico_celdas': registro._pico[0], 'pico_bytes': registro._pico[1]}
+                if error is not None:
+                    fin['error'] = error
+                registro.emitir('consulta_fin', **fin)
+                registro._consulta = None
+    return envoltura
+
 def convertir_valor(valor, valores_posibles):
     """
     Convierte un valor string al tipo original según los valores posibles definidos en la red.
@@ -13,42 +157,107 @@ def convertir_valor(valor, valores_posibles):
 def obtener_probabilidad_condicional(Y, y_valor, e, red):
     """
     Obtiene P(Y=y_valor | padres(Y)) de la red bayesiana.
+    La lectura se hace sobre la red compilada (ver compilar_red).
     """
-    padres_Y = red['padres'][Y]
-    
-    # Convertir valores de padres al tipo original
-    valores_padres = []
-    for padre in padres_Y:
-        valor = e[padre]
-        valor = convertir_valor(valor, red['valores'][padre])
-        valores_padres.append(valor)
-    
-    valores_padres = tuple(valores_padres)
-    
-    # Convertir valor de Y también
-    y_valor = convertir_valor(y_valor, red['valores'][Y])
+    rc = compilar_red(red)
+    i = rc.indice[Y]
 
-    try:
-        return red['TDP'][Y][valores_padres][y_valor]
-    except KeyError:
-        print(f"DEBUG ERROR: Key error en TDP de {Y}")
-        print(f"  Padres esperados: {padres_Y}")
-        print(f"  Valores padres construidos: {valores_padres}")
-        print(f"  Claves en TDP: {list(red['TDP'][Y].keys())}")
+    # Codificar los valores de los padres y de Y como enteros
+    asignacion = {j: rc.codificar(j, e[rc.variables[j]]) for j in rc.padres_idx[i].tolist()}
+    asignacion[i] = rc.codificar(i, y_valor)
+
+    if None in asignacion.values():
+        print(f"DEBUG ERROR: Valor fuera del dominio en TDP de {Y}")
+        print(f"  Padres esperados: {rc.padres[Y]}")
+        print(f"  Valores padres recibidos: {tuple(e[p] for p in rc.padres[Y])}")
         return 0.0
+    return rc.probabilidad(i, asignacion)
 
-def inferencia_enumeracion(X, e, red):
+@_instrumentada
+def inferencia_enumeracion(X, e, red, podar=True, memo=True, tam_cache=100000, log=False, con_evidencia=False,
+                           virtual=None, do=None):
     """
     Inferencia por enumeración.
     X: Variable de consulta
     e: Evidencia (diccionario)
     red: La red bayesiana
+    podar: si es True, enumera solo sobre la red reducida de podar_red
+    memo: si es True, usa enum_aux_memo (los subárboles repetidos se calculan una vez)
+    tam_cache: número máximo de entradas de la caché LRU de enum_aux_memo
+    log: si es True, suma en espacio logarítmico (enum_aux_memo_log), sin
+         desbordamiento por abajo con mucha evidencia poco probable
+    con_evidencia: si es True devuelve (distribución, log P(e)); la poda se
+                   limita entonces a los ancestros de X y de la evidencia
+    virtual: evidencia virtual {variable: verosimilitudes} (diccionario
+             valor -> peso o secuencia en el orden del dominio); cada valor
+             de la variable se multiplica por su peso
+    do: intervenciones {variable: valor} (ver intervenir)
     """
+    red, e, verosimilitudes = _preparar_consulta(e, red, virtual, do)
+    if log or con_evidencia or verosimilitudes:
+        if podar:
+            red = _red_ancestral([X] + list(e) + list(verosimilitudes), red)
+        rc = compilar_red(red)
+        e = {k: v for k, v in e.items() if k in rc.indice}
+        asignacion = [None] * len(rc.variables)
+        for var, valor in e.items():
+            asignacion[rc.indice[var]] = rc.codificar(var, valor)
+        pesos = None
+        if verosimilitudes:
+            pesos = [None] * len(rc.variables)
+            for var, vector in verosimilitudes.items():
+                pesos[rc.indice[var]] = vector.tolist()
+        i_X = rc.indice[X]
+        codigos = range(len(rc.valores[X]))
+        if X in e:
+            codigos = [asignacion[i_X]]
+        if any(asignacion[rc.indice[var]] is None for var in e):
+            codigos = []
+
+        log_Q = dict.fromkeys(red['valores'][X], -math.inf)
+        asignacion[i_X] = 0
+        fronteras = fronteras_enumeracion(rc, asignacion)
+        cache = CacheLRU(tam_cache if memo else 0)
+        for codigo in codigos:
+            asignacion[i_X] = codigo
+            if log:
+                log_Q[rc.valores[X][codigo]] = enum_aux_memo_log(rc, asignacion, fronteras, cache, pesos=pesos)
+            else:
+                p = enum_aux_memo(rc, asignacion, fronteras, cache, pesos=pesos)
+                log_Q[rc.valores[X][codigo]] = math.log(p) if p > 0 else -math.inf
+        if _REGISTROS:
+            _emitir('enumeracion', entradas_cache=len(cache))
+        log_pe = _log_suma(log_Q.values())
+        distribucion = {x: math.exp(l - log_pe) if log_pe > -math.inf else 0.0 for x, l in log_Q.items()}
+        return (distribucion, log_pe) if con_evidencia else distribucion
+
+    if podar:
+        red, e = podar_red(X, e, red)
     Q = {}
+    if memo:
+        rc = compilar_red(red)
+        asignacion = [None] * len(rc.variables)
+        for var, valor in e.items():
+            asignacion[rc.indice[var]] = rc.codificar(var, valor)
+        if any(asignacion[rc.indice[var]] is None for var in e):
+            # Evidencia fuera del dominio: probabilidad 0
+            return {x_i: 0.0 for x_i in red['valores'][X]}
+
+        i_X = rc.indice[X]
+        asignacion[i_X] = 0
+        fronteras = fronteras_enumeracion(rc, asignacion)
+        cache = CacheLRU(tam_cache)
+        for codigo, x_i in enumerate(red['valores'][X]):
+            asignacion[i_X] = codigo
+            Q[x_i] = enum_aux_memo(rc, asignacion, fronteras, cache)
+        if _REGISTROS:
+            _emitir('enumeracion', entradas_cache=len(cache))
+        return normaliza(Q)
+
     for x_i in red['valores'][X]:
         e_extendido = e.copy()
         e_extendido[X] = x_i
-        Q[x_i] = enum_aux(red['variables'], e_extendido, red)
+        Q[x_i] = enum_aux(orden_topologico(red), e_extendido, red)
     return normaliza(Q)
 
 def enum_aux(vars, e, red):
@@ -69,6 +278,278 @@ def enum_aux(vars, e, red):
             suma += prob * enum_aux(vars[1:], e_extendido, red)
         return suma
 
+class CacheLRU:
+    """
+    Caché de tamaño acotado que descarta la entrada usada hace más tiempo.
+    """
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.datos = OrderedDict()
+
+    def obtener(self, clave):
+        """
+        Devuelve el valor guardado para la clave, o None si no está.
+        """
+        valor = self.datos.get(clave)
+        if valor is not None:
+            self.datos.move_to_end(clave)
+        return valor
+
+    def guardar(self, clave, valor):
+        self.datos[clave] = valor
+        self.datos.move_to_end(clave)
+        if len(self.datos) > self.capacidad:
+            self.datos.popitem(last=False)
+
+    def __len__(self):
+        return len(self.datos)
+
+class CacheResultados(CacheLRU):
+    """
+    Caché LRU de resultados de consultas, con caducidad opcional y contadores
+    de aciertos, fallos, desalojos y entradas caducadas. La clave incluye la
+    red compilada y su versión (ver version_red), así que una red editada con
+    las funciones de edición no reutiliza resultados anteriores. Es segura
+    entre hilos.
+    ttl: segundos de validez de cada entrada (None = sin caducidad)
+    """
+    def __init__(self, capacidad=1024, ttl=None, reloj=time.monotonic):
+        super().__init__(capacidad)
+        self.ttl = ttl
+        self.reloj = reloj
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.caducadas = 0
+        self._candado = threading.Lock()
+
+    def obtener(self, clave):
+        """
+        Devuelve el valor guardado para la clave, o None si no está o caducó.
+        """
+        with self._candado:
+            entrada = self.datos.get(clave)
+            if entrada is not None and entrada[1] is not None and self.reloj() >= entrada[1]:
+                del self.datos[clave]
+                self.caducadas += 1
+                entrada = None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self.datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave, valor):
+        vence = None if self.ttl is None else self.reloj() + self.ttl
+        with self._candado:
+            self.datos[clave] = (valor, vence)
+            self.datos.move_to_end(clave)
+            while len(self.datos) > self.capacidad:
+                self.datos.popitem(last=False)
+                self.desalojos += 1
+
+    def __getstate__(self):
+        # El candado no se puede serializar; se crea uno nuevo al deserializar
+        estado = self.__dict__.copy()
+        del estado['_candado']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._candado = threading.Lock()
+
+    def limpiar(self):
+        """
+        Vacía la caché (los contadores se conservan).
+        """
+        with self._candado:
+            self.datos.clear()
+
+    def estadisticas(self):
+        """
+        Contadores de la caché y tasa de aciertos.
+        """
+        consultas = self.aciertos + self.fallos
+        return {
+            'entradas': len(self.datos),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'caducadas': self.caducadas,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+        }
+
+    def consultar(self, funcion, *args, **kwargs):
+        """
+        Devuelve funcion(*args, **kwargs) desde la caché si la misma consulta
+        ya se hizo sobre la misma versión de la red. Sirve para cualquier
+        consulta que reciba la red en un parámetro `red` (p. ej.
+        inferencia_eliminacion_variables, inferencia_lote, mpe, map_marginal o
+        log_probabilidad_evidencia). La clave se arma con los argumentos ya
+        asociados a la firma de la función (con sus valores por defecto): la
+        red entra por su id y versión, la evidencia `e` por los códigos de sus
+        valores y el resto en forma canónica (ver _canonico). Se devuelve una
+        copia, que el llamador puede modificar.
+        """
+        argumentos = inspect.signature(funcion).bind(*args, **kwargs)
+        argumentos.apply_defaults()
+        if 'red' not in argumentos.arguments:
+            raise ValueError(f"{funcion.__name__} no recibe un parámetro 'red'; no se puede guardar en la caché")
+        red = argumentos.arguments['red']
+        rc = compilar_red(red)
+        partes = []
+        for nombre, valor in argumentos.arguments.items():
+            if nombre == 'red':
+                continue
+            if nombre == 'e' and isinstance(valor, dict):
+                partes.append((nombre, _evidencia_canonica(rc, valor)))
+            elif nombre == 'evidencias' and isinstance(valor, (list, tuple)) and all(isinstance(f, dict) for f in valor):
+                partes.append((nombre, tuple(_evidencia_canonica(rc, f) for f in valor)))
+            else:
+                partes.append((nombre, _canonico(valor)))
+        clave = (id(rc), version_red(red), funcion.__module__, funcion.__qualname__, tuple(partes))
+        try:
+            hash(clave)
+        except TypeError:
+            raise ValueError(f"Los argumentos de {funcion.__name__} no se pueden usar como clave de la caché") from None
+        resultado = self.obtener(clave)
+        if resultado is None:
+            resultado = funcion(*args, **kwargs)
+            # La entrada guarda la red compilada para que su id no se reutilice mientras exista
+            self.guardar(clave, (resultado, rc))
+        else:
+            resultado = resultado[0]
+        return copy.deepcopy(resultado)
+
+def _canonico(valor):
+    """
+    Forma hashable e independiente del orden de un parámetro de consulta.
+    """
+    if isinstance(valor, dict):
+        return tuple(sorted(((str(k), _canonico(v)) for k, v in valor.items()), key=lambda par: par[0]))
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return tuple(_canonico(v) for v in valor)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+def _evidencia_canonica(rc, e):
+    """
+    Evidencia como tupla ordenada de (variable, código del valor); los valores
+    que no se pueden codificar se conservan como texto.
+    """
+    canonica = []
+    for var, valor in e.items():
+        codigo = rc.codificar(var, valor) if var in rc.indice else None
+        canonica.append((var, codigo) if codigo is not None else (var, ('?', str(valor))))
+    return tuple(sorted(canonica, key=lambda par: str(par[0])))
+
+def fronteras_enumeracion(rc, asignacion):
+    """
+    Para cada posición k del orden topológico de la red compilada devuelve los
+    índices de las variables cuyo valor determina la suma de enum_aux_memo
+    desde k: los padres de las variables k.. que están antes de k y las
+    variables observadas (asignacion no nula) desde k.
+    """
+    orden = rc.topologico
+    n = len(orden)
+    fronteras = []
+    for k in range(n + 1):
+        anteriores = set(orden[:k])
+        frontera = {j for j in orden[k:] if asignacion[j] is not None}
+        for j in orden[k:]:
+            frontera.update(p for p in rc._padres_lista[j] if p in anteriores)
+        fronteras.append(tuple(sorted(frontera)))
+    return fronteras
+
+def enum_aux_memo(rc, asignacion, fronteras, cache, k=0, pesos=None):
+    """
+    Versión memorizada de enum_aux sobre una red compilada. Recorre las
+    variables en orden topológico desde la posición k asignando códigos
+    enteros en el lugar (sin copias) y guarda cada subtotal en `cache` con la
+    clave (k, valores de fronteras[k]).
+    pesos: lista opcional, por índice de variable, con las verosimilitudes de
+           la evidencia virtual (o None)
+    """
+    if k == len(asignacion):
+        return 1.0
+
+    clave = (k, tuple(asignacion[j] for j in fronteras[k]))
+    resultado = cache.obtener(clave)
+    if resultado is not None:
+        return resultado
+
+    i = rc.topologico[k]
+    peso = pesos[i] if pesos is not None else None
+    if asignacion[i] is not None:
+        prob = rc.probabilidad(i, asignacion)
+        if peso is not None:
+            prob *= peso[asignacion[i]]
+        resultado = prob * enum_aux_memo(rc, asignacion, fronteras, cache, k + 1, pesos) if prob else 0.0
+    else:
+        resultado = 0.0
+        for codigo in range(rc.cardinalidades[i]):
+            asignacion[i] = codigo
+            prob = rc.probabilidad(i, asignacion)
+            if peso is not None:
+                prob *= peso[codigo]
+            if prob:
+                resultado += prob * enum_aux_memo(rc, asignacion, fronteras, cache, k + 1, pesos)
+        asignacion[i] = None
+
+    cache.guardar(clave, resultado)
+    return resultado
+
+def _log_suma(log_valores):
+    """
+    log(sum(exp(v))) sin desbordamiento (log-sum-exp).
+    """
+    log_valores = list(log_valores)
+    maximo = max(log_valores, default=-math.inf)
+    if maximo == -math.inf:
+        return -math.inf
+    return maximo + math.log(sum(math.exp(v - maximo) for v in log_valores))
+
+def enum_aux_memo_log(rc, asignacion, fronteras, cache, k=0, pesos=None):
+    """
+    enum_aux_memo en espacio logarítmico: devuelve el logaritmo de la suma y
+    combina los términos con log-sum-exp, por lo que el resultado no se anula
+    aunque el producto de probabilidades sea menor que el menor float.
+    """
+    if k == len(asignacion):
+        return 0.0
+
+    clave = (k, tuple(asignacion[j] for j in fronteras[k]))
+    resultado = cache.obtener(clave)
+    if resultado is not None:
+        return resultado
+
+    i = rc.topologico[k]
+    peso = pesos[i] if pesos is not None else None
+    if asignacion[i] is not None:
+        prob = rc.probabilidad(i, asignacion)
+        if peso is not None:
+            prob *= peso[asignacion[i]]
+        if prob > 0:
+            resultado = math.log(prob) + enum_aux_memo_log(rc, asignacion, fronteras, cache, k + 1, pesos)
+        else:
+            resultado = -math.inf
+    else:
+        terminos = []
+        for codigo in range(rc.cardinalidades[i]):
+            asignacion[i] = codigo
+            prob = rc.probabilidad(i, asignacion)
+            if peso is not None:
+                prob *= peso[codigo]
+            if prob > 0:
+                terminos.append(math.log(prob) + enum_aux_memo_log(rc, asignacion, fronteras, cache, k + 1, pesos))
+        asignacion[i] = None
+        resultado = _log_suma(terminos)
+
+    cache.guardar(clave, resultado)
+    return resultado
+
 def normaliza(Q):
     total = sum(Q.values())
     return {k: v / total if total > 0 else 0.0 for k, v in Q.items()}
@@ -81,12 +562,38 @@ def crear_red_bayesiana():
         'TDP': {}
     }
 
+def version_red(red):
+    """
+    Número de versión de la red; aumenta cada vez que las funciones de
+    edición (agregar_variable, establecer_padres, establecer_probabilidad,
+    eliminar_variable) la modifican.
+    """
+    if isinstance(red, RedCompilada):
+        return red.version
+    return red.get('_version', 0)
+
+def _cache_red(red):
+    """
+    Diccionario de resultados precalculados (árbol de uniones, etc.) asociado a la red.
+    Se vacía en cada modificación de la red.
+    """
+    if isinstance(red, RedCompilada):
+        return red.cache
+    if '_cache' not in red:
+        red['_cache'] = {}
+    return red['_cache']
+
+def _invalidar_cache(red):
+    red['_version'] = version_red(red) + 1
+    red['_cache'] = {}
+
 def agregar_variable(red, nombre, valores_posibles):
     if nombre not in red['variables']:
         red['variables'].append(nombre)
         red['valores'][nombre] = valores_posibles
         red['padres'][nombre] = []
         red['TDP'][nombre] = {}
+        _invalidar_cache(red)
 
 def establecer_padres(red, variable, padres):
     if variable not in red['variables']:
@@ -94,8 +601,13 @@ def establecer_padres(red, variable, padres):
     for padre in padres:
         if padre not in red['variables']:
             return
+    if variable in ancestros(padres, red):
+        print(f"ERROR: Los padres {padres} de {variable} formarían un ciclo")
+        return
     red['padres'][variable] = padres
     red['TDP'][variable] = {}
+    red.get('compactas', {}).pop(variable, None)
+    _invalidar_cache(red)
 
 def establecer_probabilidad(red, variable, valores_padres, probabilidades):
     if variable not in red['variables']:
@@ -136,19 +648,64 @@ def establecer_probabilidad(red, variable, valores_padres, probabilidades):
         red['TDP'][variable] = {}
     
     red['TDP'][variable][valores_padres_convertidos] = probabilidades_convertidas
+    red.get('compactas', {}).pop(variable, None)
+    _invalidar_cache(red)
     # print(f"DEBUG: Guardado {variable} -> {valores_padres_convertidos}: {probabilidades_convertidas}")
 
+def establecer_tabla(red, variable, tabla):
+    """
+    Reemplaza la TDP completa de `variable` a partir de un arreglo con ejes
+    (padres..., variable) en el orden de red['valores'].
+    """
+    if variable not in red['variables']:
+        print(f"ERROR: Variable {variable} no existe")
+        return
+    padres = red['padres'][variable]
+    forma = tuple(len(red['valores'][v]) for v in padres + [variable])
+    tabla = np.asarray(tabla, dtype=float)
+    if tabla.shape != forma:
+        print(f"ERROR: La tabla de {variable} tiene forma {tabla.shape}, se esperaba {forma}")
+        return
+
+    tdp = {}
+    for comb in itertools.product(*[range(n) for n in forma[:-1]]):
+        clave = tuple(red['valores'][p][k] for p, k in zip(padres, comb))
+        tdp[clave] = dict(zip(red['valores'][variable], tabla[comb].tolist()))
+    red['TDP'][variable] = tdp
+    red.get('compactas', {}).pop(variable, None)
+    _invalidar_cache(red)
+
+def establecer_tdp_compacta(red, variable, tdp):
+    """
+    Asigna a `variable` una TDP compacta (TDPRuidoMax, TDPArbol, TDPReglas o
+    TDPDeterminista) en lugar de la tabla completa. Se guarda una copia
+    vinculada a los padres actuales de la variable.
+    """
+    if variable not in red['variables']:
+        print(f"ERROR: Variable {variable} no existe")
+        return
+    try:
+        vinculada = copy.copy(tdp).vincular(variable, red['padres'][variable], red['valores'])
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return
+    red.setdefault('compactas', {})[variable] = vinculada
+    red['TDP'][variable] = {}
+    _invalidar_cache(red)
+
 def eliminar_variable(red, nombre):
     if nombre in red['variables']:
         red['variables'].remove(nombre)
         del red['valores'][nombre]
         del red['padres'][nombre]
         del red['TDP'][nombre]
+        red.get('compactas', {}).pop(nombre, None)
         
         # Eliminar de padres de otras variables
         for var in red['variables']:
             if nombre in red['padres'][var]:
                 red['padres'][var].remove(nombre)
+                red.get('compactas', {}).pop(var, None)
                 # También eliminar entradas en TDP relacionadas
                 nuevas_tdp = {}
                 for key, prob_dict in red['TDP'][var].items():
@@ -160,188 +717,2390 @@ def eliminar_variable(red, nombre):
                         nueva_key = key
                     nuevas_tdp[nueva_key] = prob_dict
                 red['TDP'][var] = nuevas_tdp
+        _invalidar_cache(red)
 
 def obtener_nodos(red):
     return red['variables']
 
+def obtener_hijos(red, variable):
+    return _hijos(red)[variable]
+
+def _ordenar_topologicamente(variables, padres):
+    """
+    Orden topológico de `variables` según `padres` (variable -> padres).
+    Entre las variables disponibles se toma siempre la que aparece antes en
+    `variables`, de modo que un orden que ya es topológico no cambia.
+    Lanza ValueError si hay un ciclo.
+    """
+    posicion = {v: k for k, v in enumerate(variables)}
+    pendientes = [0] * len(posicion)
+    hijos = [[] for _ in posicion]
+    for v, k in posicion.items():
+        for p in padres[v]:
+            if p in posicion:
+                pendientes[k] += 1
+                hijos[posicion[p]].append(k)
+    disponibles = [k for k, n in enumerate(pendientes) if n == 0]
+    heapq.heapify(disponibles)
+    orden = []
+    while disponibles:
+        k = heapq.heappop(disponibles)
+        orden.append(k)
+        for h in hijos[k]:
+            pendientes[h] -= 1
+            if pendientes[h] == 0:
+                heapq.heappush(disponibles, h)
+    if len(orden) < len(posicion):
+        ciclo = [v for v, k in posicion.items() if pendientes[k] > 0]
+        raise ValueError(f"La red tiene un ciclo (variables afectadas: {ciclo})")
+    return [variables[k] for k in orden]
+
+def orden_topologico(red):
+    """
+    Variables de la red en orden topológico (cada una después de sus padres).
+    Se guarda en la caché de la red hasta la siguiente modificación.
+    Lanza ValueError si la red tiene un ciclo.
+    """
+    if isinstance(red, RedCompilada):
+        return [red.variables[i] for i in red.topologico]
+    cache = _cache_red(red)
+    if 'topologico' not in cache:
+        cache['topologico'] = _ordenar_topologicamente(list(red['variables']), red['padres'])
+    return cache['topologico']
+
 
 # ==========================================
-# Implementación de Eliminación de Variables
+# TDP compactas (ruido-MAX, deterministas, árboles)
 # ==========================================
 
-class Factor:
+class TDPCompacta:
     """
-    Clase para representar un factor en el algoritmo de eliminación de variables.
+    Base de las TDP que no se guardan como tabla completa. Se describen con
+    nombres de valores y vincular() las prepara para una variable concreta;
+    desde ese momento trabajan con códigos enteros:
+      probabilidades(codigos_padres): P(variable | padres) para cada fila
+      factores(): descomposición en factores pequeños para eliminación de
+                  variables, que puede usar una variable auxiliar (auxiliares())
+      probabilidad(codigos_padres, codigo): una sola celda, para la
+                  enumeración y obtener_probabilidad_condicional
+    tabla() expande la TDP completa; solo la usan los motores que no
+    aprovechan la estructura.
     """
-    def __init__(self, vars, cpt):
-        self.vars = vars
-        self.cpt = cpt
+    def vincular(self, var, padres, valores):
+        self.var = var
+        self.padres = list(padres)
+        self.valores = {v: list(valores[v]) for v in self.padres + [var]}
+        self.cardinalidades = [len(self.valores[p]) for p in self.padres]
+        self.card = len(self.valores[var])
+        self._preparar()
+        return self
 
-    def pointwise_product(self, other, red):
+    def _preparar(self):
+        pass
+
+    def _codigo(self, var, valor):
+        valores = self.valores[var]
+        valor = convertir_valor(valor, valores)
+        if valor not in valores:
+            raise ValueError(f"Valor {valor!r} fuera del dominio de {var} (TDP de {self.var})")
+        return valores.index(valor)
+
+    def probabilidades(self, codigos_padres):
         """
-        Multiplica este factor con otro factor.
+        Arreglo (n, |dom(var)|) con P(var | padres) para cada fila de
+        codigos_padres (n, número de padres).
         """
-        # Variables unidas
-        new_vars = list(set(self.vars) | set(other.vars))
-        new_cpt = {}
+        raise NotImplementedError
 
-        # Iterar sobre todas las combinaciones de valores para las nuevas variables
-        # Esto es simplificado; para una implementación robusta se necesita un iterador de combinaciones
-        all_values = []
-        import itertools
-        
-        # Obtener dominios de las variables
-        dominios = [red['valores'][v] for v in new_vars]
-        
-        for combination in itertools.product(*dominios):
-            # Crear asignación
-            asignacion = dict(zip(new_vars, combination))
-            
-            # Obtener valor de self
-            key_self = tuple(asignacion[v] for v in self.vars)
-            val_self = self.cpt.get(key_self, 0.0)
-            
-            # Obtener valor de other
-            key_other = tuple(asignacion[v] for v in other.vars)
-            val_other = other.cpt.get(key_other, 0.0)
-            
-            # Multiplicar
-            new_cpt[tuple(combination)] = val_self * val_other
-            
-        return Factor(new_vars, new_cpt)
+    def probabilidad(self, codigos_padres, codigo):
+        """
+        P(var = codigo | padres = codigos_padres). Por defecto pasa por
+        probabilidades() con una fila, que cuesta crear arreglos en cada
+        celda; las subclases lo evalúan con escalares, porque la enumeración
+        lo llama una vez por celda visitada.
+        """
+        return float(self.probabilidades(np.array([codigos_padres], dtype=np.int64).reshape(1, -1))[0, codigo])
 
-    def sum_out(self, var, red):
+    def auxiliares(self):
         """
-        Suma fuera la variable var de este factor.
+        Variables auxiliares de factores(): nombre -> cardinalidad.
         """
-        if var not in self.vars:
-            return self
-        
-        vars_restantes = [v for v in self.vars if v != var]
-        new_cpt = {}
-        
-        # Iterar sobre las combinaciones de las variables restantes
-        import itertools
-        dominios = [red['valores'][v] for v in vars_restantes]
-        
-        for combination in itertools.product(*dominios):
-            asignacion_base = dict(zip(vars_restantes, combination))
-            suma = 0.0
-            
-            # Sumar sobre todos los valores de la variable a eliminar
-            for val_elim in red['valores'][var]:
-                asignacion_completa = asignacion_base.copy()
-                asignacion_completa[var] = val_elim
-                
-                # Reconstruir clave para self.cpt
-                key_self = tuple(asignacion_completa[v] for v in self.vars)
-                suma += self.cpt.get(key_self, 0.0)
-            
-            new_cpt[tuple(combination)] = suma
-            
-        return Factor(vars_restantes, new_cpt)
+        return {}
 
-def make_factor(var, e, red):
+    def factores(self):
+        """
+        Lista de (variables, tabla) cuyo producto, sumando las variables
+        auxiliares, es la TDP.
+        """
+        return [(self.padres + [self.var], self.tabla())]
+
+    def tabla(self):
+        """
+        TDP expandida con ejes (padres..., var).
+        """
+        combinaciones = np.indices(self.cardinalidades, dtype=np.int64).reshape(len(self.padres), -1).T
+        return self.probabilidades(combinaciones).reshape(self.cardinalidades + [self.card])
+
+    def a_json(self):
+        raise ValueError(f"La TDP de {self.var} no se puede guardar en JSON")
+
+class TDPRuidoMax(TDPCompacta):
     """
-    Crea un factor inicial para una variable dada la evidencia.
+    Ruido-MAX: var = max(Z_0, Z_1, ..., Z_n) según el orden de sus valores,
+    donde Z_0 es la fuga y Z_i depende solo del padre i.
+    activacion: {padre: {valor_padre: {valor_var: probabilidad}}} con la
+                distribución de Z_i; los valores de padre no indicados dejan
+                Z_i en el menor valor (no influyen)
+    fuga: distribución de Z_0 (por defecto, el menor valor con probabilidad 1)
+    orden: valores de la variable de menor a mayor (por defecto red['valores'])
+    Con dos valores es el ruido-OR (ver ruido_or).
     """
-    vars_factor = red['padres'][var] + [var]
-    cpt_factor = {}
-    
-    # Iterar sobre todas las combinaciones de var y sus padres
-    import itertools
-    dominios = [red['valores'][v] for v in vars_factor]
-    
-    for combination in itertools.product(*dominios):
-        asignacion = dict(zip(vars_factor, combination))
-        
-        # Verificar coherencia con evidencia
-        consistente = True
-        for k, v in asignacion.items():
-            if k in e and e[k] != v:
-                consistente = False
-                break
-        
-        if consistente:
-            # Obtener probabilidad de la TDP
-            val_padres = tuple(asignacion[p] for p in red['padres'][var])
-            val_var = asignacion[var]
-            
-            # Usar la función existente para obtener valor crudo
-            try:
-                prob = red['TDP'][var][val_padres][val_var]
-            except KeyError:
-                prob = 0.0
-            
-            cpt_factor[tuple(combination)] = prob
-        else:
-            cpt_factor[tuple(combination)] = 0.0
-            
-    return Factor(vars_factor, cpt_factor)
+    def __init__(self, activacion, fuga=None, orden=None):
+        self.activacion = activacion
+        self.fuga = fuga
+        self.orden = orden
+
+    def _distribucion(self, probs):
+        fila = np.zeros(self.card)
+        for valor, p in probs.items():
+            fila[self.rango[self._codigo(self.var, valor)]] = p
+        if abs(fila.sum() - 1.0) > 0.01:
+            raise ValueError(f"Distribución {probs} de {self.var}: suma {fila.sum()}, se esperaba 1.0")
+        return fila
+
+    def _preparar(self):
+        orden = self.valores[self.var] if self.orden is None else self.orden
+        if sorted(self._codigo(self.var, v) for v in orden) != list(range(self.card)):
+            raise ValueError(f"El orden {orden} no contiene todos los valores de {self.var}")
+        # rango[código] = posición del valor en el orden
+        self.rango = np.zeros(self.card, dtype=np.int64)
+        for k, valor in enumerate(orden):
+            self.rango[self._codigo(self.var, valor)] = k
+
+        base = np.zeros(self.card)
+        base[0] = 1.0
+        fuga = base if self.fuga is None else self._distribucion(self.fuga)
+        self.acumulada_fuga = np.cumsum(fuga)
+        # acumuladas[i][x, k] = P(Z_i <= k-ésimo valor | padre i = x)
+        self.acumuladas = []
+        for padre, cardinalidad in zip(self.padres, self.cardinalidades):
+            filas = np.tile(base, (cardinalidad, 1))
+            for valor, probs in self.activacion.get(padre, {}).items():
+                filas[self._codigo(padre, valor)] = self._distribucion(probs)
+            self.acumuladas.append(np.cumsum(filas, axis=1))
+        for padre in self.activacion:
+            if padre not in self.padres:
+                raise ValueError(f"{padre} no es padre de {self.var}")
+        # Copias en listas de Python para probabilidad()
+        self._rango_lista = self.rango.tolist()
+        self._fuga_lista = self.acumulada_fuga.tolist()
+        self._acumuladas_lista = [tabla.tolist() for tabla in self.acumuladas]
+
+    def probabilidades(self, codigos_padres):
+        acumulada = np.tile(self.acumulada_fuga, (len(codigos_padres), 1))
+        for k, tabla in enumerate(self.acumuladas):
+            acumulada *= tabla[codigos_padres[:, k]]
+        por_rango = np.diff(acumulada, axis=1, prepend=0.0)
+        return np.maximum(por_rango[:, self.rango], 0.0)
+
+    def probabilidad(self, codigos_padres, codigo):
+        # P(Y = y) = F(rango de y) - F(rango anterior), con F = producto de las acumuladas
+        k = self._rango_lista[codigo]
+        hasta = self._fuga_lista[k]
+        antes = self._fuga_lista[k - 1] if k > 0 else 0.0
+        for tabla, c in zip(self._acumuladas_lista, codigos_padres):
+            fila = tabla[c]
+            hasta *= fila[k]
+            if k > 0:
+                antes *= fila[k - 1]
+        return max(hasta - antes, 0.0)
+
+    def auxiliares(self):
+        return {self.var + '#aux': self.card}
+
+    def factores(self):
+        # Factorización multiplicativa (Díez y Galán, 2003):
+        # P(y | x) = sum_a D(y, a) * F_0(a) * prod_i F_i(x_i, a), con F las acumuladas
+        # y D(y, a) = 1 si a es el rango de y, -1 si es el rango anterior.
+        aux = self.var + '#aux'
+        diferencia = np.zeros((self.card, self.card))
+        for codigo, k in enumerate(self.rango):
+            diferencia[codigo, k] = 1.0
+            if k > 0:
+                diferencia[codigo, k - 1] = -1.0
+        factores = [([self.var, aux], diferencia * self.acumulada_fuga)]
+        factores += [([p, aux], tabla) for p, tabla in zip(self.padres, self.acumuladas)]
+        return factores
 
-def inferencia_eliminacion_variables(X, e, red):
+    def a_json(self):
+        return {'tipo': 'ruido_max', 'activacion': self.activacion, 'fuga': self.fuga, 'orden': self.orden}
+
+def ruido_or(probabilidades, estados, fuga=0.0):
     """
-    Inferencia por eliminación de variables.
+    TDP ruido-OR para una variable con valores estados = (inactivo, activo).
+    probabilidades: {padre: {valor_padre: p}}, donde p es la probabilidad de
+                    que ese valor del padre, por sí solo, active la variable
+    fuga: probabilidad de activación sin ninguna causa presente
     """
-    # 1. Identificar variables ocultas (ni consulta ni evidencia)
-    vars_ocultas = [v for v in red['variables'] if v != X and v not in e]
-    
-    # 2. Crear factores iniciales
-    factores = []
-    for var in red['variables']:
-        factores.append(make_factor(var, e, red))
-        
-    # 3. Eliminar variables ocultas una por una
-    for var in vars_ocultas:
-        # Encontrar factores que mencionan var
-        factores_con_var = [f for f in factores if var in f.vars]
-        factores_sin_var = [f for f in factores if var not in f.vars]
-        
-        if not factores_con_var:
-            continue
-            
-        # Multiplicar todos los factores que contienen var
+    inactivo, activo = estados
+    activacion = {
+        padre: {valor: {activo: p, inactivo: 1.0 - p} for valor, p in causas.items()}
+        for padre, causas in probabilidades.items()
+    }
+    return TDPRuidoMax(activacion, {activo: fuga, inactivo: 1.0 - fuga}, [inactivo, activo])
+
+def maximo_determinista(correspondencia, orden=None):
+    """
+    TDP determinista var = max_i f_i(padre_i), con f_i dada por
+    correspondencia = {padre: {valor_padre: valor_var}} y el máximo según
+    `orden` (de menor a mayor). Con el orden invertido es el mínimo; con dos
+    valores, el OR o el AND.
+    """
+    activacion = {
+        padre: {valor: {valor_var: 1.0} for valor, valor_var in tabla.items()}
+        for padre, tabla in correspondencia.items()
+    }
+    return TDPRuidoMax(activacion, orden=orden)
+
+class TDPDeterminista(TDPCompacta):
+    """
+    TDP determinista var = funcion(valores de los padres...), con una función
+    de Python arbitraria. Se evalúa fila a fila (sin tabla) en el muestreo y
+    la enumeración; la eliminación de variables la expande. Para máximos y
+    mínimos conviene maximo_determinista, que sí se descompone.
+    """
+    def __init__(self, funcion):
+        self.funcion = funcion
+
+    def probabilidades(self, codigos_padres):
+        resultado = np.zeros((len(codigos_padres), self.card))
+        if len(codigos_padres) == 0:
+            return resultado
+        unicas, inversa = np.unique(codigos_padres.reshape(len(codigos_padres), -1), axis=0, return_inverse=True)
+        codigos = np.array([
+            self._codigo(self.var, self.funcion(*[self.valores[p][c] for p, c in zip(self.padres, fila)]))
+            for fila in unicas.tolist()
+        ], dtype=np.int64)
+        resultado[np.arange(len(codigos_padres)), codigos[inversa.reshape(-1)]] = 1.0
+        return resultado
+
+    def probabilidad(self, codigos_padres, codigo):
+        valor = self.funcion(*[self.valores[p][c] for p, c in zip(self.padres, codigos_padres)])
+        return 1.0 if self._codigo(self.var, valor) == codigo else 0.0
+
+class TDPArbol(TDPCompacta):
+    """
+    TDP con independencias específicas de contexto, como árbol de decisión.
+    Un nodo interno es {'padre': nombre, 'ramas': {valor_padre: subárbol}}
+    (la rama '*' cubre los valores no indicados) y una hoja es la distribución
+    {valor_var: probabilidad}. Los padres que no aparecen en una rama no
+    influyen en ella, y el costo es lineal en el número de hojas.
+    """
+    def __init__(self, arbol):
+        self.arbol = arbol
+
+    def _preparar(self):
+        hojas = []
+        # Cada hoja guarda, por padre evaluado, los códigos permitidos en su rama
+        pendientes = [(self.arbol, {})]
+        while pendientes:
+            nodo, contexto = pendientes.pop()
+            if not (isinstance(nodo, dict) and 'padre' in nodo):
+                hojas.append((contexto, nodo))
+                continue
+            padre = nodo['padre']
+            if padre not in self.padres:
+                raise ValueError(f"{padre} no es padre de {self.var}")
+            permitidos = contexto.get(padre, set(range(len(self.valores[padre]))))
+            explicitos = {self._codigo(padre, v): sub for v, sub in nodo['ramas'].items() if v != '*'}
+            for codigo, sub in explicitos.items():
+                if codigo in permitidos:
+                    pendientes.append((sub, {**contexto, padre: {codigo}}))
+            resto = permitidos - set(explicitos)
+            if resto:
+                if '*' not in nodo['ramas']:
+                    faltantes = [self.valores[padre][c] for c in sorted(resto)]
+                    raise ValueError(f"El árbol de {self.var} no cubre {padre} = {faltantes}")
+                pendientes.append((nodo['ramas']['*'], {**contexto, padre: resto}))
+
+        self.distribuciones = np.zeros((len(hojas), self.card))
+        for k, (_, probs) in enumerate(hojas):
+            for valor, p in probs.items():
+                self.distribuciones[k, self._codigo(self.var, valor)] = p
+            if abs(self.distribuciones[k].sum() - 1.0) > 0.01:
+                raise ValueError(f"Hoja {probs} de {self.var}: suma {self.distribuciones[k].sum()}, se esperaba 1.0")
+        # indicadores[padre][hoja, x] = 1 si la hoja admite padre = x
+        self.indicadores = {}
+        for k, (contexto, _) in enumerate(hojas):
+            for padre, permitidos in contexto.items():
+                if padre not in self.indicadores:
+                    self.indicadores[padre] = np.ones((len(hojas), len(self.valores[padre])))
+                fila = self.indicadores[padre][k]
+                fila[:] = 0.0
+                fila[list(permitidos)] = 1.0
+        # Para probabilidad(): por padre y valor, máscara de bits de las hojas que lo admiten
+        self._mascaras = [
+            (self.padres.index(padre), [sum(1 << k for k in np.flatnonzero(columna).tolist())
+                                        for columna in indicador.T])
+            for padre, indicador in self.indicadores.items()
+        ]
+        self._distribuciones_lista = self.distribuciones.tolist()
+
+    def probabilidades(self, codigos_padres):
+        coincide = np.ones((len(codigos_padres), len(self.distribuciones)))
+        for padre, indicador in self.indicadores.items():
+            coincide *= indicador.T[codigos_padres[:, self.padres.index(padre)]]
+        return self.distribuciones[coincide.argmax(axis=1)]
+
+    def probabilidad(self, codigos_padres, codigo):
+        coincide = -1
+        for j, mascaras in self._mascaras:
+            coincide &= mascaras[codigos_padres[j]]
+        # Las ramas son disjuntas: queda una sola hoja (la de menor índice, como argmax)
+        hoja = (coincide & -coincide).bit_length() - 1
+        return self._distribuciones_lista[hoja][codigo]
+
+    def auxiliares(self):
+        return {self.var + '#aux': len(self.distribuciones)}
+
+    def factores(self):
+        # Las ramas son disjuntas: para cada combinación de padres solo una hoja
+        # tiene todos sus indicadores en 1 (también vale para max-producto).
+        aux = self.var + '#aux'
+        factores = [([aux, self.var], self.distribuciones)]
+        factores += [([aux, padre], indicador) for padre, indicador in self.indicadores.items()]
+        return factores
+
+    def a_json(self):
+        return {'tipo': 'arbol', 'arbol': self.arbol}
+
+class TDPReglas(TDPArbol):
+    """
+    TDP por reglas: lista de (contexto, distribución), con contexto
+    {padre: valor}; se aplica la primera regla cuyo contexto se cumple y, si
+    ninguna, la distribución `defecto`. Se convierte en un TDPArbol.
+    """
+    def __init__(self, reglas, defecto):
+        self.reglas = reglas
+        self.defecto = defecto
+
+    def _arbol(self, reglas):
+        if not reglas:
+            return self.defecto
+        contexto, distribucion = reglas[0]
+        if not contexto:
+            return distribucion
+        padre = next(iter(contexto))
+        if padre not in self.padres:
+            raise ValueError(f"{padre} no es padre de {self.var}")
+        ramas = {}
+        for valor in self.valores[padre]:
+            restantes = []
+            for ctx, dist in reglas:
+                if padre not in ctx:
+                    restantes.append((ctx, dist))
+                elif convertir_valor(ctx[padre], self.valores[padre]) == valor:
+                    restantes.append(({p: v for p, v in ctx.items() if p != padre}, dist))
+            ramas[valor] = self._arbol(restantes)
+        return {'padre': padre, 'ramas': ramas}
+
+    def _preparar(self):
+        self.arbol = self._arbol([(dict(ctx), dist) for ctx, dist in self.reglas])
+        super()._preparar()
+
+    def a_json(self):
+        return {'tipo': 'reglas', 'reglas': [[ctx, dist] for ctx, dist in self.reglas], 'defecto': self.defecto}
+
+def tdp_desde_json(datos):
+    """
+    Construye una TDP compacta a partir de su descripción a_json().
+    """
+    tipo = datos.get('tipo')
+    if tipo == 'ruido_max':
+        return TDPRuidoMax(datos['activacion'], datos.get('fuga'), datos.get('orden'))
+    if tipo == 'arbol':
+        return TDPArbol(datos['arbol'])
+    if tipo == 'reglas':
+        return TDPReglas([(ctx, dist) for ctx, dist in datos['reglas']], datos['defecto'])
+    raise ValueError(f"Tipo de TDP compacta desconocido: {tipo}")
+
+def _compactas(red):
+    """
+    Diccionario variable -> TDP compacta vinculada de la red.
+    """
+    if isinstance(red, RedCompilada):
+        return {red.variables[i]: t for i, t in red.compactas.items()}
+    return red.get('compactas', {})
+
+def variables_auxiliares(red, vars=None):
+    """
+    Variables auxiliares de las TDP compactas de `vars` (por defecto todas):
+    nombre -> cardinalidad.
+    """
+    auxiliares = {}
+    for var, tdp in _compactas(red).items():
+        if vars is None or var in vars:
+            auxiliares.update(tdp.auxiliares())
+    return auxiliares
+
+
+# ==========================================
+# Red compilada (representación con enteros)
+# ==========================================
+
+class RedCompilada:
+    """
+    Representación inmutable de una red bayesiana para los motores de inferencia.
+    Los valores de cada variable se codifican como enteros (su posición en el
+    dominio), los padres se guardan como arreglos de índices y cada TDP como un
+    arreglo plano y contiguo con ejes (padres..., variable) y pasos precalculados.
+    Se puede consultar como el diccionario de la red (red['variables'],
+    red['valores'], red['padres'], red['TDP'], red['compactas']) pero no
+    modificar. Las TDP compactas (ver TDPCompacta) se pasan en `tablas` tal
+    cual; su arreglo plano solo se expande si algún motor lo lee.
+    """
+    def __init__(self, variables, valores, padres, tablas, version=0):
+        self.variables = tuple(variables)
+        self.indice = {v: i for i, v in enumerate(self.variables)}
+        self.valores = {v: list(valores[v]) for v in self.variables}
+        self.padres = {v: list(padres[v]) for v in self.variables}
+        self.cardinalidades = np.array([len(self.valores[v]) for v in self.variables], dtype=np.int64)
+        self.padres_idx = [np.array([self.indice[p] for p in self.padres[v]], dtype=np.int64)
+                           for v in self.variables]
+        self.version = version
+        self.cache = {}
+        self.topologico = tuple(self.indice[v] for v in _ordenar_topologicamente(self.variables, self.padres))
+
+        self.compactas = {}
+        self.tablas = _TablasRed(self.compactas)
+        self.pasos = []
+        for i, v in enumerate(self.variables):
+            forma = [int(self.cardinalidades[j]) for j in self.padres_idx[i]] + [int(self.cardinalidades[i])]
+            if isinstance(tablas[i], TDPCompacta):
+                self.compactas[i] = tablas[i]
+                tabla = None
+            else:
+                tabla = np.ascontiguousarray(tablas[i], dtype=np.float64).reshape(-1)
+                tabla.flags.writeable = False
+                if tabla.size != int(np.prod(forma)):
+                    raise ValueError(f"La TDP de {v} tiene {tabla.size} celdas, se esperaban {int(np.prod(forma))}")
+            pasos = [1] * len(forma)
+            for k in range(len(forma) - 2, -1, -1):
+                pasos[k] = pasos[k + 1] * forma[k + 1]
+            self.tablas.append(tabla)
+            self.pasos.append(np.array(pasos, dtype=np.int64))
+
+        # Códigos de cada valor; también se aceptan sus representaciones como texto
+        self.codigos = []
+        for v in self.variables:
+            codigos = {}
+            for k, valor in enumerate(self.valores[v]):
+                codigos.setdefault(str(valor), k)
+                codigos.setdefault(valor, k)
+            self.codigos.append(codigos)
+
+        # Copias en listas de Python para las lecturas celda a celda (enumeración)
+        self._padres_lista = [tuple(int(j) for j in p) for p in self.padres_idx]
+        self._pasos_lista = [tuple(int(k) for k in p[:-1]) for p in self.pasos]
+        self._tablas_lista = None
+        self._vista = {'variables': list(self.variables), 'valores': self.valores, 'padres': self.padres,
+                       'compactas': _compactas(self)}
+
+    def __getstate__(self):
+        # La caché (intervenciones, árbol de uniones, ...) se recalcula en el
+        # destino; así la red se puede enviar a otros procesos
+        estado = self.__dict__.copy()
+        estado['cache'] = {}
+        return estado
+
+    def __getitem__(self, clave):
+        if clave == 'TDP' and 'TDP' not in self._vista:
+            self._vista['TDP'] = self._construir_tdp()
+        return self._vista[clave]
+
+    def _construir_tdp(self):
+        tdp = {}
+        for v in self.variables:
+            tdp[v] = {}
+            if self.indice[v] in self.compactas:
+                continue
+            tabla = self.tabla(v)
+            for comb in itertools.product(*[range(len(self.valores[p])) for p in self.padres[v]]):
+                clave = tuple(self.valores[p][k] for p, k in zip(self.padres[v], comb))
+                tdp[v][clave] = dict(zip(self.valores[v], tabla[comb].tolist()))
+        return tdp
+
+    def codificar(self, var, valor):
+        """
+        Código entero de `valor` en el dominio de `var` (nombre o índice), o None.
+        """
+        i = var if isinstance(var, (int, np.integer)) else self.indice[var]
+        try:
+            return self.codigos[i].get(valor, self.codigos[i].get(str(valor)))
+        except TypeError:
+            return self.codigos[i].get(str(valor))
+
+    def tabla(self, var):
+        """
+        TDP de `var` como arreglo de solo lectura con ejes (padres..., var).
+        """
+        i = self.indice[var]
+        forma = [int(self.cardinalidades[j]) for j in self.padres_idx[i]] + [int(self.cardinalidades[i])]
+        return self.tablas[i].reshape(forma)
+
+    def probabilidad(self, i, asignacion):
+        """
+        P(variable i | padres) para una asignación de códigos indexable por
+        índice de variable (lista o diccionario). Las TDP compactas se
+        evalúan celda a celda con su probabilidad() (ver TDPCompacta).
+        """
+        if i in self.compactas:
+            return self.compactas[i].probabilidad([asignacion[j] for j in self._padres_lista[i]], asignacion[i])
+        if self._tablas_lista is None:
+            self._tablas_lista = [None if k in self.compactas else self.tablas[k].tolist()
+                                  for k in range(len(self.tablas))]
+        desplazamiento = asignacion[i]
+        for j, paso in zip(self._padres_lista[i], self._pasos_lista[i]):
+            desplazamiento += asignacion[j] * paso
+        return self._tablas_lista[i][desplazamiento]
+
+    def subred(self, variables, requeridas):
+        """
+        Red compilada con solo `variables`. Las que no están en `requeridas`
+        pasan a ser raíces con distribución uniforme; las demás comparten sus
+        arreglos con esta red.
+        """
+        padres = {}
+        tablas = []
+        for v in variables:
+            if v in requeridas:
+                padres[v] = self.padres[v]
+                i = self.indice[v]
+                tablas.append(self.compactas[i] if i in self.compactas else self.tablas[i])
+            else:
+                n = len(self.valores[v])
+                padres[v] = []
+                tablas.append(np.full(n, 1.0 / n))
+        return RedCompilada(variables, self.valores, padres, tablas, self.version)
+
+class _TablasRed(list):
+    """
+    Lista de las TDP planas de una RedCompilada. Las de TDP compactas se
+    guardan como None y se expanden la primera vez que se leen.
+    """
+    def __init__(self, compactas):
+        super().__init__()
+        self.compactas = compactas
+
+    def __getitem__(self, i):
+        tabla = super().__getitem__(i)
+        if tabla is None:
+            tabla = np.ascontiguousarray(self.compactas[i].tabla(), dtype=np.float64).reshape(-1)
+            tabla.flags.writeable = False
+            self[i] = tabla
+        return tabla
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+def compilar_red(red):
+    """
+    Devuelve la RedCompilada de la red. Se guarda en la caché de la red y se
+    reutiliza hasta que las funciones de edición la modifican (los cambios
+    hechos directamente sobre el diccionario no invalidan la caché).
+    """
+    if isinstance(red, RedCompilada):
+        return red
+    cache = _cache_red(red)
+    if 'compilada' not in cache:
+        compactas = _compactas(red)
+        tablas = [compactas[v] if v in compactas else tabla_tdp(v, red) for v in red['variables']]
+        cache['compilada'] = RedCompilada(red['variables'], red['valores'], red['padres'], tablas, version_red(red))
+    return cache['compilada']
+
+class RedPublicada:
+    """
+    Versión publicada de una red para consultas concurrentes. Los lectores
+    obtienen con instantanea() una RedCompilada de solo lectura, que no
+    cambia aunque después se publique otra versión, y pueden consultarla
+    desde varios hilos o tareas a la vez. Las ediciones son copia en
+    escritura: se aplican a una copia editable de la instantánea actual, se
+    compila el resultado y se publica con un solo cambio de referencia.
+    """
+    def __init__(self, red):
+        self._candado = threading.Lock()
+        self.generacion = 0
+        self._instantanea = compilar_red(red)
+
+    def instantanea(self):
+        """
+        RedCompilada publicada en este momento (lectura sin bloqueo).
+        """
+        return self._instantanea
+
+    def publicar(self, red):
+        """
+        Publica una nueva versión a partir de `red` (diccionario o RedCompilada).
+        El diccionario se puede seguir editando sin afectar a la versión publicada.
+        """
+        instantanea = compilar_red(red)
+        with self._candado:
+            self._instantanea = instantanea
+            self.generacion += 1
+        return instantanea
+
+    def editar(self, funcion):
+        """
+        Aplica funcion(red) a una copia editable de la versión publicada (con
+        las funciones de edición: agregar_variable, establecer_padres, ...) y
+        publica el resultado. Las ediciones concurrentes se aplican en serie.
+        """
+        with self._candado:
+            actual = self._instantanea
+            red = descompilar_red(actual)
+            red['_version'] = actual.version
+            funcion(red)
+            self._instantanea = compilar_red(red)
+            self.generacion += 1
+            return self._instantanea
+
+
+# ==========================================
+# Poda de la red antes de la inferencia
+# ==========================================
+
+def _hijos(red):
+    """
+    Devuelve un diccionario variable -> lista de hijos.
+    Se guarda en la caché de la red; no se debe modificar.
+    """
+    cache = _cache_red(red)
+    if 'hijos' not in cache:
+        hijos = {v: [] for v in red['variables']}
+        for var in red['variables']:
+            for padre in red['padres'][var]:
+                hijos[padre].append(var)
+        cache['hijos'] = hijos
+    return cache['hijos']
+
+def manto_markov(red):
+    """
+    Devuelve un diccionario variable -> lista con su manto de Markov
+    (padres, hijos y los otros padres de sus hijos).
+    """
+    hijos = _hijos(red)
+    mantos = {}
+    for var in red['variables']:
+        manto = set(red['padres'][var]) | set(hijos[var])
+        for hijo in hijos[var]:
+            manto.update(red['padres'][hijo])
+        manto.discard(var)
+        mantos[var] = [v for v in red['variables'] if v in manto]
+    return mantos
+
+def ancestros(vars, red):
+    """
+    Conjunto formado por `vars` y todos sus ancestros.
+    """
+    resultado = set()
+    pendientes = [v for v in vars if v in red['padres']]
+    while pendientes:
+        var = pendientes.pop()
+        if var not in resultado:
+            resultado.add(var)
+            pendientes.extend(red['padres'][var])
+    return resultado
+
+def _red_ancestral(vars, red):
+    """
+    Red compilada con solo `vars` y sus ancestros. A diferencia de podar_red
+    conserva P(e) cuando la evidencia está entre `vars`.
+    """
+    rc = compilar_red(red)
+    relevantes = ancestros(vars, rc)
+    return rc.subred([v for v in rc.variables if v in relevantes], relevantes)
+
+def bayes_ball(X, e, red):
+    """
+    Algoritmo Bayes-ball (Shachter, 1998) desde la variable de consulta X.
+    Devuelve (requeridas, observadas):
+      requeridas: variables cuya TDP se necesita para calcular P(X | e)
+      observadas: variables de evidencia cuyo valor se necesita
+    Las variables que no aparecen en ninguno de los dos conjuntos están
+    d-separadas de X dada la evidencia o son irrelevantes para la consulta.
+    """
+    hijos = _hijos(red)
+    marca_arriba = set()
+    marca_abajo = set()
+    observadas = set()
+    # Cada visita es (variable, viene_de_hijo)
+    pendientes = [(X, True)]
+    while pendientes:
+        var, desde_hijo = pendientes.pop()
+        if var in e:
+            observadas.add(var)
+            # Una variable observada solo deja pasar la pelota que llega de un padre
+            if not desde_hijo and var not in marca_arriba:
+                marca_arriba.add(var)
+                pendientes.extend((p, True) for p in red['padres'][var])
+            continue
+        if desde_hijo and var not in marca_arriba:
+            marca_arriba.add(var)
+            pendientes.extend((p, True) for p in red['padres'][var])
+        if var not in marca_abajo:
+            marca_abajo.add(var)
+            pendientes.extend((h, False) for h in hijos[var])
+    return marca_arriba, observadas
+
+def podar_red(X, e, red):
+    """
+    Construye la red reducida necesaria para calcular P(X | e).
+    1. Elimina los nodos estériles (los que no son ancestros de X ni de la evidencia).
+    2. Con Bayes-ball elimina las variables d-separadas de X dada la evidencia.
+    Las variables observadas cuyo valor se necesita pero cuya TDP no, quedan como
+    raíces con distribución uniforme (su aporte es una constante que se normaliza).
+    Nota: si la evidencia descartada es imposible (probabilidad 0), la red podada
+    no lo detecta y devuelve la posterior de la evidencia relevante.
+    Los valores observados se validan antes de podar: un valor fuera del
+    dominio de su variable lanza ValueError aunque la variable quede
+    d-separada de X.
+    Devuelve (red_podada, evidencia_podada). Las listas y TDP no se copian; si
+    `red` es una RedCompilada, la red podada también lo es.
+    """
+    e = {k: v for k, v in e.items() if k in red['padres']}
+    validar_evidencia(e, red)
+    if X in e:
+        return red, e
+
+    relevantes = ancestros([X] + list(e), red)
+    red_ancestral = {
+        'variables': [v for v in red['variables'] if v in relevantes],
+        'padres': red['padres'],
+    }
+    requeridas, observadas = bayes_ball(X, e, red_ancestral)
+
+    variables = [v for v in red['variables'] if v in requeridas or v in observadas]
+    subred = compilar_red(red).subred(variables, requeridas)
+    e_podada = {k: v for k, v in e.items() if k in subred.indice}
+    if isinstance(red, RedCompilada):
+        return subred, e_podada
+
+    red_podada = crear_red_bayesiana()
+    for var in red['variables']:
+        if var in requeridas:
+            red_podada['padres'][var] = red['padres'][var]
+            red_podada['TDP'][var] = red['TDP'][var]
+        elif var in observadas:
+            n = len(red['valores'][var])
+            red_podada['padres'][var] = []
+            red_podada['TDP'][var] = {(): {val: 1.0 / n for val in red['valores'][var]}}
+        else:
+            continue
+        red_podada['variables'].append(var)
+        red_podada['valores'][var] = red['valores'][var]
+
+    # La red podada lleva ya su versión compilada, que comparte arreglos con la original
+    red_podada['compactas'] = {v: t for v, t in _compactas(red).items() if v in requeridas}
+    red_podada['_version'] = version_red(red)
+    red_podada['_cache'] = {'compilada': subred}
+    return red_podada, e_podada
+
+
+# ==========================================
+# Implementación de Eliminación de Variables
+# ==========================================
+
+class Factor:
+    """
+    Clase para representar un factor en el algoritmo de eliminación de variables.
+    """
+    def __init__(self, vars, cpt):
+        self.vars = vars
+        self.cpt = cpt
+
+    def pointwise_product(self, other, red):
+        """
+        Multiplica este factor con otro factor.
+        """
+        # Variables unidas
+        new_vars = list(set(self.vars) | set(other.vars))
+        new_cpt = {}
+
+        # Iterar sobre todas las combinaciones de valores para las nuevas variables
+        # Esto es simplificado; para una implementación robusta se necesita un iterador de combinaciones
+        all_values = []
+        import itertools
+        
+        # Obtener dominios de las variables
+        dominios = [red['valores'][v] for v in new_vars]
+        
+        for combination in itertools.product(*dominios):
+            # Crear asignación
+            asignacion = dict(zip(new_vars, combination))
+            
+            # Obtener valor de self
+            key_self = tuple(asignacion[v] for v in self.vars)
+            val_self = self.cpt.get(key_self, 0.0)
+            
+            # Obtener valor de other
+            key_other = tuple(asignacion[v] for v in other.vars)
+            val_other = other.cpt.get(key_other, 0.0)
+            
+            # Multiplicar
+            new_cpt[tuple(combination)] = val_self * val_other
+            
+        return Factor(new_vars, new_cpt)
+
+    def sum_out(self, var, red):
+        """
+        Suma fuera la variable var de este factor.
+        """
+        if var not in self.vars:
+            return self
+        
+        vars_restantes = [v for v in self.vars if v != var]
+        new_cpt = {}
+        
+        # Iterar sobre las combinaciones de las variables restantes
+        import itertools
+        dominios = [red['valores'][v] for v in vars_restantes]
+        
+        for combination in itertools.product(*dominios):
+            asignacion_base = dict(zip(vars_restantes, combination))
+            suma = 0.0
+            
+            # Sumar sobre todos los valores de la variable a eliminar
+            for val_elim in red['valores'][var]:
+                asignacion_completa = asignacion_base.copy()
+                asignacion_completa[var] = val_elim
+                
+                # Reconstruir clave para self.cpt
+                key_self = tuple(asignacion_completa[v] for v in self.vars)
+                suma += self.cpt.get(key_self, 0.0)
+            
+            new_cpt[tuple(combination)] = suma
+            
+        return Factor(vars_restantes, new_cpt)
+
+def make_factor(var, e, red):
+    """
+    Crea un factor inicial para una variable dada la evidencia.
+    """
+    vars_factor = red['padres'][var] + [var]
+    cpt_factor = {}
+    
+    # Iterar sobre todas las combinaciones de var y sus padres
+    import itertools
+    dominios = [red['valores'][v] for v in vars_factor]
+    
+    for combination in itertools.product(*dominios):
+        asignacion = dict(zip(vars_factor, combination))
+        
+        # Verificar coherencia con evidencia
+        consistente = True
+        for k, v in asignacion.items():
+            if k in e and e[k] != v:
+                consistente = False
+                break
+        
+        if consistente:
+            # Obtener probabilidad de la TDP
+            val_padres = tuple(asignacion[p] for p in red['padres'][var])
+            val_var = asignacion[var]
+            
+            # Usar la función existente para obtener valor crudo
+            if var in _compactas(red):
+                prob = obtener_probabilidad_condicional(var, val_var, asignacion, red)
+            else:
+                try:
+                    prob = red['TDP'][var][val_padres][val_var]
+                except KeyError:
+                    prob = 0.0
+            
+            cpt_factor[tuple(combination)] = prob
+        else:
+            cpt_factor[tuple(combination)] = 0.0
+            
+    return Factor(vars_factor, cpt_factor)
+
+class FactorNP:
+    """
+    Factor respaldado por un arreglo de NumPy.
+    Cada eje de `tabla` corresponde a una variable de `vars` y se indexa con la
+    posición del valor dentro de red['valores'][var].
+    """
+    def __init__(self, vars, tabla):
+        self.vars = list(vars)
+        self.tabla = np.asarray(tabla, dtype=float)
+
+    def _alinear(self, new_vars):
+        """
+        Reordena los ejes según new_vars e inserta ejes de tamaño 1 para las
+        variables que no aparecen en este factor (para usar broadcasting).
+        """
+        orden = [self.vars.index(v) for v in new_vars if v in self.vars]
+        tabla = np.transpose(self.tabla, orden)
+        forma = [self.tabla.shape[self.vars.index(v)] if v in self.vars else 1 for v in new_vars]
+        return tabla.reshape(forma)
+
+    def pointwise_product(self, other, red=None):
+        """
+        Multiplica este factor con otro factor por broadcasting.
+        """
+        new_vars = self.vars + [v for v in other.vars if v not in self.vars]
+        return FactorNP(new_vars, self._alinear(new_vars) * other._alinear(new_vars))
+
+    def sum_out(self, var, red=None):
+        """
+        Suma fuera la variable var de este factor (suma sobre su eje).
+        """
+        if var not in self.vars:
+            return self
+        eje = self.vars.index(var)
+        return FactorNP(self.vars[:eje] + self.vars[eje + 1:], self.tabla.sum(axis=eje))
+
+    def max_out(self, var):
+        """
+        Maximiza fuera la variable var. Devuelve (factor, argmax), donde argmax
+        es un arreglo sobre las variables restantes con el código de var que
+        alcanza el máximo.
+        """
+        eje = self.vars.index(var)
+        restantes = self.vars[:eje] + self.vars[eje + 1:]
+        return FactorNP(restantes, self.tabla.max(axis=eje)), self.tabla.argmax(axis=eje)
+
+class FactorLog(FactorNP):
+    """
+    Factor en espacio logarítmico: `tabla` guarda log|valor| y `signo` el signo
+    cuando hay valores negativos (descomposición de las TDP ruido-MAX; None si
+    todos son no negativos). El producto suma logaritmos y sum_out usa
+    log-sum-exp, de modo que no hay desbordamiento por abajo.
+    """
+    def __init__(self, vars, tabla, signo=None):
+        super().__init__(vars, tabla)
+        self.signo = signo
+
+    @classmethod
+    def desde_factor(cls, factor):
+        with np.errstate(divide='ignore'):
+            log_tabla = np.log(np.abs(factor.tabla))
+        signo = np.sign(factor.tabla) if (factor.tabla < 0).any() else None
+        return cls(factor.vars, log_tabla, signo)
+
+    def _signo_alineado(self, new_vars):
+        if self.signo is None:
+            return None
+        return FactorNP(self.vars, self.signo)._alinear(new_vars)
+
+    def pointwise_product(self, other, red=None):
+        new_vars = self.vars + [v for v in other.vars if v not in self.vars]
+        tabla = self._alinear(new_vars) + other._alinear(new_vars)
+        signos = [s for s in (self._signo_alineado(new_vars), other._signo_alineado(new_vars)) if s is not None]
+        signo = None
+        if signos:
+            signo = np.broadcast_to(np.prod(np.broadcast_arrays(*signos), axis=0), tabla.shape)
+        return FactorLog(new_vars, tabla, signo)
+
+    def sum_out(self, var, red=None):
+        if var not in self.vars:
+            return self
+        eje = self.vars.index(var)
+        restantes = self.vars[:eje] + self.vars[eje + 1:]
+        maximo = self.tabla.max(axis=eje, keepdims=True)
+        maximo[~np.isfinite(maximo)] = 0.0
+        relativos = np.exp(self.tabla - maximo)
+        if self.signo is not None:
+            relativos = relativos * self.signo
+        suma = relativos.sum(axis=eje)
+        with np.errstate(divide='ignore'):
+            tabla = np.log(np.abs(suma)) + np.squeeze(maximo, axis=eje)
+        signo = np.sign(suma) if self.signo is not None and (suma < 0).any() else None
+        return FactorLog(restantes, tabla, signo)
+
+    def log_valores(self):
+        """
+        Logaritmo de los valores; los negativos (errores de redondeo de una
+        suma que debería ser no negativa) se toman como 0.
+        """
+        if self.signo is None:
+            return self.tabla
+        return np.where(self.signo > 0, self.tabla, -np.inf)
+
+def indice_valor(var, valor, red):
+    """
+    Devuelve la posición de `valor` en el dominio de `var`, o None si no pertenece.
+    """
+    valor = convertir_valor(valor, red['valores'][var])
+    try:
+        return red['valores'][var].index(valor)
+    except ValueError:
+        return None
+
+def validar_evidencia(e, red):
+    """
+    Lanza ValueError si algún valor observado de una variable de la red no
+    pertenece a su dominio (las variables desconocidas se ignoran).
+    """
+    for var, valor in e.items():
+        if var in red['valores'] and indice_valor(var, valor, red) is None:
+            raise ValueError(f"Valor fuera del dominio de {var} en la evidencia: {valor!r}")
+
+def tabla_tdp(var, red):
+    """
+    Convierte la TDP de `var` en un arreglo con ejes (padres..., var).
+    Las entradas que no estén definidas en la TDP valen 0.0; las TDP compactas
+    se expanden.
+    """
+    if var in _compactas(red):
+        return _compactas(red)[var].tabla()
+    vars_factor = red['padres'][var] + [var]
+    forma = [len(red['valores'][v]) for v in vars_factor]
+    tabla = np.zeros(forma)
+    tdp = red['TDP'][var]
+    for val_padres in itertools.product(*[red['valores'][p] for p in red['padres'][var]]):
+        probs = tdp.get(val_padres)
+        if probs is None:
+            continue
+        idx_padres = tuple(red['valores'][p].index(v) for p, v in zip(red['padres'][var], val_padres))
+        for j, val_var in enumerate(red['valores'][var]):
+            tabla[idx_padres + (j,)] = probs.get(val_var, 0.0)
+    return tabla
+
+def make_factor_np(var, e, red):
+    """
+    Crea un FactorNP inicial para una variable dada la evidencia.
+    Las variables observadas se fijan indexando su eje, por lo que desaparecen del factor.
+    """
+    return _fijar_evidencia(red['padres'][var] + [var], compilar_red(red).tabla(var), e, red)
+
+def factores_np(var, e, red):
+    """
+    Como make_factor_np, pero devuelve una lista de factores: si la TDP de
+    `var` es compacta, su descomposición (con la variable auxiliar) en lugar
+    de la tabla completa.
+    """
+    compacta = _compactas(red).get(var)
+    if compacta is None:
+        return [make_factor_np(var, e, red)]
+    return [_fijar_evidencia(vars_factor, tabla, e, red) for vars_factor, tabla in compacta.factores()]
+
+def _fijar_evidencia(vars_factor, tabla, e, red):
+    """
+    FactorNP de `tabla` con las variables observadas fijadas en su valor.
+    """
+    vars_restantes = []
+    indices = []
+    for v in vars_factor:
+        if v in e:
+            idx = indice_valor(v, e[v], red)
+            if idx is None:
+                # Valor fuera del dominio: ninguna combinación es consistente
+                tabla = np.zeros_like(tabla)
+                idx = 0
+            indices.append(idx)
+        else:
+            vars_restantes.append(v)
+            indices.append(slice(None))
+
+    return FactorNP(vars_restantes, tabla[tuple(indices)])
+
+def make_factor_log(var, e, red):
+    """
+    Como make_factor_np, pero en espacio logarítmico (FactorLog).
+    """
+    return FactorLog.desde_factor(make_factor_np(var, e, red))
+
+def factores_log(var, e, red):
+    """
+    Como factores_np, pero en espacio logarítmico (FactorLog).
+    """
+    return [FactorLog.desde_factor(f) for f in factores_np(var, e, red)]
+
+MOTORES_FACTOR = {
+    'dict': make_factor,
+    'numpy': make_factor_np,
+    'log': make_factor_log,
+}
+
+def _distribucion_factor(resultado, X, red):
+    """
+    Extrae la distribución (sin normalizar) de X a partir del factor final.
+    """
+    distribucion = {}
+    if isinstance(resultado, FactorNP):
+        for v in list(resultado.vars):
+            if v != X:
+                resultado = resultado.sum_out(v)
+        for j, val_X in enumerate(red['valores'][X]):
+            distribucion[val_X] = float(resultado.tabla[j])
+        return distribucion
+
+    idx_X = resultado.vars.index(X)
+    for key, val in resultado.cpt.items():
+        # key es una tupla de valores para resultado.vars
+        val_X = key[idx_X]
+        if val_X not in distribucion:
+            distribucion[val_X] = 0.0
+        distribucion[val_X] += val
+    return distribucion
+
+# ==========================================
+# Orden de eliminación
+# ==========================================
+
+HEURISTICAS_ORDEN = ('natural', 'min_degree', 'min_fill', 'weighted_min_fill')
+
+def _alcances(red, compactas=False):
+    """
+    Variables de los factores iniciales de cada familia. Con compactas=True,
+    las familias con TDP compacta aportan los alcances de su descomposición
+    (ver factores_np), que incluyen su variable auxiliar.
+    """
+    descompuestas = _compactas(red) if compactas else {}
+    alcances = []
+    for var in red['variables']:
+        if var in descompuestas:
+            alcances.extend(vars_factor for vars_factor, _ in descompuestas[var].factores())
+        else:
+            alcances.append(red['padres'][var] + [var])
+    return alcances
+
+def grafo_moral(red, vars=None, compactas=False):
+    """
+    Construye el grafo moral (no dirigido) de la red: cada variable queda unida
+    a sus padres y los padres de una misma variable quedan unidos entre sí.
+    Si se da `vars`, el grafo se restringe a esas variables.
+    compactas: usa la descomposición de las TDP compactas en lugar de unir a
+               todos sus padres; sus variables auxiliares se agregan al grafo
+               cuando su familia tiene alguna variable incluida.
+    Devuelve un diccionario variable -> conjunto de vecinos.
+    """
+    incluidas = set(red['variables'] if vars is None else vars)
+    if compactas:
+        for var, tdp in _compactas(red).items():
+            if incluidas & set(red['padres'][var] + [var]):
+                incluidas.update(tdp.auxiliares())
+    vecinos = {v: set() for v in list(red['variables']) + list(variables_auxiliares(red)) if v in incluidas}
+    for alcance in _alcances(red, compactas):
+        familia = [v for v in alcance if v in incluidas]
+        for a, b in itertools.combinations(familia, 2):
+            vecinos[a].add(b)
+            vecinos[b].add(a)
+    return vecinos
+
+def _costo_heuristica(var, vecinos, red, heuristica):
+    """
+    Costo de eliminar `var` en el grafo actual según la heurística.
+    """
+    vs = vecinos[var]
+    if heuristica == 'min_degree':
+        return len(vs)
+    faltantes = [(a, b) for a, b in itertools.combinations(vs, 2) if b not in vecinos[a]]
+    if heuristica == 'min_fill':
+        return len(faltantes)
+    # weighted_min_fill: cada arista nueva pesa el producto de las cardinalidades
+    return sum(_cardinalidad(a, red) * _cardinalidad(b, red) for a, b in faltantes)
+
+def _eliminar_nodo(vecinos, var):
+    """
+    Elimina `var` del grafo conectando a todos sus vecinos entre sí.
+    Devuelve los vecinos que tenía la variable.
+    """
+    vs = vecinos.pop(var)
+    for a in vs:
+        vecinos[a].discard(var)
+        vecinos[a] |= vs - {a}
+    return vs
+
+def orden_eliminacion(red, vars_eliminar, heuristica='min_fill', vars_grafo=None, vars_despues=(), compactas=False):
+    """
+    Calcula un orden de eliminación para vars_eliminar con una heurística voraz
+    sobre el grafo moral. 'natural' conserva el orden de red['variables'].
+    vars_grafo: variables que participan en el grafo (por defecto todas).
+    vars_despues: variables que se eliminan en una segunda fase, después de
+                  todas las de vars_eliminar (p. ej. las de MAP marginal).
+    compactas: grafo con la descomposición de las TDP compactas (ver
+               grafo_moral); sus variables auxiliares se eliminan en la
+               primera fase.
+    """
+    if heuristica not in HEURISTICAS_ORDEN:
+        raise ValueError(f"Heurística desconocida: {heuristica}. Opciones: {list(HEURISTICAS_ORDEN)}")
+    vecinos = grafo_moral(red, vars_grafo, compactas)
+    auxiliares = [v for v in variables_auxiliares(red) if v in vecinos] if compactas else []
+    fases = [set(vars_eliminar) | set(auxiliares), set(vars_despues)]
+    fases = [[v for v in list(red['variables']) + auxiliares if v in fase] for fase in fases]
+    if heuristica == 'natural':
+        return fases[0] + fases[1]
+
+    orden = []
+    for pendientes in fases:
+        while pendientes:
+            # min() se queda con el primero en caso de empate: el orden es determinista
+            mejor = min(pendientes, key=lambda v: _costo_heuristica(v, vecinos, red, heuristica))
+            orden.append(mejor)
+            pendientes.remove(mejor)
+            _eliminar_nodo(vecinos, mejor)
+    return orden
+
+def _cardinalidad(var, red):
+    if var in red['valores']:
+        return len(red['valores'][var])
+    return variables_auxiliares(red)[var]
+
+def _tamano_factor(vars, red):
+    tamano = 1
+    for v in vars:
+        tamano *= _cardinalidad(v, red)
+    return tamano
+
+def estimar_eliminacion(X, e, red, orden='min_fill', motor='dict'):
+    """
+    Predice el costo de inferencia_eliminacion_variables sin ejecutarla.
+    orden: nombre de heurística (ver HEURISTICAS_ORDEN) o lista explícita de variables.
+    Devuelve un diccionario con:
+      'orden': orden de eliminación de las variables ocultas
+      'max_celdas': celdas del mayor factor (inicial, intermedio o final)
+      'max_vars': número de variables de ese factor más grande
+    """
+    vars_ocultas = [v for v in red['variables'] if v != X and v not in e]
+    # El motor 'dict' conserva las variables de evidencia dentro de los factores;
+    # los motores 'numpy' y 'log' las eliminan al crear los factores iniciales y
+    # descomponen las TDP compactas.
+    compactas = motor in ('numpy', 'log')
+    if compactas:
+        vars_grafo = [v for v in red['variables'] if v not in e]
+    else:
+        vars_grafo = list(red['variables'])
+    vecinos = grafo_moral(red, vars_grafo, compactas)
+    vars_ocultas += [v for v in vecinos if v not in red['valores']]
+
+    if isinstance(orden, str):
+        orden_vars = orden_eliminacion(red, vars_ocultas, orden, vars_grafo, compactas=compactas)
+    else:
+        orden_vars = [v for v in orden if v in vars_ocultas]
+        orden_vars += [v for v in vars_ocultas if v not in orden_vars]
+
+    en_grafo = set(vecinos)
+    alcances = [[v for v in alcance if v in en_grafo] for alcance in _alcances(red, compactas)]
+
+    for var in orden_vars:
+        alcances.append([var] + list(_eliminar_nodo(vecinos, var)))
+    # Factor final: producto de todo lo que no se eliminó
+    alcances.append(list(vecinos))
+
+    mayor = max(alcances, key=lambda a: _tamano_factor(a, red))
+    return {
+        'orden': orden_vars,
+        'max_celdas': _tamano_factor(mayor, red),
+        'max_vars': len(mayor),
+    }
+
+def eliminar_variables(factores, orden, red=None):
+    """
+    Elimina (suma fuera) las variables de `orden` una por una: multiplica los
+    factores que mencionan cada variable y la suma fuera del producto.
+    Sirve para Factor y FactorNP. Devuelve la lista de factores restantes.
+    """
+    medir = bool(_REGISTROS)
+    if medir:
+        _emitir('orden', orden=list(orden))
+    for var in orden:
+        # Encontrar factores que mencionan var
+        factores_con_var = [f for f in factores if var in f.vars]
+        factores_sin_var = [f for f in factores if var not in f.vars]
+
+        if not factores_con_var:
+            continue
+
+        # Multiplicar todos los factores que contienen var
+        if medir:
+            inicio = time.perf_counter()
         producto = factores_con_var[0]
         for f in factores_con_var[1:]:
             producto = producto.pointwise_product(f, red)
-            
-        # Sumar fuera var
-        nuevo_factor = producto.sum_out(var, red)
-        
-        # Actualizar lista de factores
-        factores = factores_sin_var + [nuevo_factor]
+
+        # Sumar fuera var y actualizar lista de factores
+        if medir:
+            intermedio = time.perf_counter()
+        resultado = producto.sum_out(var, red)
+        if medir:
+            celdas, nbytes = _medidas_factor(producto)
+            celdas_resultado, bytes_resultado = _medidas_factor(resultado)
+            _emitir('eliminacion', variable=var, factores=len(factores_con_var),
+                    producto_s=intermedio - inicio, suma_s=time.perf_counter() - intermedio,
+                    celdas=celdas, bytes=nbytes, celdas_resultado=celdas_resultado, bytes_resultado=bytes_resultado)
+        factores = factores_sin_var + [resultado]
+    return factores
+
+@_instrumentada
+def inferencia_eliminacion_variables(X, e, red, motor='dict', orden='min_fill', max_celdas=None, podar=True,
+                                     con_evidencia=False, virtual=None, do=None):
+    """
+    Inferencia por eliminación de variables.
+    motor: 'dict' (factores con diccionarios), 'numpy' (factores con arreglos)
+           o 'log' (arreglos en espacio logarítmico, ver FactorLog)
+    orden: heurística de orden de eliminación (ver HEURISTICAS_ORDEN) o lista de variables
+    max_celdas: si se da, rechaza la consulta (MemoryError) cuando el mayor factor
+                previsto por estimar_eliminacion supera ese número de celdas
+    podar: si es True, elimina antes las variables irrelevantes con podar_red
+    con_evidencia: si es True devuelve (distribución, log P(e)); la poda se
+                   limita entonces a los ancestros de X y de la evidencia
+    virtual: evidencia virtual {variable: verosimilitudes}, que entra como un
+             factor más por variable (ver factores_virtuales)
+    do: intervenciones {variable: valor} (ver intervenir)
+    """
+    if motor not in MOTORES_FACTOR:
+        raise ValueError(f"Motor desconocido: {motor}. Opciones: {list(MOTORES_FACTOR)}")
+    crear_factor = MOTORES_FACTOR[motor]
+    red, e, verosimilitudes = _preparar_consulta(e, red, virtual, do)
+    if podar and (con_evidencia or verosimilitudes):
+        red = _red_ancestral([X] + list(e) + list(verosimilitudes), red)
+        e = {k: v for k, v in e.items() if k in red.indice}
+    elif podar:
+        red, e = podar_red(X, e, red)
+
+    # 1. Identificar variables ocultas (ni consulta ni evidencia) y su orden de eliminación
+    plan = estimar_eliminacion(X, e, red, orden, motor)
+    if max_celdas is not None and plan['max_celdas'] > max_celdas:
+        raise MemoryError(
+            f"La consulta requiere un factor de {plan['max_celdas']} celdas "
+            f"({plan['max_vars']} variables), límite: {max_celdas}"
+        )
+    vars_ocultas = plan['orden']
+    
+    # 2. Crear factores iniciales (el motor 'numpy' descompone las TDP compactas)
+    if _REGISTROS:
+        inicio = time.perf_counter()
+    factores = []
+    for var in red['variables']:
+        if motor == 'numpy':
+            factores.extend(factores_np(var, e, red))
+        elif motor == 'log':
+            factores.extend(factores_log(var, e, red))
+        else:
+            factores.append(crear_factor(var, e, red))
+    factores.extend(factores_virtuales(verosimilitudes, e, red, motor))
+    if _REGISTROS:
+        medidas = [_medidas_factor(f) for f in factores]
+        _emitir('factores_iniciales', motor=motor, duracion_s=time.perf_counter() - inicio, factores=len(factores),
+                celdas=max((c for c, _ in medidas), default=0), bytes=max((b for _, b in medidas), default=0),
+                celdas_totales=sum(c for c, _ in medidas))
+
+    # 3. Eliminar variables ocultas una por una
+    factores = eliminar_variables(factores, vars_ocultas, red)
         
     # 4. Multiplicar factores restantes
     if not factores:
         return {} # No debería pasar
     
+    if _REGISTROS:
+        inicio = time.perf_counter()
     resultado = factores[0]
     for f in factores[1:]:
         resultado = resultado.pointwise_product(f, red)
+    if _REGISTROS:
+        celdas, nbytes = _medidas_factor(resultado)
+        _emitir('producto_final', factores=len(factores), duracion_s=time.perf_counter() - inicio,
+                celdas=celdas, bytes=nbytes)
         
     # 5. Normalizar
     # El resultado final tendrá solo var X (y quizás vars de evidencia absorbidas no eliminadas si quedó algo mal, pero debería ser solo X)
     # Como e ya se incorporó fijando valores a 0 si no coinciden, en teoría outcome debería tener solo X
     
     # Extraer distribución para X
-    distribucion = {}
-    idx_X = -1
-    if X in resultado.vars:
-        idx_X = resultado.vars.index(X)
-        
-    if idx_X == -1:
+    if X not in resultado.vars:
         # X era evidencia? O algo pasó. 
         # Si X está en evidencia, retornamos probabilidad 1.0 para ese valor
         if X in e:
-            return {val: 1.0 if val == e[X] else 0.0 for val in red['valores'][X]}
+            distribucion = {val: 1.0 if val == e[X] else 0.0 for val in red['valores'][X]}
+            return (distribucion, _log_total(resultado)) if con_evidencia else distribucion
         return {}
 
-    for key, val in resultado.cpt.items():
-        # key es una tupla de valores para resultado.vars
-        val_X = key[idx_X]
-        if val_X not in distribucion:
-            distribucion[val_X] = 0.0
-        distribucion[val_X] += val
+    if motor == 'log':
+        log_Q = _log_distribucion_factor(resultado, X, red)
+        log_pe = _log_suma(log_Q.values())
+        distribucion = {x: math.exp(l - log_pe) if log_pe > -math.inf else 0.0 for x, l in log_Q.items()}
+    else:
+        Q = _distribucion_factor(resultado, X, red)
+        log_pe = math.log(sum(Q.values())) if sum(Q.values()) > 0 else -math.inf
+        distribucion = normaliza(Q)
+    return (distribucion, log_pe) if con_evidencia else distribucion
+
+def _log_distribucion_factor(resultado, X, red):
+    """
+    Como _distribucion_factor para un FactorLog: {valor de X: log P(X, e)}.
+    """
+    for v in list(resultado.vars):
+        if v != X:
+            resultado = resultado.sum_out(v)
+    return dict(zip(red['valores'][X], resultado.log_valores().tolist()))
+
+def _log_total(resultado):
+    """
+    Logaritmo de la suma de todas las celdas del factor final.
+    """
+    if isinstance(resultado, FactorLog):
+        for v in list(resultado.vars):
+            resultado = resultado.sum_out(v)
+        return float(resultado.log_valores())
+    if isinstance(resultado, FactorNP):
+        total = float(resultado.tabla.sum())
+    else:
+        total = sum(resultado.cpt.values())
+    return math.log(total) if total > 0 else -math.inf
+
+@_instrumentada
+def log_probabilidad_evidencia(e, red, orden='min_fill', virtual=None, do=None):
+    """
+    log P(e) por eliminación de variables en espacio logarítmico, sobre los
+    ancestros de la evidencia. Para muchos casos a la vez ver log_probabilidad_lote.
+    virtual, do: evidencia virtual e intervenciones, como en
+                 inferencia_eliminacion_variables (los valores intervenidos
+                 no cuentan como evidencia)
+    """
+    red, e_do, verosimilitudes = _preparar_consulta(e, red, virtual, do)
+    if not e and not verosimilitudes:
+        return 0.0
+    rc = _red_ancestral(list(e) + list(verosimilitudes), red)
+    e = {k: v for k, v in e_do.items() if k in rc.indice}
+    factores = [f for var in rc.variables for f in factores_log(var, e, rc)]
+    factores += factores_virtuales(verosimilitudes, e, rc, 'log')
+    vars_ocultas = [v for v in rc.variables if v not in e]
+    factores = eliminar_variables(factores, orden_eliminacion(rc, vars_ocultas, orden, vars_ocultas, compactas=True))
+    return sum(_log_total(f) for f in factores)
+
+
+# ==========================================
+# Evidencia virtual e intervenciones
+# ==========================================
+
+TAM_CACHE_INTERVENCIONES = 128
+
+def intervenir(red, intervenciones):
+    """
+    Red compilada para la intervención do(intervenciones): cada variable
+    intervenida pierde sus padres y su TDP pasa a ser una masa puntual en el
+    valor fijado. Las demás TDP se comparten con la red original y el
+    resultado se guarda en la caché de la red compilada, por lo que repetir
+    una intervención no reconstruye nada. Sirve para cualquier motor
+    (p. ej. compilar_arbol_uniones o AproximadaBa).
+    """
+    rc = compilar_red(red)
+    if not intervenciones:
+        return rc
+    codigos = {}
+    for var, valor in intervenciones.items():
+        if var not in rc.indice:
+            raise ValueError(f"Variable desconocida en la intervención: {var}")
+        codigo = rc.codificar(var, valor)
+        if codigo is None:
+            raise ValueError(f"Valor fuera del dominio de {var} en la intervención: {valor}")
+        codigos[rc.indice[var]] = codigo
+
+    cache = rc.cache.setdefault('intervenciones', CacheResultados(TAM_CACHE_INTERVENCIONES))
+    clave = tuple(sorted(codigos.items()))
+    mutilada = cache.obtener(clave)
+    if mutilada is None:
+        padres = {}
+        tablas = []
+        for i, v in enumerate(rc.variables):
+            if i in codigos:
+                padres[v] = []
+                tabla = np.zeros(int(rc.cardinalidades[i]))
+                tabla[codigos[i]] = 1.0
+            else:
+                padres[v] = rc.padres[v]
+                tabla = rc.compactas[i] if i in rc.compactas else rc.tablas[i]
+            tablas.append(tabla)
+        mutilada = RedCompilada(rc.variables, rc.valores, padres, tablas, rc.version)
+        cache.guardar(clave, mutilada)
+    return mutilada
+
+def _vector_verosimilitud(rc, var, verosimilitud, lote=False):
+    """
+    Convierte la evidencia virtual de `var` (diccionario valor -> verosimilitud,
+    con 0.0 para los valores ausentes, o secuencia en el orden del dominio)
+    en un arreglo de |dom(var)| valores no negativos. Con lote=True también se
+    acepta un arreglo (N, |dom(var)|) con una fila por caso.
+    """
+    if var not in rc.indice:
+        raise ValueError(f"Variable desconocida en la evidencia virtual: {var}")
+    card = len(rc.valores[var])
+    if isinstance(verosimilitud, dict):
+        vector = np.zeros(card)
+        for valor, peso in verosimilitud.items():
+            codigo = rc.codificar(var, valor)
+            if codigo is None:
+                raise ValueError(f"Valor fuera del dominio de {var} en la evidencia virtual: {valor}")
+            vector[codigo] = peso
+    else:
+        vector = np.asarray(verosimilitud, dtype=np.float64)
+        if vector.shape[-1:] != (card,) or vector.ndim > (2 if lote else 1):
+            raise ValueError(f"La evidencia virtual de {var} debe tener {card} valores, se recibió {vector.shape}")
+    if (vector < 0).any():
+        raise ValueError(f"La evidencia virtual de {var} tiene verosimilitudes negativas")
+    return vector
+
+def _preparar_consulta(e, red, virtual, do):
+    """
+    Aplica do() y la evidencia virtual a una consulta: devuelve la red
+    (intervenida si hace falta), la evidencia dura (con los valores
+    intervenidos) y {variable: vector de verosimilitud}. Un valor observado
+    fuera del dominio de su variable lanza ValueError.
+    """
+    validar_evidencia(e, red)
+    if do:
+        red = intervenir(red, do)
+        e = {**e, **do}
+    if not virtual:
+        return red, e, {}
+    rc = compilar_red(red)
+    return red, e, {var: _vector_verosimilitud(rc, var, v) for var, v in virtual.items()}
+
+def factores_virtuales(verosimilitudes, e, red, motor='numpy'):
+    """
+    Factores de una variable con la evidencia virtual {variable: vector} para
+    el motor dado (ver MOTORES_FACTOR). Multiplicarlos por los demás factores
+    equivale a observar un hijo ficticio de cada variable con esas
+    verosimilitudes.
+    """
+    factores = []
+    for var, vector in verosimilitudes.items():
+        if motor == 'dict':
+            factores.append(Factor([var], {(val,): float(p) for val, p in zip(red['valores'][var], vector)}))
+            continue
+        factor = _fijar_evidencia([var], vector, e, red)
+        factores.append(FactorLog.desde_factor(factor) if motor == 'log' else factor)
+    return factores
+
+
+# ==========================================
+# Árbol de uniones (junction tree)
+# ==========================================
+
+def _sumar_excepto(factor, vars_conservar):
+    """
+    Suma fuera de un FactorNP todas las variables que no están en vars_conservar.
+    """
+    ejes = tuple(i for i, v in enumerate(factor.vars) if v not in vars_conservar)
+    if not ejes:
+        return factor
+    return FactorNP([v for v in factor.vars if v in vars_conservar], factor.tabla.sum(axis=ejes))
+
+def _dividir(numerador, denominador):
+    """
+    Divide dos FactorNP celda a celda con la convención 0/0 = 0.
+    Las variables del denominador deben estar contenidas en las del numerador.
+    """
+    den = denominador._alinear(numerador.vars)
+    den = np.broadcast_to(den, numerador.tabla.shape)
+    tabla = np.divide(numerador.tabla, den, out=np.zeros_like(numerador.tabla), where=den != 0)
+    return FactorNP(numerador.vars, tabla)
+
+class ArbolUniones:
+    """
+    Árbol de uniones compilado a partir de una red bayesiana.
+    Se triangula el grafo moral con la heurística min-fill, se forman las
+    cliques maximales y se unen con un árbol de expansión máximo según el
+    tamaño de los separadores. La calibración sigue el esquema Hugin.
+    """
+    def __init__(self, red):
+        self.valores = {v: list(red['valores'][v]) for v in red['variables']}
+        self.cliques = self._triangular(red)
+
+        # Árbol de expansión máximo (Kruskal) sobre el tamaño de los separadores.
+        # Se aceptan separadores vacíos para unir componentes desconectadas.
+        aristas = []
+        for i, j in itertools.combinations(range(len(self.cliques)), 2):
+            sep = [v for v in self.cliques[i] if v in self.cliques[j]]
+            aristas.append((len(sep), i, j, sep))
+        aristas.sort(key=lambda a: -a[0])
+        componente = list(range(len(self.cliques)))
+
+        def raiz(i):
+            while componente[i] != i:
+                componente[i] = componente[componente[i]]
+                i = componente[i]
+            return i
+
+        self.vecinos = {i: {} for i in range(len(self.cliques))}
+        for _, i, j, sep in aristas:
+            ri, rj = raiz(i), raiz(j)
+            if ri != rj:
+                componente[ri] = rj
+                self.vecinos[i][j] = sep
+                self.vecinos[j][i] = sep
+
+        # Orden de recorrido desde la clique 0: padre de cada clique en el árbol
+        self.orden = [0]
+        self.padre = {0: None}
+        for i in self.orden:
+            for j in self.vecinos[i]:
+                if j not in self.padre:
+                    self.padre[j] = i
+                    self.orden.append(j)
+
+        # Cada TDP se asigna a la primera clique que contiene su familia
+        self.potenciales = []
+        for clique in self.cliques:
+            forma = [len(self.valores[v]) for v in clique]
+            self.potenciales.append(FactorNP(clique, np.ones(forma)))
+        for var in red['variables']:
+            familia = set(red['padres'][var]) | {var}
+            i = next(k for k, c in enumerate(self.cliques) if familia <= set(c))
+            factor = FactorNP(red['padres'][var] + [var], compilar_red(red).tabla(var))
+            self.potenciales[i] = self.potenciales[i].pointwise_product(factor)
+
+        # Clique más pequeña que contiene cada variable (para leer marginales)
+        self.clique_de = {}
+        for var in red['variables']:
+            candidatas = [k for k, c in enumerate(self.cliques) if var in c]
+            self.clique_de[var] = min(candidatas, key=lambda k: self.potenciales[k].tabla.size)
+
+    def _triangular(self, red):
+        """
+        Elimina las variables en orden min-fill y guarda las cliques maximales.
+        """
+        vecinos = grafo_moral(red)
+        cliques = []
+        for var in orden_eliminacion(red, red['variables'], 'min_fill'):
+            clique = {var} | _eliminar_nodo(vecinos, var)
+            if not any(clique <= set(c) for c in cliques):
+                cliques.append([v for v in red['variables'] if v in clique])
+        return cliques
+
+    def anchura(self):
+        """
+        Tamaño de la mayor clique menos uno.
+        """
+        return max(len(c) for c in self.cliques) - 1
+
+    def calibrar(self, e, verosimilitudes=None):
+        """
+        Propaga la evidencia e (recolección hacia la raíz y distribución desde la raíz).
+        verosimilitudes: evidencia virtual {variable: vector} (ver _preparar_consulta),
+                         que se multiplica en la clique de cada variable
+        Devuelve (creencias, prob_evidencia): la creencia de cada clique, proporcional
+        a P(clique, e), y P(e).
+        """
+        creencias = list(self.potenciales)
+        if not creencias:
+            return creencias, 1.0
+        for var, valor in e.items():
+            if var not in self.clique_de:
+                continue
+            valores_var = self.valores[var]
+            valor = convertir_valor(valor, valores_var)
+            if valor not in valores_var:
+                raise ValueError(f"Valor fuera del dominio de {var} en la evidencia: {valor!r}")
+            indicador = np.zeros(len(valores_var))
+            indicador[valores_var.index(valor)] = 1.0
+            k = self.clique_de[var]
+            creencias[k] = creencias[k].pointwise_product(FactorNP([var], indicador))
+        for var, vector in (verosimilitudes or {}).items():
+            k = self.clique_de[var]
+            creencias[k] = creencias[k].pointwise_product(FactorNP([var], vector))
+
+        # Recolección: de las hojas hacia la raíz
+        mensajes = {}
+        for i in reversed(self.orden[1:]):
+            p = self.padre[i]
+            mensaje = _sumar_excepto(creencias[i], self.vecinos[i][p])
+            mensajes[i] = mensaje
+            creencias[p] = creencias[p].pointwise_product(mensaje)
+
+        # Distribución: de la raíz hacia las hojas
+        for i in self.orden[1:]:
+            p = self.padre[i]
+            nuevo = _sumar_excepto(creencias[p], self.vecinos[i][p])
+            creencias[i] = creencias[i].pointwise_product(_dividir(nuevo, mensajes[i]))
+
+        prob_evidencia = float(creencias[0].tabla.sum())
+        return creencias, prob_evidencia
+
+    def marginales(self, e, verosimilitudes=None):
+        """
+        Devuelve P(X | e) para todas las variables de la red en una sola calibración.
+        """
+        creencias, _ = self.calibrar(e, verosimilitudes)
+        resultado = {}
+        for var, k in self.clique_de.items():
+            tabla = _sumar_excepto(creencias[k], [var]).tabla
+            resultado[var] = normaliza(dict(zip(self.valores[var], tabla.tolist())))
+        return resultado
+
+def compilar_arbol_uniones(red):
+    """
+    Devuelve el árbol de uniones de la red. El árbol compilado se guarda en la
+    caché de la red y se reutiliza hasta que la red se modifica.
+    """
+    cache = _cache_red(red)
+    if 'arbol_uniones' not in cache:
+        cache['arbol_uniones'] = ArbolUniones(red)
+    return cache['arbol_uniones']
+
+@_instrumentada
+def inferencia_arbol_uniones(X, e, red, virtual=None, do=None):
+    """
+    Inferencia con el árbol de uniones compilado de la red.
+    virtual, do: evidencia virtual e intervenciones, como en
+                 inferencia_eliminacion_variables (la red intervenida
+                 compila y guarda su propio árbol)
+    """
+    red, e, verosimilitudes = _preparar_consulta(e, red, virtual, do)
+    arbol = compilar_arbol_uniones(red)
+    if _REGISTROS:
+        medidas = [_medidas_factor(p) for p in arbol.potenciales]
+        _emitir('arbol_uniones', cliques=len(arbol.cliques), anchura=arbol.anchura(),
+                celdas=max(c for c, _ in medidas), bytes=max(b for _, b in medidas))
+    return arbol.marginales(e, verosimilitudes)[X]
+
+
+# ==========================================
+# Inferencia por lotes
+# ==========================================
+
+VAR_LOTE = '#lote'
+
+def _codificar_columna(rc, var, columna):
+    """
+    Convierte una columna de evidencia en códigos enteros:
+    -1 = valor faltante, -2 = valor fuera del dominio.
+    Las columnas enteras se interpretan como códigos ya calculados (-1 = faltante),
+    las de punto flotante como códigos con NaN = faltante y el resto como valores
+    del dominio con None o NaN = faltante.
+    """
+    columna = np.asarray(columna)
+    card = len(rc.valores[var])
+    if columna.dtype.kind in 'iu':
+        codigos = columna.astype(np.int64)
+    elif columna.dtype.kind == 'f':
+        faltantes = np.isnan(columna)
+        codigos = np.where(faltantes, -1, columna).astype(np.int64)
+    else:
+        faltantes = np.array([v is None or (isinstance(v, float) and v != v) for v in columna], dtype=bool)
+        unicos, inversa = np.unique(columna.astype(str), return_inverse=True)
+        codigos_unicos = np.array([rc.codificar(var, u) for u in unicos.tolist()], dtype=object)
+        codigos_unicos = np.array([-2 if c is None else c for c in codigos_unicos], dtype=np.int64)
+        codigos = np.where(faltantes, -1, codigos_unicos[inversa.reshape(-1)])
+    codigos[(codigos >= card) | (codigos < -1)] = -2
+    return codigos
+
+def _tabla_evidencias(evidencias, columnas):
+    """
+    Normaliza la evidencia por lotes a (columnas, lista de columnas, número de filas).
+    """
+    if isinstance(evidencias, np.ndarray):
+        if columnas is None:
+            raise ValueError("Con un arreglo de evidencias se debe indicar `columnas`")
+        if evidencias.ndim != 2 or evidencias.shape[1] != len(columnas):
+            raise ValueError(f"Se esperaba un arreglo (N, {len(columnas)}), se recibió {evidencias.shape}")
+        return list(columnas), [evidencias[:, k] for k in range(len(columnas))], len(evidencias)
+
+    filas = list(evidencias)
+    if columnas is None:
+        columnas = []
+        for fila in filas:
+            columnas.extend(v for v in fila if v not in columnas)
+    datos = [np.array([fila.get(v) for fila in filas], dtype=object) for v in columnas]
+    return list(columnas), datos, len(filas)
+
+@_instrumentada
+def conjunta_lote(vars_consulta, evidencias, red, columnas=None, orden='min_fill', log=False, virtual=None, do=None):
+    """
+    Calcula P(vars_consulta, e) sin normalizar para N conjuntos de evidencia.
+    Ver inferencia_lote para el formato de `evidencias`.
+    Se eliminan las variables con FactorNP sobre un eje adicional VAR_LOTE
+    que recorre las N filas.
+    Devuelve un arreglo (N, |dom(v1)|, |dom(v2)|, ...); con vars_consulta vacía
+    es el vector (N,) de P(e) de cada fila.
+    log: si es True, calcula y devuelve logaritmos (FactorLog)
+    virtual: evidencia virtual {variable: verosimilitudes}; un vector de
+             |dom(variable)| pesos común a todas las filas o un arreglo
+             (N, |dom(variable)|) con los de cada fila
+    do: intervenciones {variable: valor} comunes a todas las filas (ver intervenir)
+    """
+    rc = intervenir(red, do)
+    vars_consulta = list(vars_consulta)
+    columnas, datos, n_filas = _tabla_evidencias(evidencias, columnas)
+
+    # Factores de verosimilitud (N, |dom(var)|) para cada columna observada
+    factores_evidencia = []
+    for var, columna in zip(columnas, datos):
+        if var not in rc.indice:
+            continue
+        codigos = _codificar_columna(rc, var, columna)
+        observadas = codigos != -1
+        if not observadas.any():
+            continue
+        verosimilitud = np.ones((n_filas, len(rc.valores[var])))
+        verosimilitud[observadas] = 0.0
+        validas = codigos >= 0
+        verosimilitud[np.flatnonzero(validas), codigos[validas]] = 1.0
+        factor = FactorNP([VAR_LOTE, var], verosimilitud)
+        factores_evidencia.append(FactorLog.desde_factor(factor) if log else factor)
+    for var, pesos in (virtual or {}).items():
+        vector = _vector_verosimilitud(rc, var, pesos, lote=True)
+        if vector.ndim == 1:
+            factor = FactorNP([var], vector)
+        else:
+            factor = FactorNP([VAR_LOTE, var], np.broadcast_to(vector, (n_filas, vector.shape[1])))
+        factores_evidencia.append(FactorLog.desde_factor(factor) if log else factor)
+
+    # Solo hacen falta la consulta, la evidencia y sus ancestros (el resto son nodos estériles)
+    relevantes = ancestros(vars_consulta + [f.vars[-1] for f in factores_evidencia], rc)
+    crear_factores = factores_log if log else factores_np
+    factores = [f for v in rc.variables if v in relevantes for f in crear_factores(v, {}, rc)]
+    factores += factores_evidencia
+
+    vars_ocultas = [v for v in rc.variables if v in relevantes and v not in vars_consulta]
+    factores = eliminar_variables(factores, orden_eliminacion(rc, vars_ocultas, orden, relevantes, compactas=True))
+
+    forma = [n_filas] + [len(rc.valores[v]) for v in vars_consulta]
+    if log:
+        resultado = FactorLog([VAR_LOTE] + vars_consulta, np.zeros(forma))
+    else:
+        resultado = FactorNP([VAR_LOTE] + vars_consulta, np.ones(forma))
+    for f in factores:
+        resultado = resultado.pointwise_product(f)
+    if log:
+        resultado = FactorNP(resultado.vars, resultado.log_valores())
+    return resultado._alinear([VAR_LOTE] + vars_consulta).reshape(forma)
+
+@_instrumentada
+def inferencia_lote(X, evidencias, red, columnas=None, orden='min_fill', log=False, virtual=None, do=None):
+    """
+    Calcula P(X | e) para N conjuntos de evidencia en una sola llamada.
+    evidencias: lista de diccionarios (una fila por caso; las variables ausentes
+                o con None son faltantes) o arreglo 2D con una columna por
+                variable de `columnas` (ver _codificar_columna para los faltantes).
+    log: si es True, calcula en espacio logarítmico (evita que filas con mucha
+         evidencia poco probable queden en cero)
+    virtual, do: evidencia virtual e intervenciones (ver conjunta_lote)
+    Devuelve un arreglo (N, |dom(X)|) en el orden de red['valores'][X]; las filas
+    con evidencia imposible quedan en cero.
+    """
+    if log:
+        log_tabla = conjunta_lote([X], evidencias, red, columnas, orden, log=True, virtual=virtual, do=do)
+        log_pe = _log_suma_filas(log_tabla)
+        with np.errstate(invalid='ignore'):
+            tabla = np.exp(log_tabla - log_pe[:, None])
+        return np.where(np.isfinite(log_pe)[:, None], tabla, 0.0)
+    tabla = conjunta_lote([X], evidencias, red, columnas, orden, virtual=virtual, do=do)
+    totales = tabla.sum(axis=1, keepdims=True)
+    return np.divide(tabla, totales, out=np.zeros_like(tabla), where=totales > 0)
+
+@_instrumentada
+def log_probabilidad_lote(evidencias, red, columnas=None, orden='min_fill', virtual=None, do=None):
+    """
+    log P(e) de N conjuntos de evidencia (ver inferencia_lote para el
+    formato), calculado por lotes en espacio logarítmico; útil para puntuar
+    anomalías. Devuelve un vector (N,) con -inf para la evidencia imposible.
+    virtual, do: evidencia virtual e intervenciones (ver conjunta_lote)
+    """
+    return conjunta_lote([], evidencias, red, columnas, orden, log=True, virtual=virtual, do=do)
+
+def _log_suma_filas(log_tabla):
+    """
+    log-sum-exp de cada fila de una tabla (N, ...) de logaritmos.
+    """
+    log_tabla = log_tabla.reshape(len(log_tabla), -1)
+    maximo = log_tabla.max(axis=1, keepdims=True)
+    maximo[~np.isfinite(maximo)] = 0.0
+    with np.errstate(divide='ignore'):
+        return np.log(np.exp(log_tabla - maximo).sum(axis=1)) + maximo[:, 0]
+
+
+# ==========================================
+# Carga y guardado de redes
+# ==========================================
+
+def _claves_tdp(red, var):
+    """
+    Diccionario texto -> tupla con todas las combinaciones de valores de los
+    padres de `var`, escritas como en los archivos JSON: "('Si', 'No')".
+    """
+    claves = {}
+    for comb in itertools.product(*[red['valores'][p] for p in red['padres'][var]]):
+        claves[str(comb)] = comb
+    return claves
+
+def validar_red(red):
+    """
+    Verifica la estructura de la red y la forma de sus TDP.
+    Lanza ValueError con la descripción del primer problema encontrado.
+    """
+    for clave in ('variables', 'valores', 'padres', 'TDP'):
+        if clave not in red:
+            raise ValueError(f"Falta la sección '{clave}'")
+    for var in red['variables']:
+        for clave in ('valores', 'padres', 'TDP'):
+            if var not in red[clave]:
+                raise ValueError(f"La variable {var} no aparece en '{clave}'")
+        for padre in red['padres'][var]:
+            if padre not in red['valores']:
+                raise ValueError(f"El padre {padre} de {var} no es una variable de la red")
+
+        if var in _compactas(red):
+            continue
+        esperadas = _tamano_factor(red['padres'][var], red)
+        if len(red['TDP'][var]) != esperadas:
+            raise ValueError(f"La TDP de {var} tiene {len(red['TDP'][var])} filas, se esperaban {esperadas}")
+        for val_padres, probs in red['TDP'][var].items():
+            if len(val_padres) != len(red['padres'][var]):
+                raise ValueError(f"Fila {val_padres} de {var}: se esperaban {len(red['padres'][var])} valores de padres")
+            if set(probs) != set(red['valores'][var]):
+                raise ValueError(f"Fila {val_padres} de {var}: valores {list(probs)}, se esperaban {red['valores'][var]}")
+            total = sum(probs.values())
+            if abs(total - 1.0) > 0.01:
+                raise ValueError(f"Fila {val_padres} de {var}: probabilidades suman {total}, se esperaba 1.0")
+    _ordenar_topologicamente(list(red['variables']), red['padres'])
+
+def cargar_red(ruta, validar=True):
+    """
+    Carga una red desde un archivo JSON con el formato de los ejemplos
+    (claves de TDP escritas como tuplas: "('Si', 'No')").
+    Las claves se resuelven contra las combinaciones de valores de los padres,
+    sin evaluar texto. Si validar es True se comprueba la red con validar_red.
+    """
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+
+    red = crear_red_bayesiana()
+    red['variables'] = list(datos['variables'])
+    red['valores'] = {v: list(vals) for v, vals in datos['valores'].items()}
+    red['padres'] = {v: list(ps) for v, ps in datos['padres'].items()}
+
+    for var in red['variables']:
+        claves = _claves_tdp(red, var)
+        tdp = {}
+        for texto, probs in datos['TDP'].get(var, {}).items():
+            if texto not in claves:
+                raise ValueError(f"Clave de TDP no reconocida para {var}: {texto}")
+            tdp[claves[texto]] = {convertir_valor(k, red['valores'][var]): p for k, p in probs.items()}
+        red['TDP'][var] = tdp
+
+    for var, descripcion in datos.get('compactas', {}).items():
+        if var not in red['padres']:
+            raise ValueError(f"TDP compacta de una variable inexistente: {var}")
+        compacta = tdp_desde_json(descripcion).vincular(var, red['padres'][var], red['valores'])
+        red.setdefault('compactas', {})[var] = compacta
+
+    if validar:
+        validar_red(red)
+    return red
+
+def guardar_red(red, ruta):
+    """
+    Guarda la red en JSON con el mismo formato que lee cargar_red.
+    """
+    datos = {
+        'variables': list(red['variables']),
+        'valores': {v: list(red['valores'][v]) for v in red['variables']},
+        'padres': {v: list(red['padres'][v]) for v in red['variables']},
+        'TDP': {
+            v: {str(tuple(clave)): dict(probs) for clave, probs in red['TDP'][v].items()}
+            for v in red['variables']
+        },
+    }
+    if _compactas(red):
+        datos['compactas'] = {v: t.a_json() for v, t in _compactas(red).items()}
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=4, ensure_ascii=False)
+
+# Formato binario: MAGIA_BINARIA, longitud del encabezado (uint64, little-endian),
+# encabezado JSON (variables, valores, padres, desplazamiento y tamaño de cada TDP),
+# relleno hasta múltiplo de 64 bytes y luego todas las TDP como float64 contiguos.
+MAGIA_BINARIA = b'REDESBA1'
+
+def guardar_red_binaria(red, ruta):
+    """
+    Guarda la red en el formato binario que lee cargar_red_binaria.
+    Las TDP compactas se guardan expandidas como tablas.
+    """
+    rc = compilar_red(red)
+    desplazamientos = []
+    inicio = 0
+    for tabla in rc.tablas:
+        desplazamientos.append(inicio)
+        inicio += tabla.size
+    encabezado = json.dumps({
+        'variables': list(rc.variables),
+        'valores': rc.valores,
+        'padres': rc.padres,
+        'desplazamientos': desplazamientos,
+        'tamanos': [int(t.size) for t in rc.tablas],
+    }, ensure_ascii=False).encode('utf-8')
+
+    prefijo = len(MAGIA_BINARIA) + 8 + len(encabezado)
+    relleno = (-prefijo) % 64
+    with open(ruta, 'wb') as f:
+        f.write(MAGIA_BINARIA)
+        f.write(np.uint64(len(encabezado) + relleno).tobytes())
+        f.write(encabezado + b' ' * relleno)
+        for tabla in rc.tablas:
+            f.write(tabla.astype('<f8').tobytes())
+
+def cargar_red_binaria(ruta, mapear=True):
+    """
+    Carga una red guardada con guardar_red_binaria como RedCompilada.
+    Si mapear es True, las TDP se leen con np.memmap (sin copiarlas a memoria),
+    de modo que cargar muchas redes es casi inmediato.
+    """
+    with open(ruta, 'rb') as f:
+        if f.read(len(MAGIA_BINARIA)) != MAGIA_BINARIA:
+            raise ValueError(f"{ruta} no es un archivo de red binario")
+        largo = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+        encabezado = json.loads(f.read(largo).decode('utf-8'))
+    inicio = len(MAGIA_BINARIA) + 8 + largo
+    total = sum(encabezado['tamanos'])
+
+    if mapear and total > 0:
+        datos = np.memmap(ruta, dtype='<f8', mode='r', offset=inicio, shape=(total,))
+    else:
+        with open(ruta, 'rb') as f:
+            f.seek(inicio)
+            datos = np.frombuffer(f.read(total * 8), dtype='<f8')
+
+    tablas = [datos[d:d + n] for d, n in zip(encabezado['desplazamientos'], encabezado['tamanos'])]
+    return RedCompilada(encabezado['variables'], encabezado['valores'], encabezado['padres'], tablas)
+
+def descompilar_red(rc):
+    """
+    Construye un diccionario de red editable a partir de una RedCompilada.
+    """
+    red = crear_red_bayesiana()
+    red['variables'] = list(rc.variables)
+    red['valores'] = {v: list(rc.valores[v]) for v in rc.variables}
+    red['padres'] = {v: list(rc.padres[v]) for v in rc.variables}
+    red['TDP'] = {v: {k: dict(p) for k, p in t.items()} for v, t in rc['TDP'].items()}
+    if rc.compactas:
+        red['compactas'] = dict(_compactas(rc))
+    return red
+
+
+# ==========================================
+# MPE y MAP marginal (eliminación max-producto)
+# ==========================================
+
+def _eliminar_max_producto(factores, orden_suma, orden_max):
+    """
+    Elimina primero las variables de orden_suma sumando y después las de
+    orden_max maximizando, guardando el argmax de cada paso.
+    Devuelve (valor, pasos) con pasos = [(var, vars_restantes, argmax), ...].
+    """
+    pasos = []
+    medir = bool(_REGISTROS)
+    if medir:
+        _emitir('orden', orden=list(orden_suma) + list(orden_max), maximizadas=list(orden_max))
+    for var, maximizar in [(v, False) for v in orden_suma] + [(v, True) for v in orden_max]:
+        factores_con_var = [f for f in factores if var in f.vars]
+        factores = [f for f in factores if var not in f.vars]
+        if not factores_con_var:
+            continue
+        if medir:
+            inicio = time.perf_counter()
+        producto = factores_con_var[0]
+        for f in factores_con_var[1:]:
+            producto = producto.pointwise_product(f)
+        if medir:
+            intermedio = time.perf_counter()
+        if maximizar:
+            nuevo, argmax = producto.max_out(var)
+            pasos.append((var, nuevo.vars, argmax))
+        else:
+            nuevo = producto.sum_out(var)
+        if medir:
+            celdas, nbytes = _medidas_factor(producto)
+            celdas_resultado, bytes_resultado = _medidas_factor(nuevo)
+            _emitir('eliminacion', variable=var, factores=len(factores_con_var), maximizar=maximizar,
+                    producto_s=intermedio - inicio, suma_s=time.perf_counter() - intermedio,
+                    celdas=celdas, bytes=nbytes, celdas_resultado=celdas_resultado, bytes_resultado=bytes_resultado)
+        factores.append(nuevo)
+
+    valor = 1.0
+    for f in factores:
+        valor *= float(f.tabla)
+    return valor, pasos
+
+def _rastrear(pasos, red):
+    """
+    Recupera la asignación maximizadora recorriendo los pasos al revés: cada
+    argmax depende solo de variables eliminadas después.
+    """
+    codigos = {}
+    for var, restantes, argmax in reversed(pasos):
+        codigos[var] = int(argmax[tuple(codigos[v] for v in restantes)])
+    return {var: red['valores'][var][k] for var, k in codigos.items()}
+
+@_instrumentada
+def mpe(e, red, orden='min_fill', virtual=None, do=None):
+    """
+    Explicación más probable: la asignación conjunta de todas las variables no
+    observadas que maximiza P(x, e), por eliminación max-producto.
+    virtual, do: evidencia virtual e intervenciones, como en
+                 inferencia_eliminacion_variables; las variables intervenidas
+                 quedan fuera de la asignación, como las observadas
+    Devuelve (asignacion, probabilidad) con probabilidad = P(asignacion, e)
+    (multiplicada por las verosimilitudes de la evidencia virtual, si la hay).
+    """
+    red, e, verosimilitudes = _preparar_consulta(e, red, virtual, do)
+    e = {k: v for k, v in e.items() if k in red['padres']}
+    factores = [make_factor_np(var, e, red) for var in red['variables']]
+    factores += factores_virtuales(verosimilitudes, e, red)
+    vars_max = [v for v in red['variables'] if v not in e]
+    orden_max = orden_eliminacion(red, vars_max, orden, vars_max)
+    valor, pasos = _eliminar_max_producto(factores, [], orden_max)
+    return _rastrear(pasos, red), valor
+
+@_instrumentada
+def map_marginal(vars_map, e, red, orden='min_fill', virtual=None, do=None):
+    """
+    MAP marginal: la asignación de vars_map que maximiza P(vars_map, e),
+    sumando antes el resto de variables no observadas. Las variables que no
+    son ancestros de vars_map ni de la evidencia se descartan (nodos estériles).
+    virtual, do: evidencia virtual e intervenciones, como en mpe
+    Devuelve (asignacion, probabilidad) con probabilidad = P(asignacion, e).
+    """
+    red, e, verosimilitudes = _preparar_consulta(e, red, virtual, do)
+    e = {k: v for k, v in e.items() if k in red['padres']}
+    vars_map = [v for v in red['variables'] if v in set(vars_map) and v not in e]
+    relevantes = ancestros(vars_map + list(e) + list(verosimilitudes), red)
+    factores = [make_factor_np(var, e, red) for var in red['variables'] if var in relevantes]
+    factores += factores_virtuales(verosimilitudes, e, red)
+
+    vars_suma = [v for v in red['variables'] if v in relevantes and v not in e and v not in vars_map]
+    vars_grafo = [v for v in red['variables'] if v in relevantes and v not in e]
+    orden_vars = orden_eliminacion(red, vars_suma, orden, vars_grafo, vars_despues=vars_map)
+    valor, pasos = _eliminar_max_producto(factores, orden_vars[:len(vars_suma)], orden_vars[len(vars_suma):])
+    return _rastrear(pasos, red), valor
+
+
+# ==========================================
+# Consultas sobre varias variables
+# ==========================================
+
+def _distribucion_conjunta(vars_consulta, e, red, orden, verosimilitudes=None):
+    """
+    P(vars_consulta | e) como arreglo con un eje por variable de consulta,
+    con una sola pasada de eliminación de variables.
+    """
+    rc = compilar_red(red)
+    verosimilitudes = verosimilitudes or {}
+    e = {k: v for k, v in e.items() if k in rc.indice}
+    libres = [v for v in vars_consulta if v not in e]
+    relevantes = ancestros(list(vars_consulta) + list(e) + list(verosimilitudes), rc)
+    factores = [f for var in rc.variables if var in relevantes for f in factores_np(var, e, rc)]
+    factores += factores_virtuales(verosimilitudes, e, rc)
+
+    vars_ocultas = [v for v in rc.variables if v in relevantes and v not in e and v not in vars_consulta]
+    vars_grafo = [v for v in rc.variables if v in relevantes and v not in e]
+    factores = eliminar_variables(factores, orden_eliminacion(rc, vars_ocultas, orden, vars_grafo, compactas=True))
+
+    forma = [len(rc.valores[v]) for v in libres]
+    resultado = FactorNP(libres, np.ones(forma))
+    for f in factores:
+        resultado = resultado.pointwise_product(f)
+    tabla = resultado._alinear(libres).reshape(forma)
+
+    # Las variables de consulta observadas quedan fijas en su valor
+    completa = np.zeros([len(rc.valores[v]) for v in vars_consulta])
+    indices = []
+    for v in vars_consulta:
+        if v in e:
+            codigo = rc.codificar(v, e[v])
+            if codigo is None:
+                return completa
+            indices.append(codigo)
+        else:
+            indices.append(slice(None))
+    completa[tuple(indices)] = tabla
+
+    total = completa.sum()
+    return completa / total if total > 0 else completa
+
+@_instrumentada
+def consulta_multiple(vars_consulta, e, red, conjunta=False, orden='min_fill', virtual=None, do=None):
+    """
+    Consulta sobre varias variables a la vez.
+    conjunta=False: devuelve {variable: P(variable | e)} para cada variable de
+                    consulta, leyendo todas de una sola calibración del árbol
+                    de uniones (los mensajes de ida y vuelta se comparten).
+    conjunta=True: devuelve P(vars_consulta | e) como diccionario
+                   {tupla de valores (en el orden de vars_consulta): probabilidad},
+                   calculado con una sola pasada de eliminación.
+    virtual, do: evidencia virtual e intervenciones, como en
+                 inferencia_eliminacion_variables
+    """
+    vars_consulta = list(vars_consulta)
+    red, e, verosimilitudes = _preparar_consulta(e, red, virtual, do)
+    if conjunta:
+        tabla = _distribucion_conjunta(vars_consulta, e, red, orden, verosimilitudes)
+        dominios = [red['valores'][v] for v in vars_consulta]
+        return {comb: float(p) for comb, p in zip(itertools.product(*dominios), tabla.reshape(-1).tolist())}
+
+    marginales = compilar_arbol_uniones(red).marginales(e, verosimilitudes)
+    return {v: marginales[v] for v in vars_consulta}
+
+
+# ==========================================
+# Sesión de inferencia con evidencia incremental
+# ==========================================
+
+class SesionInferencia:
+    """
+    Mantiene calibrado el árbol de uniones de una red mientras la evidencia
+    llega (o se retira) de a una variable.
+    Los mensajes siguen el esquema Shafer-Shenoy y se guardan normalizados.
+    Al cambiar la evidencia de una variable solo se recalculan los mensajes que
+    salen de su clique, y la propagación se corta en las ramas donde un mensaje
+    no cambia; solo se recalculan las marginales de las cliques afectadas.
+    Las posteriores quedan precalculadas: leerlas no requiere inferencia.
+    virtual: evidencia virtual inicial (ver agregar_evidencia_virtual)
+    do: intervenciones fijas de la sesión (ver intervenir)
+    """
+    def __init__(self, red, e=None, tolerancia=1e-12, virtual=None, do=None):
+        self.red = red
+        self.do = dict(do or {})
+        self.tolerancia = tolerancia
+        self.evidencia = {}
+        self.virtual = {}
+        self._reconstruir()
+        for var, valor in (e or {}).items():
+            self.agregar_evidencia(var, valor)
+        for var, verosimilitud in (virtual or {}).items():
+            self.agregar_evidencia_virtual(var, verosimilitud)
+
+    def _reconstruir(self):
+        self.version = version_red(self.red)
+        self.arbol = compilar_arbol_uniones(intervenir(self.red, self.do) if self.do else self.red)
+        self.evidencia = {k: v for k, v in self.evidencia.items() if k in self.arbol.clique_de}
+        self.virtual = {k: v for k, v in self.virtual.items()
+                        if k in self.arbol.clique_de and len(v) == len(self.arbol.valores[k])}
+        self.vars_de_clique = [[] for _ in self.arbol.cliques]
+        for var, k in self.arbol.clique_de.items():
+            self.vars_de_clique[k].append(var)
+        self.potenciales = [self._potencial(k) for k in range(len(self.arbol.cliques))]
+
+        # Mensajes iniciales: recolección hacia la raíz y luego distribución
+        self.mensajes = {}
+        for i in reversed(self.arbol.orden[1:]):
+            self.mensajes[(i, self.arbol.padre[i])] = self._mensaje(i, self.arbol.padre[i])
+        for i in self.arbol.orden[1:]:
+            self.mensajes[(self.arbol.padre[i], i)] = self._mensaje(self.arbol.padre[i], i)
+
+        self.marginales = {}
+        for k in range(len(self.arbol.cliques)):
+            self._actualizar_marginales(k)
+
+    def _verificar_version(self):
+        # Si la red se editó después de compilar, se empieza de nuevo
+        if version_red(self.red) != self.version:
+            self._reconstruir()
+
+    def _potencial(self, k):
+        """
+        Potencial de la clique k con los indicadores de la evidencia asignada a
+        ella y las verosimilitudes de su evidencia virtual.
+        """
+        potencial = self.arbol.potenciales[k]
+        for var in self.vars_de_clique[k]:
+            if var in self.virtual:
+                potencial = potencial.pointwise_product(FactorNP([var], self.virtual[var]))
+            if var not in self.evidencia:
+                continue
+            valor = self.evidencia[var]
+            valores_var = self.arbol.valores[var]
+            indicador = np.zeros(len(valores_var))
+            valor = convertir_valor(valor, valores_var)
+            if valor in valores_var:
+                indicador[valores_var.index(valor)] = 1.0
+            potencial = potencial.pointwise_product(FactorNP([var], indicador))
+        return potencial
+
+    def _creencia(self, k, excepto=None):
+        creencia = self.potenciales[k]
+        for j in self.arbol.vecinos[k]:
+            if j != excepto:
+                creencia = creencia.pointwise_product(self.mensajes[(j, k)])
+        return creencia
+
+    def _mensaje(self, i, j):
+        mensaje = _sumar_excepto(self._creencia(i, excepto=j), self.arbol.vecinos[i][j])
+        total = mensaje.tabla.sum()
+        if total > 0:
+            mensaje = FactorNP(mensaje.vars, mensaje.tabla / total)
+        return mensaje
+
+    def _actualizar_marginales(self, k):
+        variables = self.vars_de_clique[k]
+        if not variables:
+            return
+        creencia = self._creencia(k)
+        for var in variables:
+            tabla = _sumar_excepto(creencia, [var]).tabla
+            self.marginales[var] = normaliza(dict(zip(self.arbol.valores[var], tabla.tolist())))
 
-    return normaliza(distribucion)
+    def _propagar(self, k):
+        """
+        Recalcula el potencial de la clique k y los mensajes que salen de ella.
+        """
+        self.potenciales[k] = self._potencial(k)
+        afectadas = {k}
+        pendientes = [(k, j) for j in self.arbol.vecinos[k]]
+        while pendientes:
+            i, j = pendientes.pop()
+            nuevo = self._mensaje(i, j)
+            viejo = self.mensajes[(i, j)]
+            if np.abs(nuevo.tabla - viejo.tabla).max(initial=0.0) <= self.tolerancia:
+                continue
+            self.mensajes[(i, j)] = nuevo
+            afectadas.add(j)
+            pendientes.extend((j, l) for l in self.arbol.vecinos[j] if l != i)
+        for c in afectadas:
+            self._actualizar_marginales(c)
+
+    def agregar_evidencia(self, var, valor):
+        """
+        Observa var = valor (reemplaza una observación anterior de var).
+        """
+        self._verificar_version()
+        if var not in self.arbol.clique_de:
+            raise ValueError(f"La variable {var} no existe en la red")
+        valor = convertir_valor(valor, self.arbol.valores[var])
+        if valor not in self.arbol.valores[var]:
+            raise ValueError(f"Valor fuera del dominio de {var} en la evidencia: {valor!r}")
+        if var in self.evidencia and self.evidencia[var] == valor:
+            return
+        self.evidencia[var] = valor
+        self._propagar(self.arbol.clique_de[var])
+
+    def agregar_evidencia_virtual(self, var, verosimilitud):
+        """
+        Agrega evidencia virtual sobre var: diccionario valor -> verosimilitud
+        o secuencia en el orden del dominio (reemplaza la anterior de var).
+        """
+        self._verificar_version()
+        vector = _vector_verosimilitud(compilar_red(self.red), var, verosimilitud)
+        if var in self.virtual and np.array_equal(self.virtual[var], vector):
+            return
+        self.virtual[var] = vector
+        self._propagar(self.arbol.clique_de[var])
+
+    def retirar_evidencia(self, var):
+        """
+        Olvida la observación de var y su evidencia virtual, si las había.
+        """
+        self._verificar_version()
+        if var not in self.evidencia and var not in self.virtual:
+            return
+        self.evidencia.pop(var, None)
+        self.virtual.pop(var, None)
+        self._propagar(self.arbol.clique_de[var])
 
+    def posterior(self, var):
+        """
+        P(var | evidencia actual).
+        """
+        self._verificar_version()
+        return self.marginales[var]
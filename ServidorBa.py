@@ -0,0 +1,244 @@
+"""
+Servidor local de consultas sobre una red bayesiana publicada (ver
+RedesBa.RedPublicada). Protocolo: JSON Lines sobre TCP; cada línea es una
+petición y cada respuesta lleva el mismo "id":
+
+    {"id": 1, "op": "posterior", "X": "Llegar Tarde", "e": {"Retrasos": "Si"}}
+    {"id": 1, "distribucion": {"Si": 0.61, "No": 0.39}, "generacion": 0}
+
+Operaciones:
+  posterior: P(X | e), con intervenciones opcionales "do": {variable: valor}
+  log_probabilidad: log P(e) (null si la evidencia es imposible), con "do" opcional
+  info: variables y dominios de la versión publicada
+  estadisticas: lotes y consultas atendidos
+
+Las consultas posterior y log_probabilidad que llegan a la vez (de una o
+varias conexiones) se agrupan y se resuelven con una sola llamada a
+inferencia_lote o log_probabilidad_lote por variable de consulta.
+
+    python ServidorBa.py LLegarTarde.json --puerto 8765
+"""
+import argparse
+import asyncio
+import functools
+import json
+import math
+
+import RedesBa
+
+class AgrupadorConsultas:
+    """
+    Reúne las consultas individuales concurrentes en llamadas por lotes. Cada
+    grupo (tipo de consulta, instantánea, X y do) se despacha cuando junta
+    `max_lote` filas o cuando pasan `espera` segundos desde su primera
+    consulta. Cada consulta se valida y se resuelve sobre la instantánea
+    publicada al recibirla; los lotes se calculan en el ejecutor del bucle.
+    Si un lote falla, sus filas se recalculan por separado para que el error
+    solo llegue a la consulta que lo causó.
+    """
+    def __init__(self, publicada, max_lote=256, espera=0.002):
+        self.publicada = publicada
+        self.max_lote = max_lote
+        self.espera = espera
+        self.lotes = 0
+        self.consultas = 0
+        self._pendientes = {}
+        self._temporizadores = {}
+
+    async def posterior(self, X, e, do=None):
+        rc = self.publicada.instantanea()
+        if not isinstance(X, str) or X not in rc.indice:
+            raise ValueError(f"Variable desconocida: {X}")
+        _validar_asignacion(rc, 'e', e, faltantes=True)
+        _validar_asignacion(rc, 'do', do or {})
+        return await self._encolar(('posterior', rc, X, RedesBa._canonico(do or {})), e, do)
+
+    async def log_probabilidad(self, e, do=None):
+        rc = self.publicada.instantanea()
+        _validar_asignacion(rc, 'e', e, faltantes=True)
+        _validar_asignacion(rc, 'do', do or {})
+        return await self._encolar(('log_probabilidad', rc, None, RedesBa._canonico(do or {})), e, do)
+
+    async def _encolar(self, clave, e, do):
+        bucle = asyncio.get_running_loop()
+        futuro = bucle.create_future()
+        _, filas = self._pendientes.setdefault(clave, (do, []))
+        filas.append((e, futuro))
+        if len(filas) >= self.max_lote:
+            self._despachar(clave)
+        elif clave not in self._temporizadores:
+            self._temporizadores[clave] = bucle.call_later(self.espera, self._despachar, clave)
+        return await futuro
+
+    def _despachar(self, clave):
+        temporizador = self._temporizadores.pop(clave, None)
+        if temporizador is not None:
+            temporizador.cancel()
+        do, filas = self._pendientes.pop(clave, (None, []))
+        if filas:
+            asyncio.ensure_future(self._resolver(clave, do, filas))
+
+    async def _resolver(self, clave, do, filas):
+        tipo, rc, X, _ = clave
+        evidencias = [e for e, _ in filas]
+        bucle = asyncio.get_running_loop()
+        try:
+            if tipo == 'posterior':
+                calculo = functools.partial(RedesBa.inferencia_lote, X, evidencias, rc, do=do)
+                tabla = await bucle.run_in_executor(None, calculo)
+                resultados = [dict(zip(rc.valores[X], fila)) for fila in tabla.tolist()]
+            else:
+                calculo = functools.partial(RedesBa.log_probabilidad_lote, evidencias, rc, do=do)
+                log_pe = await bucle.run_in_executor(None, calculo)
+                resultados = [v if math.isfinite(v) else None for v in log_pe.tolist()]
+        except Exception as ex:
+            if len(filas) > 1:
+                for fila in filas:
+                    await self._resolver(clave, do, [fila])
+                return
+            for _, futuro in filas:
+                if not futuro.done():
+                    futuro.set_exception(ex)
+            return
+        self.lotes += 1
+        self.consultas += len(filas)
+        for (_, futuro), resultado in zip(filas, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+def _validar_asignacion(rc, nombre, asignacion, faltantes=False):
+    """
+    Comprueba que `asignacion` sea un diccionario de variables de la red en
+    valores de su dominio (None = faltante si `faltantes`); si no, ValueError.
+    """
+    if not isinstance(asignacion, dict):
+        raise ValueError(f"'{nombre}' debe ser un objeto {{variable: valor}}")
+    for var, valor in asignacion.items():
+        if var not in rc.indice:
+            raise ValueError(f"Variable desconocida en '{nombre}': {var}")
+        if valor is None and faltantes:
+            continue
+        if not isinstance(valor, (str, int, float, bool)) or rc.codificar(var, valor) is None:
+            raise ValueError(f"Valor fuera del dominio de {var} en '{nombre}': {valor!r}")
+
+class ServidorConsultas:
+    """
+    Servidor asyncio de JSON Lines sobre TCP (ver el protocolo al inicio del
+    módulo). Cada petición se atiende en su propia tarea, así que las
+    peticiones encadenadas de una misma conexión también se agrupan.
+    """
+    def __init__(self, publicada, anfitrion='127.0.0.1', puerto=8765, max_lote=256, espera=0.002):
+        self.publicada = publicada
+        self.anfitrion = anfitrion
+        self.puerto = puerto
+        self.agrupador = AgrupadorConsultas(publicada, max_lote, espera)
+        self.servidor = None
+        self._conexiones = {}
+
+    async def iniciar(self):
+        self.servidor = await asyncio.start_server(self._atender, self.anfitrion, self.puerto)
+        self.puerto = self.servidor.sockets[0].getsockname()[1]
+        return self.servidor
+
+    async def servir(self):
+        if self.servidor is None:
+            await self.iniciar()
+        async with self.servidor:
+            await self.servidor.serve_forever()
+
+    async def cerrar(self):
+        if self.servidor is not None:
+            self.servidor.close()
+            conexiones = list(self._conexiones.items())
+            for escritor, _ in conexiones:
+                escritor.close()
+            await asyncio.gather(*[tarea for _, tarea in conexiones], return_exceptions=True)
+            await self.servidor.wait_closed()
+
+    async def _atender(self, lector, escritor):
+        tareas = set()
+        self._conexiones[escritor] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    linea = await lector.readline()
+                except (ConnectionError, ValueError):
+                    # Conexión cortada o línea más larga que el límite del lector
+                    break
+                if not linea:
+                    break
+                if not linea.strip():
+                    continue
+                tarea = asyncio.ensure_future(self._responder(linea, escritor))
+                tareas.add(tarea)
+                tarea.add_done_callback(tareas.discard)
+            if tareas:
+                await asyncio.gather(*tareas, return_exceptions=True)
+        finally:
+            self._conexiones.pop(escritor, None)
+            escritor.close()
+
+    async def _responder(self, linea, escritor):
+        respuesta = await self.procesar(linea)
+        escritor.write(json.dumps(respuesta, ensure_ascii=False).encode('utf-8') + b'\n')
+        await escritor.drain()
+
+    async def procesar(self, linea):
+        """
+        Atiende una petición (texto JSON o diccionario) y devuelve la respuesta.
+        """
+        try:
+            peticion = json.loads(linea) if isinstance(linea, (str, bytes)) else linea
+        except ValueError as ex:
+            return {'id': None, 'error': f"JSON inválido: {ex}"}
+        if not isinstance(peticion, dict):
+            return {'id': None, 'error': "La petición debe ser un objeto JSON"}
+        respuesta = {'id': peticion.get('id')}
+        op = peticion.get('op', 'posterior')
+        try:
+            e = peticion.get('e')
+            e = {} if e is None else e
+            do = peticion.get('do')
+            if op == 'posterior':
+                respuesta['distribucion'] = await self.agrupador.posterior(peticion['X'], e, do)
+            elif op == 'log_probabilidad':
+                respuesta['log_probabilidad'] = await self.agrupador.log_probabilidad(e, do)
+            elif op == 'info':
+                rc = self.publicada.instantanea()
+                respuesta['variables'] = list(rc.variables)
+                respuesta['valores'] = rc.valores
+            elif op == 'estadisticas':
+                agrupador = self.agrupador
+                respuesta.update(lotes=agrupador.lotes, consultas=agrupador.consultas,
+                                 consultas_por_lote=agrupador.consultas / agrupador.lotes if agrupador.lotes else 0.0)
+            else:
+                raise ValueError(f"Operación desconocida: {op}")
+        except KeyError as ex:
+            respuesta['error'] = f"Falta el campo {ex}"
+        except Exception as ex:
+            respuesta['error'] = f"{type(ex).__name__}: {ex}"
+        respuesta['generacion'] = self.publicada.generacion
+        return respuesta
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de consultas sobre una red bayesiana")
+    parser.add_argument('red', help="archivo JSON de la red (ver RedesBa.cargar_red)")
+    parser.add_argument('--anfitrion', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--max-lote', type=int, default=256)
+    parser.add_argument('--espera-ms', type=float, default=2.0,
+                        help="tiempo máximo que una consulta espera a otras para formar un lote")
+    args = parser.parse_args(argv)
+
+    red = RedesBa.cargar_red(args.red)
+    servidor = ServidorConsultas(RedesBa.RedPublicada(red), args.anfitrion, args.puerto, args.max_lote,
+                                 args.espera_ms / 1000.0)
+    print(f"Sirviendo {args.red} en {args.anfitrion}:{args.puerto}")
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
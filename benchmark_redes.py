@@ -0,0 +1,257 @@
+"""
+Banco de pruebas de los motores de inferencia sobre redes bayesianas
+sintéticas. Genera DAG aleatorios (número de nodos, máximo de padres,
+tamaño de dominio y cota de anchura de árbol configurables), ejecuta un
+mismo conjunto de consultas con cada motor y mide latencia (p50/p99),
+rendimiento y memoria pico. El resultado es JSON, para comparar versiones:
+
+    python benchmark_redes.py --nodos 20 50 --anchura 3 --salida actual.json
+    python benchmark_redes.py --nodos 20 50 --anchura 3 --comparar base.json
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import RedesBa
+import AproximadaBa
+
+VERSION_FORMATO = 1
+
+def red_aleatoria(n_nodos, max_padres=3, cardinalidad=2, anchura=None, concentracion=1.0, semilla=None):
+    """
+    Red bayesiana aleatoria con variables V0..V{n-1} en orden topológico.
+    max_padres: número máximo de padres de cada nodo
+    cardinalidad: tamaño del dominio (entero) o intervalo (mínimo, máximo)
+    anchura: si se da, los padres de Vi se eligen entre los `anchura` nodos
+             anteriores, con lo que la anchura de árbol del grafo moral no
+             supera ese valor
+    concentracion: parámetro de la Dirichlet simétrica de cada fila de las TDP
+    """
+    rng = np.random.default_rng(semilla)
+    if isinstance(cardinalidad, int):
+        cardinalidad = (cardinalidad, cardinalidad)
+    red = RedesBa.crear_red_bayesiana()
+    for i in range(n_nodos):
+        card = int(rng.integers(cardinalidad[0], cardinalidad[1] + 1))
+        RedesBa.agregar_variable(red, f"V{i}", [f"s{k}" for k in range(card)])
+    for i in range(n_nodos):
+        inicio = 0 if anchura is None else max(0, i - anchura)
+        candidatos = [f"V{j}" for j in range(inicio, i)]
+        k = int(rng.integers(0, min(max_padres, len(candidatos)) + 1))
+        padres = sorted(rng.choice(candidatos, size=k, replace=False).tolist(), key=lambda v: int(v[1:]))
+        var = f"V{i}"
+        RedesBa.establecer_padres(red, var, padres)
+        forma = [len(red['valores'][v]) for v in padres + [var]]
+        filas = rng.dirichlet(np.full(forma[-1], concentracion), size=int(np.prod(forma[:-1])))
+        RedesBa.establecer_tabla(red, var, filas.reshape(forma))
+    return red
+
+def generar_consultas(red, n_consultas, n_evidencia=3, semilla=None):
+    """
+    Lista de consultas (X, e) con X y las variables de evidencia elegidas al
+    azar y valores observados uniformes en su dominio.
+    """
+    rng = random.Random(semilla)
+    variables = red['variables']
+    consultas = []
+    for _ in range(n_consultas):
+        elegidas = rng.sample(variables, min(len(variables), n_evidencia + 1))
+        e = {v: rng.choice(red['valores'][v]) for v in elegidas[1:]}
+        consultas.append((elegidas[0], e))
+    return consultas
+
+def anchura_inducida(red):
+    """
+    Anchura inducida del orden min-fill de la red completa (sin evidencia).
+    """
+    plan = RedesBa.estimar_eliminacion(red['variables'][0], {}, red, 'min_fill', motor='numpy')
+    return plan['max_vars'] - 1
+
+MOTORES = {
+    'enumeracion': lambda X, e, red: RedesBa.inferencia_enumeracion(X, e, red),
+    'enumeracion_log': lambda X, e, red: RedesBa.inferencia_enumeracion(X, e, red, log=True),
+    've_dict': lambda X, e, red: RedesBa.inferencia_eliminacion_variables(X, e, red, motor='dict'),
+    've_numpy': lambda X, e, red: RedesBa.inferencia_eliminacion_variables(X, e, red, motor='numpy'),
+    've_log': lambda X, e, red: RedesBa.inferencia_eliminacion_variables(X, e, red, motor='log'),
+    'arbol_uniones': RedesBa.inferencia_arbol_uniones,
+    'lote': None,  # inferencia_lote: una llamada por variable de consulta (ver _llamadas)
+    'ponderacion_verosimilitud': lambda X, e, red: AproximadaBa.ponderacion_verosimilitud(
+        X, e, red, n_muestras=10000, semilla=0),
+}
+
+def _llamadas(motor, consultas, red):
+    """
+    Lista de (número de consultas respondidas, función sin argumentos) del motor.
+    """
+    if motor == 'lote':
+        grupos = {}
+        for X, e in consultas:
+            grupos.setdefault(X, []).append(e)
+        return [(len(evidencias), lambda X=X, evidencias=evidencias: RedesBa.inferencia_lote(X, evidencias, red))
+                for X, evidencias in grupos.items()]
+    funcion = MOTORES[motor]
+    return [(1, lambda X=X, e=e: funcion(X, e, red)) for X, e in consultas]
+
+def medir_motor(motor, red, consultas, max_segundos=None):
+    """
+    Mide un motor sobre las consultas. La primera llamada se cronometra aparte
+    (incluye la compilación de la red y del árbol de uniones, que luego quedan
+    en caché); después se cronometra cada llamada y, en una segunda pasada con
+    tracemalloc, se mide la memoria pico de trabajo.
+    max_segundos: si la pasada cronometrada supera este tiempo se detiene y el
+                  resultado se marca como truncado
+    """
+    llamadas = _llamadas(motor, consultas, red)
+    resultado = {'motor': motor, 'llamadas': 0, 'consultas': 0, 'fallidas': 0, 'truncado': False}
+    inicio = time.perf_counter()
+    try:
+        llamadas[0][1]()
+    except Exception as ex:
+        resultado['error'] = f"{type(ex).__name__}: {ex}"
+    resultado['calentamiento_s'] = time.perf_counter() - inicio
+
+    tiempos = []
+    for n, funcion in llamadas:
+        inicio = time.perf_counter()
+        try:
+            funcion()
+        except Exception as ex:
+            resultado['fallidas'] += 1
+            resultado.setdefault('error', f"{type(ex).__name__}: {ex}")
+            continue
+        tiempos.append(time.perf_counter() - inicio)
+        resultado['consultas'] += n
+        if max_segundos is not None and sum(tiempos) > max_segundos:
+            resultado['truncado'] = True
+            break
+    resultado['llamadas'] = len(tiempos)
+    if not tiempos:
+        return resultado
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for _, funcion in llamadas[:len(tiempos)]:
+        try:
+            funcion()
+        except Exception:
+            pass
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    latencias = np.array(tiempos) * 1000.0
+    resultado.update({
+        'consultas_por_llamada': resultado['consultas'] / len(tiempos),
+        'latencia_p50_ms': float(np.percentile(latencias, 50)),
+        'latencia_p99_ms': float(np.percentile(latencias, 99)),
+        'latencia_media_ms': float(latencias.mean()),
+        'consultas_por_segundo': resultado['consultas'] / float(np.sum(tiempos)),
+        'memoria_pico_bytes': int(pico),
+    })
+    return resultado
+
+def ejecutar(configuraciones, motores=None, n_consultas=50, n_evidencia=3, max_segundos=None, semilla=0):
+    """
+    Ejecuta el banco de pruebas. configuraciones: lista de diccionarios con
+    los parámetros de red_aleatoria (n_nodos, max_padres, cardinalidad,
+    anchura). Devuelve el informe como diccionario serializable a JSON.
+    """
+    motores = list(MOTORES) if motores is None else list(motores)
+    for motor in motores:
+        if motor not in MOTORES:
+            raise ValueError(f"Motor desconocido: {motor}. Opciones: {list(MOTORES)}")
+    informe = {
+        'version_formato': VERSION_FORMATO,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'entorno': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+        },
+        'parametros': {'consultas': n_consultas, 'evidencia': n_evidencia, 'max_segundos': max_segundos,
+                       'semilla': semilla},
+        'resultados': [],
+    }
+    for config in configuraciones:
+        config = dict(config, semilla=semilla)
+        inicio = time.perf_counter()
+        red = red_aleatoria(**config)
+        red_info = dict(config, generacion_s=time.perf_counter() - inicio, anchura_inducida=anchura_inducida(red))
+        consultas = generar_consultas(red, n_consultas, n_evidencia, semilla)
+        for motor in motores:
+            medicion = medir_motor(motor, red, consultas, max_segundos)
+            informe['resultados'].append(dict(red=red_info, **medicion))
+            print(f"{_clave(red_info)} {motor}: p50={medicion.get('latencia_p50_ms', float('nan')):.3f} ms "
+                  f"({medicion['consultas']} consultas)", file=sys.stderr)
+    return informe
+
+def _clave(red_info):
+    return tuple(red_info.get(k) for k in ('n_nodos', 'max_padres', 'cardinalidad', 'anchura', 'semilla'))
+
+def comparar(base, actual, tolerancia=0.25):
+    """
+    Compara dos informes de ejecutar. Devuelve la lista de regresiones: cada
+    métrica (latencia p50 y p99, memoria pico) de un mismo motor y
+    configuración que empeora más que `tolerancia` (fracción) respecto de la
+    base, o cuyo rendimiento (consultas por segundo) cae más que esa fracción.
+    """
+    anteriores = {(_clave(r['red']), r['motor']): r for r in base['resultados']}
+    regresiones = []
+    for r in actual['resultados']:
+        previo = anteriores.get((_clave(r['red']), r['motor']))
+        if previo is None:
+            continue
+        for metrica, mayor_es_peor in (('latencia_p50_ms', True), ('latencia_p99_ms', True),
+                                       ('memoria_pico_bytes', True), ('consultas_por_segundo', False)):
+            if metrica not in r or metrica not in previo or previo[metrica] <= 0:
+                continue
+            cambio = r[metrica] / previo[metrica] - 1.0
+            if (cambio > tolerancia) if mayor_es_peor else (cambio < -tolerancia):
+                regresiones.append({'red': r['red'], 'motor': r['motor'], 'metrica': metrica,
+                                    'base': previo[metrica], 'actual': r[metrica], 'cambio': cambio})
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de inferencia sobre redes aleatorias")
+    parser.add_argument('--nodos', type=int, nargs='+', default=[20, 50])
+    parser.add_argument('--max-padres', type=int, nargs='+', default=[3])
+    parser.add_argument('--cardinalidad', type=int, nargs='+', default=[2])
+    parser.add_argument('--anchura', type=int, nargs='+', default=[4],
+                        help="cota de la anchura de árbol; 0 = sin límite")
+    parser.add_argument('--motores', nargs='+', choices=list(MOTORES), default=None)
+    parser.add_argument('--consultas', type=int, default=50)
+    parser.add_argument('--evidencia', type=int, default=3)
+    parser.add_argument('--max-segundos', type=float, default=30.0,
+                        help="tiempo máximo cronometrado por motor y red")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', help="archivo JSON de salida (por defecto, la salida estándar)")
+    parser.add_argument('--comparar', help="informe JSON base; termina con código 1 si hay regresiones")
+    parser.add_argument('--tolerancia', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    configuraciones = [
+        {'n_nodos': n, 'max_padres': p, 'cardinalidad': c, 'anchura': a or None}
+        for n, p, c, a in itertools.product(args.nodos, args.max_padres, args.cardinalidad, args.anchura)
+    ]
+    informe = ejecutar(configuraciones, args.motores, args.consultas, args.evidencia, args.max_segundos,
+                       args.semilla)
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            informe['regresiones'] = comparar(json.load(f), informe, args.tolerancia)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+    return 1 if informe.get('regresiones') else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import glob
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import RedesBa
+
+REDES = sorted(os.path.basename(ruta) for ruta in glob.glob(os.path.join(RAIZ, '*.json')))
+
+def ruta_red(nombre):
+    return os.path.join(RAIZ, nombre)
+
+def referencia(X, e, red):
+    """
+    P(X | e) por enumeración sin poda ni memoria (enum_aux original).
+    """
+    return RedesBa.inferencia_enumeracion(X, e, red, podar=False, memo=False)
+
+def consultas(red):
+    """
+    Consultas (X, e) de prueba: cada variable sin evidencia, con la última
+    variable observada y con dos variables observadas.
+    """
+    variables = red['variables']
+    resultado = []
+    for X in variables:
+        otras = [v for v in variables if v != X]
+        resultado.append((X, {}))
+        resultado.append((X, {otras[-1]: red['valores'][otras[-1]][0]}))
+        resultado.append((X, {otras[0]: red['valores'][otras[0]][-1], otras[-1]: red['valores'][otras[-1]][1]}))
+    return resultado
+
+def cerca(a, b, tol=1e-9):
+    return set(a) == set(b) and all(abs(a[k] - b[k]) <= tol for k in a)
+
+@pytest.fixture(params=REDES)
+def red(request):
+    return RedesBa.cargar_red(ruta_red(request.param))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import AprendizajeBa
+import AproximadaBa
+import RedesBa
+from conftest import ruta_red
+
+@pytest.fixture(scope='module')
+def datos_alarma():
+    red = RedesBa.cargar_red(ruta_red('Ejemplo_Alarma.json'))
+    rc = RedesBa.compilar_red(red)
+    muestras, _ = AproximadaBa._muestrear(rc, {}, 20000, np.random.default_rng(0))
+    return muestras, rc.valores
+
+def _aristas(red):
+    return {frozenset((p, v)) for v in red['variables'] for p in red['padres'][v]}
+
+@pytest.mark.parametrize('puntaje', AprendizajeBa.PUNTAJES)
+def test_recupera_las_aristas_fuertes(datos_alarma, puntaje):
+    datos, valores = datos_alarma
+    red = AprendizajeBa.aprender_estructura(datos, valores, puntaje=puntaje, semilla=0)
+    RedesBa.validar_red(red)
+    aristas = _aristas(red)
+    assert frozenset(('Alarma', 'JuanLlama')) in aristas
+    assert frozenset(('Alarma', 'MariaLlama')) in aristas
+
+def test_max_padres(datos_alarma):
+    datos, valores = datos_alarma
+    red = AprendizajeBa.aprender_estructura(datos, valores, max_padres=1, semilla=0)
+    assert all(len(red['padres'][v]) <= 1 for v in red['variables'])
+
+@pytest.mark.parametrize('tabu, paciencia', [(10, None), (10, 0), (0, 5), (20, 3)])
+def test_tabu_y_paciencia_independientes(datos_alarma, tabu, paciencia):
+    datos, valores = datos_alarma
+    red = AprendizajeBa.aprender_estructura(datos, valores, tabu=tabu, paciencia=paciencia, semilla=0)
+    RedesBa.validar_red(red)
+    assert frozenset(('Alarma', 'JuanLlama')) in _aristas(red)
+
+def test_pool_da_la_misma_estructura(datos_alarma):
+    datos, valores = datos_alarma
+    en_proceso = AprendizajeBa.aprender_estructura(datos[:3000], valores, semilla=0)
+    con_pool = AprendizajeBa.aprender_estructura(datos[:3000], valores, procesos=2, semilla=0)
+    assert en_proceso['padres'] == con_pool['padres']
+
+def test_puntaje_desconocido(datos_alarma):
+    datos, valores = datos_alarma
+    with pytest.raises(ValueError):
+        AprendizajeBa.aprender_estructura(datos, valores, puntaje='otro')
@@ -0,0 +1,68 @@
+import copy
+
+import numpy as np
+import pytest
+
+import AprendizajeBa
+import AproximadaBa
+import RedesBa
+
+def _muestras(red, n, semilla=0):
+    rc = RedesBa.compilar_red(red)
+    muestras, _ = AproximadaBa._muestrear(rc, {}, n, np.random.default_rng(semilla))
+    return muestras
+
+def test_mle_recupera_las_tdp(red):
+    rc = RedesBa.compilar_red(red)
+    datos = _muestras(red, 200000)
+    aprendida = AprendizajeBa.ajustar_parametros(copy.deepcopy(red), datos)
+    ra = RedesBa.compilar_red(aprendida)
+    conteos = AprendizajeBa.contar_red(red, datos)
+    for i, var in enumerate(red['variables']):
+        card = len(red['valores'][var])
+        # Solo las filas de padres con datos suficientes
+        filas = conteos[i].sum(axis=1) >= 1000
+        assert np.allclose(ra.tabla(var).reshape(-1, card)[filas], rc.tabla(var).reshape(-1, card)[filas], atol=0.03)
+
+def test_conteos_por_bloques(red):
+    rc = RedesBa.compilar_red(red)
+    datos = _muestras(red, 1000)
+    conteos = AprendizajeBa.contar_red(red, datos, tam_bloque=77)
+    for i, var in enumerate(rc.variables):
+        familia = list(rc.padres_idx[i]) + [i]
+        esperado = np.zeros(rc.tabla(var).shape)
+        for fila in datos:
+            esperado[tuple(fila[familia])] += 1
+        assert np.array_equal(conteos[i].reshape(esperado.shape), esperado)
+
+def test_faltantes_se_ignoran_en_la_familia(red):
+    datos = _muestras(red, 500)
+    datos[::3, 0] = -1
+    conteos = AprendizajeBa.contar_red(red, datos)
+    assert conteos[0].sum() == 500 - len(datos[::3])
+    assert conteos[-1].sum() in (500, 500 - len(datos[::3]))
+
+def test_csv_igual_que_arreglo(red, tmp_path):
+    rc = RedesBa.compilar_red(red)
+    datos = _muestras(red, 300)
+    ruta = tmp_path / 'datos.csv'
+    lineas = [','.join(rc.variables)]
+    lineas += [','.join(str(rc.valores[v][k]) for v, k in zip(rc.variables, fila)) for fila in datos]
+    ruta.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    desde_csv = AprendizajeBa.contar_red(red, str(ruta), tam_bloque=50)
+    desde_arreglo = AprendizajeBa.contar_red(red, datos)
+    for a, b in zip(desde_csv, desde_arreglo):
+        assert np.array_equal(a, b)
+
+@pytest.mark.parametrize('metodo', ['mle', 'dirichlet', 'bdeu'])
+def test_filas_sin_datos_quedan_uniformes(metodo):
+    tablas = AprendizajeBa.estimar_tablas([np.zeros((2, 3))], metodo, alfa=2.0)
+    assert np.allclose(tablas[0], 1.0 / 3)
+
+def test_dirichlet_suaviza():
+    tabla, = AprendizajeBa.estimar_tablas([np.array([[3.0, 0.0]])], 'dirichlet', alfa=1.0)
+    assert np.allclose(tabla, [[0.8, 0.2]])
+
+def test_metodo_desconocido():
+    with pytest.raises(ValueError):
+        AprendizajeBa.estimar_tablas([np.ones((1, 2))], 'otro')
@@ -0,0 +1,43 @@
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+def test_arbol_uniones_coincide_con_enumeracion(red):
+    for X, e in consultas(red):
+        assert cerca(RedesBa.inferencia_arbol_uniones(X, e, red), referencia(X, e, red))
+
+def test_marginales_de_una_calibracion(red):
+    e = {red['variables'][-1]: red['valores'][red['variables'][-1]][0]}
+    marginales = RedesBa.compilar_arbol_uniones(red).marginales(e)
+    for X in red['variables']:
+        if X not in e:
+            assert cerca(marginales[X], referencia(X, e, red))
+    observada, valor = next(iter(e.items()))
+    assert marginales[observada][valor] == 1.0
+
+def test_arbol_en_cache_hasta_editar_la_red(red):
+    arbol = RedesBa.compilar_arbol_uniones(red)
+    assert RedesBa.compilar_arbol_uniones(red) is arbol
+    assert arbol.anchura() >= 1
+    var = red['variables'][0]
+    RedesBa.establecer_padres(red, var, red['padres'][var])
+    assert RedesBa.compilar_arbol_uniones(red) is not arbol
+
+def test_cliques_cubren_las_familias(red):
+    arbol = RedesBa.compilar_arbol_uniones(red)
+    for var in red['variables']:
+        familia = set(red['padres'][var]) | {var}
+        assert any(familia <= set(clique) for clique in arbol.cliques)
+
+def test_valor_fuera_del_dominio(red):
+    X, Y = red['variables'][0], red['variables'][-1]
+    with pytest.raises(ValueError):
+        RedesBa.inferencia_arbol_uniones(X, {Y: 'no existe'}, red)
+    with pytest.raises(ValueError):
+        RedesBa.compilar_arbol_uniones(red).marginales({Y: 'no existe'})
+    for consulta in (lambda: RedesBa.inferencia_eliminacion_variables(X, {Y: 'no existe'}, red, podar=False),
+                     lambda: RedesBa.mpe({Y: 'no existe'}, red),
+                     lambda: RedesBa.log_probabilidad_evidencia({Y: 'no existe'}, red)):
+        with pytest.raises(ValueError):
+            consulta()
@@ -0,0 +1,63 @@
+import copy
+import json
+
+import pytest
+
+import RedesBa
+import benchmark_redes
+
+def test_red_aleatoria_valida_y_con_anchura_acotada():
+    red = benchmark_redes.red_aleatoria(30, max_padres=3, cardinalidad=(2, 3), anchura=3, semilla=0)
+    RedesBa.validar_red(red)
+    assert len(red['variables']) == 30
+    assert all(len(red['padres'][v]) <= 3 for v in red['variables'])
+    assert benchmark_redes.anchura_inducida(red) <= 3
+    assert all(2 <= len(red['valores'][v]) <= 3 for v in red['variables'])
+
+def test_red_aleatoria_reproducible():
+    a = benchmark_redes.red_aleatoria(10, semilla=4)
+    b = benchmark_redes.red_aleatoria(10, semilla=4)
+    assert a['padres'] == b['padres'] and a['TDP'] == b['TDP']
+
+def test_consultas_generadas():
+    red = benchmark_redes.red_aleatoria(8, semilla=1)
+    consultas = benchmark_redes.generar_consultas(red, 5, n_evidencia=2, semilla=0)
+    assert len(consultas) == 5
+    for X, e in consultas:
+        assert X not in e and len(e) == 2
+        assert all(valor in red['valores'][var] for var, valor in e.items())
+
+@pytest.fixture(scope='module')
+def informe():
+    configuraciones = [{'n_nodos': 8, 'max_padres': 2, 'cardinalidad': 2, 'anchura': 2}]
+    return benchmark_redes.ejecutar(configuraciones, ['ve_numpy', 'arbol_uniones', 'lote'], n_consultas=5)
+
+def test_ejecutar_mide_cada_motor(informe):
+    assert informe['version_formato'] == benchmark_redes.VERSION_FORMATO
+    assert [r['motor'] for r in informe['resultados']] == ['ve_numpy', 'arbol_uniones', 'lote']
+    for resultado in informe['resultados']:
+        assert resultado['consultas'] == 5 and resultado['fallidas'] == 0
+        assert resultado['latencia_p50_ms'] <= resultado['latencia_p99_ms']
+    json.dumps(informe)
+
+def test_comparar_detecta_regresiones(informe):
+    assert benchmark_redes.comparar(informe, informe) == []
+    peor = copy.deepcopy(informe)
+    peor['resultados'][0]['latencia_p50_ms'] *= 2
+    regresiones = benchmark_redes.comparar(informe, peor)
+    assert [(r['motor'], r['metrica']) for r in regresiones] == [('ve_numpy', 'latencia_p50_ms')]
+
+def test_motor_desconocido():
+    with pytest.raises(ValueError):
+        benchmark_redes.ejecutar([{'n_nodos': 3}], ['otro'])
+
+def test_linea_de_comandos(tmp_path):
+    salida = tmp_path / 'actual.json'
+    argumentos = ['--nodos', '6', '--anchura', '2', '--motores', 've_numpy', '--consultas', '3']
+    assert benchmark_redes.main(argumentos + ['--salida', str(salida)]) == 0
+    base = json.loads(salida.read_text(encoding='utf-8'))
+    for resultado in base['resultados']:
+        resultado['latencia_p50_ms'] /= 100.0
+    ruta_base = tmp_path / 'base.json'
+    ruta_base.write_text(json.dumps(base), encoding='utf-8')
+    assert benchmark_redes.main(argumentos + ['--salida', str(salida), '--comparar', str(ruta_base)]) == 1
@@ -0,0 +1,78 @@
+import pickle
+
+import numpy as np
+import pytest
+
+import RedesBa
+from conftest import cerca, referencia
+
+def _uniforme(red, var):
+    forma = [len(red['valores'][v]) for v in red['padres'][var] + [var]]
+    return np.full(forma, 1.0 / forma[-1])
+
+def test_aciertos_y_copia(red):
+    cache = RedesBa.CacheResultados()
+    X = red['variables'][-1]
+    primero = cache.consultar(RedesBa.inferencia_eliminacion_variables, X, {}, red)
+    assert cerca(primero, referencia(X, {}, red))
+    primero[red['valores'][X][0]] = -1.0
+    segundo = cache.consultar(RedesBa.inferencia_eliminacion_variables, X, {}, red)
+    assert cerca(segundo, referencia(X, {}, red))
+    # Por posición o por nombre es la misma consulta
+    cache.consultar(RedesBa.inferencia_eliminacion_variables, X, e={}, red=red)
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['aciertos'], estadisticas['fallos'], estadisticas['entradas']) == (2, 1, 1)
+
+def test_edicion_invalida(red):
+    cache = RedesBa.CacheResultados()
+    X = red['variables'][0]
+    cache.consultar(RedesBa.inferencia_eliminacion_variables, X, {}, red)
+    RedesBa.establecer_tabla(red, X, _uniforme(red, X))
+    resultado = cache.consultar(RedesBa.inferencia_eliminacion_variables, X, {}, red)
+    assert cerca(resultado, referencia(X, {}, red))
+    assert cache.fallos == 2
+
+def test_caducidad_y_desalojo(red):
+    ahora = [0.0]
+    cache = RedesBa.CacheResultados(capacidad=2, ttl=10.0, reloj=lambda: ahora[0])
+    a, b, c = red['variables'][:3]
+    for X in (a, a, b):
+        cache.consultar(RedesBa.inferencia_eliminacion_variables, X, {}, red)
+    assert cache.aciertos == 1
+    ahora[0] = 11.0
+    cache.consultar(RedesBa.inferencia_eliminacion_variables, a, {}, red)
+    assert cache.caducadas == 1
+    cache.consultar(RedesBa.inferencia_eliminacion_variables, c, {}, red)
+    cache.consultar(RedesBa.inferencia_eliminacion_variables, b, {}, red)
+    assert cache.desalojos >= 1 and len(cache) == 2
+
+def test_clave_generica(red):
+    cache = RedesBa.CacheResultados()
+    X, Y = red['variables'][0], red['variables'][-1]
+    e = {Y: red['valores'][Y][0]}
+    evidencias = [e, {}]
+    llamadas = [
+        (RedesBa.inferencia_lote, (X, evidencias, red), {}),
+        (RedesBa.mpe, (e, red), {}),
+        (RedesBa.map_marginal, ([X], e, red), {}),
+        (RedesBa.log_probabilidad_evidencia, (e, red), {}),
+    ]
+    for funcion, args, kwargs in llamadas:
+        directo = funcion(*args, **kwargs)
+        for _ in range(2):
+            guardado = cache.consultar(funcion, *args, **kwargs)
+            if isinstance(directo, tuple):
+                assert guardado[0] == directo[0] and guardado[1] == pytest.approx(directo[1])
+            else:
+                assert np.allclose(guardado, directo)
+    assert cache.fallos == len(llamadas) and cache.aciertos == len(llamadas)
+
+def test_funcion_sin_red_y_serializacion(red):
+    cache = RedesBa.CacheResultados()
+    with pytest.raises(ValueError):
+        cache.consultar(lambda x: x, 1)
+    cache.consultar(RedesBa.inferencia_eliminacion_variables, red['variables'][0], {}, red)
+    copia = pickle.loads(pickle.dumps(cache))
+    assert copia.estadisticas() == cache.estadisticas()
+    copia.limpiar()
+    assert len(copia) == 0
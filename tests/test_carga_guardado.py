@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import RedesBa
+from conftest import REDES, cerca, consultas, ruta_red
+
+@pytest.mark.parametrize('nombre', REDES)
+def test_json_ida_y_vuelta(nombre, tmp_path):
+    red = RedesBa.cargar_red(ruta_red(nombre))
+    ruta = tmp_path / 'red.json'
+    RedesBa.guardar_red(red, str(ruta))
+    with open(ruta_red(nombre), encoding='utf-8') as f:
+        original = json.load(f)
+    with open(ruta, encoding='utf-8') as f:
+        assert json.load(f) == original
+    copia = RedesBa.cargar_red(str(ruta))
+    assert copia['TDP'] == red['TDP'] and copia['padres'] == red['padres']
+
+@pytest.mark.parametrize('mapear', [True, False])
+def test_binario_ida_y_vuelta(red, tmp_path, mapear):
+    ruta = str(tmp_path / 'red.rbn')
+    RedesBa.guardar_red_binaria(red, ruta)
+    rc = RedesBa.cargar_red_binaria(ruta, mapear=mapear)
+    assert rc['TDP'] == RedesBa.compilar_red(red)['TDP']
+    assert RedesBa.descompilar_red(rc)['TDP'] == red['TDP']
+    for X, e in consultas(red):
+        assert cerca(RedesBa.inferencia_eliminacion_variables(X, e, rc, motor='numpy'),
+                     RedesBa.inferencia_eliminacion_variables(X, e, red, motor='numpy'))
+
+def test_binario_rechaza_otro_formato(tmp_path):
+    ruta = tmp_path / 'otro.rbn'
+    ruta.write_bytes(b'no es una red')
+    with pytest.raises(ValueError):
+        RedesBa.cargar_red_binaria(str(ruta))
+
+def test_json_con_fila_faltante(tmp_path):
+    with open(ruta_red('Arranque.json'), encoding='utf-8') as f:
+        datos = json.load(f)
+    datos['TDP']['Arranque'].pop(next(iter(datos['TDP']['Arranque'])))
+    ruta = tmp_path / 'mal.json'
+    ruta.write_text(json.dumps(datos), encoding='utf-8')
+    with pytest.raises(ValueError):
+        RedesBa.cargar_red(str(ruta))
+    assert RedesBa.cargar_red(str(ruta), validar=False)['variables'] == datos['variables']
+
+def test_json_con_clave_desconocida(tmp_path):
+    with open(ruta_red('Arranque.json'), encoding='utf-8') as f:
+        datos = json.load(f)
+    datos['TDP']['Arranque']["__import__('os')"] = {'Si': 1.0, 'No': 0.0}
+    ruta = tmp_path / 'mal.json'
+    ruta.write_text(json.dumps(datos), encoding='utf-8')
+    with pytest.raises(ValueError):
+        RedesBa.cargar_red(str(ruta), validar=False)
@@ -0,0 +1,32 @@
+import itertools
+
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+def test_marginales_de_varias_variables(red):
+    for _, e in consultas(red):
+        libres = [v for v in red['variables'] if v not in e]
+        resultado = RedesBa.consulta_multiple(libres, e, red)
+        for X in libres:
+            assert cerca(resultado[X], referencia(X, e, red))
+
+def test_conjunta_por_regla_de_la_cadena(red):
+    for X, e in consultas(red):
+        Y = next(v for v in red['variables'] if v != X and v not in e)
+        conjunta = RedesBa.consulta_multiple([X, Y], e, red, conjunta=True)
+        assert sum(conjunta.values()) == pytest.approx(1.0)
+        p_X = referencia(X, e, red)
+        for x, y in itertools.product(red['valores'][X], red['valores'][Y]):
+            # P(x, y | e) = P(x | e) P(y | x, e)
+            esperado = p_X[x] * referencia(Y, {**e, X: x}, red)[y] if p_X[x] > 0 else 0.0
+            assert conjunta[(x, y)] == pytest.approx(esperado, abs=1e-12)
+
+def test_conjunta_con_variable_observada(red):
+    X, e = consultas(red)[1]
+    (Y, valor), = e.items()
+    conjunta = RedesBa.consulta_multiple([X, Y], e, red, conjunta=True)
+    p_X = referencia(X, e, red)
+    for x, y in itertools.product(red['valores'][X], red['valores'][Y]):
+        assert conjunta[(x, y)] == pytest.approx(p_X[x] if y == valor else 0.0)
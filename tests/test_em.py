@@ -0,0 +1,55 @@
+import copy
+import inspect
+
+import numpy as np
+import pytest
+
+import AprendizajeBa
+import AproximadaBa
+import RedesBa
+from conftest import ruta_red
+
+def _datos_con_faltantes(red, n, fraccion=0.3, semilla=0):
+    rc = RedesBa.compilar_red(red)
+    rng = np.random.default_rng(semilla)
+    datos, _ = AproximadaBa._muestrear(rc, {}, n, rng)
+    datos[rng.random(datos.shape) < fraccion] = -1
+    return datos
+
+def _uniforme(red):
+    inicial = copy.deepcopy(red)
+    for var in inicial['variables']:
+        forma = [len(inicial['valores'][v]) for v in inicial['padres'][var] + [var]]
+        # Un poco de asimetría para romper la simetría entre valores
+        tabla = np.random.default_rng(len(var)).uniform(0.4, 0.6, size=forma)
+        RedesBa.establecer_tabla(inicial, var, tabla / tabla.sum(axis=-1, keepdims=True))
+    return inicial
+
+@pytest.fixture
+def arranque():
+    return RedesBa.cargar_red(ruta_red('Arranque.json'))
+
+def test_em_mejora_la_verosimilitud_y_se_acerca_a_la_red(arranque):
+    datos = _datos_con_faltantes(arranque, 20000)
+    resultado = AprendizajeBa.algoritmo_em(_uniforme(arranque), datos, max_iteraciones=200)
+    historial = resultado['log_verosimilitud']
+    assert all(b >= a - 1e-6 for a, b in zip(historial, historial[1:]))
+    assert resultado['convergio']
+    aprendida = RedesBa.compilar_red(resultado['red'])
+    original = RedesBa.compilar_red(arranque)
+    for var in arranque['variables']:
+        assert np.allclose(aprendida.tabla(var), original.tabla(var), atol=0.05)
+
+def test_sin_faltantes_coincide_con_mle(arranque):
+    datos = _datos_con_faltantes(arranque, 2000, fraccion=0.0)
+    resultado = AprendizajeBa.algoritmo_em(_uniforme(arranque), datos)
+    mle = AprendizajeBa.ajustar_parametros(copy.deepcopy(arranque), datos)
+    for var in arranque['variables']:
+        assert np.allclose(RedesBa.compilar_red(resultado['red']).tabla(var), RedesBa.compilar_red(mle).tabla(var))
+
+def test_en_proceso_por_defecto_y_pool_opcional(arranque):
+    assert inspect.signature(AprendizajeBa.algoritmo_em).parameters['procesos'].default == 1
+    datos = _datos_con_faltantes(arranque, 3000)
+    en_proceso = AprendizajeBa.algoritmo_em(_uniforme(arranque), datos, max_iteraciones=5)
+    con_pool = AprendizajeBa.algoritmo_em(_uniforme(arranque), datos, max_iteraciones=5, procesos=2)
+    assert np.allclose(en_proceso['log_verosimilitud'], con_pool['log_verosimilitud'])
@@ -0,0 +1,24 @@
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+@pytest.mark.parametrize('tam_cache', [0, 2, 100000])
+def test_enumeracion_memorizada(red, tam_cache):
+    for X, e in consultas(red):
+        resultado = RedesBa.inferencia_enumeracion(X, e, red, podar=False, tam_cache=tam_cache)
+        assert cerca(resultado, referencia(X, e, red))
+
+def test_enumeracion_con_poda(red):
+    for X, e in consultas(red):
+        assert cerca(RedesBa.inferencia_enumeracion(X, e, red), referencia(X, e, red))
+
+def test_cache_lru_descarta_la_menos_usada():
+    cache = RedesBa.CacheLRU(2)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    assert cache.obtener('a') == 1
+    cache.guardar('c', 3)
+    assert cache.obtener('b') is None
+    assert cache.obtener('a') == 1 and cache.obtener('c') == 3
+    assert len(cache) == 2
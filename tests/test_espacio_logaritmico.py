@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+def test_motores_logaritmicos_coinciden_con_enumeracion(red):
+    for X, e in consultas(red):
+        esperado = referencia(X, e, red)
+        assert cerca(RedesBa.inferencia_enumeracion(X, e, red, log=True), esperado)
+        assert cerca(RedesBa.inferencia_eliminacion_variables(X, e, red, motor='log'), esperado)
+
+def test_log_probabilidad_de_la_evidencia(red):
+    for X, e in consultas(red):
+        # P(e) = sum_x P(x, e) por la regla de la cadena sobre la enumeración
+        distribucion, log_pe = RedesBa.inferencia_enumeracion(X, e, red, con_evidencia=True)
+        assert cerca(distribucion, referencia(X, e, red))
+        assert log_pe == pytest.approx(RedesBa.log_probabilidad_evidencia(e, red))
+        for motor in RedesBa.MOTORES_FACTOR:
+            _, log_pe_ve = RedesBa.inferencia_eliminacion_variables(X, e, red, motor=motor, con_evidencia=True)
+            assert log_pe_ve == pytest.approx(log_pe)
+    assert RedesBa.log_probabilidad_evidencia({}, red) == 0.0
+
+def _cadena(n):
+    red = RedesBa.crear_red_bayesiana()
+    for i in range(n):
+        RedesBa.agregar_variable(red, f"X{i}", ['a', 'b'])
+    RedesBa.establecer_probabilidad(red, 'X0', (), {'a': 0.3, 'b': 0.7})
+    for i in range(1, n):
+        RedesBa.establecer_padres(red, f"X{i}", [f"X{i - 1}"])
+        RedesBa.establecer_tabla(red, f"X{i}", np.array([[0.99, 0.01], [0.01, 0.99]]))
+    return red
+
+def test_cadena_larga_sin_desbordamiento():
+    n = 400
+    red = _cadena(n)
+    # Valores alternados: cada observación tiene probabilidad 0.01 y P(e) ~ 1e-800
+    e = {f"X{i}": 'ab'[i % 2] for i in range(1, n)}
+    # X1 = 'b': P(X0, X1 = b)
+    p_a, p_b = 0.3 * 0.01, 0.7 * 0.99
+    esperado = {'a': p_a / (p_a + p_b), 'b': p_b / (p_a + p_b)}
+    log_pe = math.log(p_a + p_b) + (n - 2) * math.log(0.01)
+
+    assert cerca(RedesBa.inferencia_eliminacion_variables('X0', e, red, motor='log'), esperado)
+    assert cerca(RedesBa.inferencia_enumeracion('X0', e, red, log=True), esperado)
+    fila = RedesBa.inferencia_lote('X0', [e], red, log=True)[0]
+    assert np.allclose(fila, [esperado['a'], esperado['b']])
+    assert RedesBa.log_probabilidad_evidencia(e, red) == pytest.approx(log_pe)
+    assert RedesBa.log_probabilidad_lote([e], red)[0] == pytest.approx(log_pe)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+@pytest.mark.parametrize('motor', ['dict', 'numpy'])
+def test_eliminacion_coincide_con_enumeracion(red, motor):
+    for X, e in consultas(red):
+        resultado = RedesBa.inferencia_eliminacion_variables(X, e, red, motor=motor, podar=False)
+        assert cerca(resultado, referencia(X, e, red))
+
+def test_producto_y_suma_de_factores():
+    a = RedesBa.FactorNP(['A', 'B'], np.array([[0.1, 0.9], [0.4, 0.6]]))
+    b = RedesBa.FactorNP(['B', 'C'], np.array([[0.5, 0.5], [0.2, 0.8]]))
+    producto = a.pointwise_product(b)
+    assert sorted(producto.vars) == ['A', 'B', 'C']
+    resultado = producto.sum_out('B')
+    esperado = np.einsum('ab,bc->ac', a.tabla, b.tabla)
+    assert np.allclose(resultado._alinear(['A', 'C']).reshape(2, 2), esperado)
+
+def test_motor_desconocido(red):
+    with pytest.raises(ValueError):
+        RedesBa.inferencia_eliminacion_variables(red['variables'][0], {}, red, motor='otro')
@@ -0,0 +1,36 @@
+import numpy as np
+
+import AproximadaBa
+from conftest import consultas, referencia
+
+def _cerca_estadisticamente(resultado, esperado):
+    for valor, p in esperado.items():
+        assert abs(resultado['distribucion'][valor] - p) <= 0.03 + 5 * resultado['error_estandar'][valor]
+
+def test_gibbs_cerca_de_enumeracion(red):
+    for X, e in consultas(red)[:6]:
+        resultado = AproximadaBa.muestreo_gibbs(X, e, red, n_iteraciones=400, quemado=100, cadenas=2,
+                                                cadenas_por_proceso=32, procesos=1, semilla=0)
+        assert resultado['muestras'] == 300 * 2 * 32
+        _cerca_estadisticamente(resultado, referencia(X, e, red))
+
+def test_gibbs_por_bloques(red):
+    X, e = consultas(red)[1]
+    bloques = [red['variables'][:2]]
+    resultado = AproximadaBa.muestreo_gibbs(X, e, red, n_iteraciones=400, quemado=100, bloques=bloques,
+                                            procesos=1, semilla=0)
+    _cerca_estadisticamente(resultado, referencia(X, e, red))
+
+def test_pool_de_procesos_da_el_mismo_resultado(red):
+    X, e = consultas(red)[1]
+    opciones = dict(n_iteraciones=200, quemado=50, cadenas=2, cadenas_por_proceso=8, semilla=1)
+    en_proceso = AproximadaBa.muestreo_gibbs(X, e, red, procesos=1, **opciones)
+    con_pool = AproximadaBa.muestreo_gibbs(X, e, red, procesos=2, **opciones)
+    assert en_proceso['distribucion'] == con_pool['distribucion']
+
+def test_r_hat():
+    rng = np.random.default_rng(0)
+    mezcladas = rng.integers(0, 2, size=(500, 4))
+    assert np.all(np.abs(AproximadaBa.r_hat(mezcladas, 2) - 1.0) < 0.05)
+    separadas = np.repeat(np.array([[0, 0, 1, 1]]), 500, axis=0)
+    assert np.all(AproximadaBa.r_hat(separadas, 2) > 1.5)
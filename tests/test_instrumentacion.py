@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+def test_sin_instrumentacion_no_hay_registros(red):
+    X, e = consultas(red)[1]
+    assert RedesBa._REGISTROS == []
+    assert cerca(RedesBa.inferencia_eliminacion_variables(X, e, red, motor='numpy'), referencia(X, e, red))
+
+def test_eventos_de_eliminacion(red):
+    X, e = consultas(red)[1]
+    with RedesBa.instrumentar() as registro:
+        resultado = RedesBa.inferencia_eliminacion_variables(X, e, red, motor='numpy', podar=False)
+    assert cerca(resultado, referencia(X, e, red))
+    tipos = [ev['tipo'] for ev in registro.eventos]
+    assert tipos[0] == 'consulta_inicio' and tipos[-1] == 'consulta_fin'
+    assert 'factores_iniciales' in tipos and 'eliminacion' in tipos
+    inicio, fin = registro.eventos[0], registro.consultas()[0]
+    assert inicio['funcion'] == 'inferencia_eliminacion_variables'
+    assert inicio['X'] == X and inicio['evidencia'] == list(e)
+    assert fin['duracion_s'] >= 0 and fin['pico_celdas'] > 0
+    assert RedesBa._REGISTROS == []
+
+def test_consultas_anidadas_cuentan_una_vez(red):
+    X = red['variables'][0]
+    with RedesBa.instrumentar() as registro:
+        RedesBa.inferencia_lote(X, [{}, {}], red)
+        RedesBa.inferencia_arbol_uniones(X, {}, red)
+    assert [ev['funcion'] for ev in registro.consultas()] == ['inferencia_lote', 'inferencia_arbol_uniones']
+    assert any(ev['tipo'] == 'arbol_uniones' for ev in registro.eventos)
+
+def test_error_y_exportacion(red, tmp_path):
+    vistos = []
+    with RedesBa.instrumentar(vistos.append) as registro:
+        with pytest.raises(ValueError):
+            RedesBa.inferencia_eliminacion_variables(red['variables'][0], {}, red, motor='otro')
+    assert 'ValueError' in registro.consultas()[0]['error']
+    assert vistos == registro.eventos
+    ruta = tmp_path / 'eventos.jsonl'
+    registro.exportar(str(ruta))
+    lineas = ruta.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(l)['tipo'] for l in lineas] == [ev['tipo'] for ev in registro.eventos]
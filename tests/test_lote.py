@@ -0,0 +1,45 @@
+import math
+
+import numpy as np
+import pytest
+
+import RedesBa
+from conftest import consultas, referencia
+
+def _evidencias(red, X):
+    return [e for Y, e in consultas(red) if Y == X]
+
+@pytest.mark.parametrize('log', [False, True])
+def test_lote_coincide_con_enumeracion(red, log):
+    for X in red['variables']:
+        evidencias = _evidencias(red, X)
+        tabla = RedesBa.inferencia_lote(X, evidencias, red, log=log)
+        assert tabla.shape == (len(evidencias), len(red['valores'][X]))
+        for fila, e in zip(tabla, evidencias):
+            esperado = referencia(X, e, red)
+            assert np.allclose(fila, [esperado[v] for v in red['valores'][X]])
+
+def test_lote_de_evidencias_vacias(red):
+    X = red['variables'][0]
+    tabla = RedesBa.inferencia_lote(X, [{}] * 4, red)
+    assert tabla.shape == (4, len(red['valores'][X]))
+    assert np.allclose(tabla, tabla[0])
+
+def test_arreglo_de_codigos_con_faltantes(red):
+    X, Y = red['variables'][0], red['variables'][-1]
+    tabla = RedesBa.inferencia_lote(X, np.array([[0], [-1]]), red, columnas=[Y])
+    por_filas = RedesBa.inferencia_lote(X, [{Y: red['valores'][Y][0]}, {Y: None}], red)
+    assert np.allclose(tabla, por_filas)
+
+def test_evidencia_imposible_queda_en_cero(red):
+    X, Y = red['variables'][0], red['variables'][-1]
+    tabla = RedesBa.inferencia_lote(X, [{Y: 'no existe'}], red)
+    assert not tabla.any()
+
+def test_log_probabilidad_lote(red):
+    X = red['variables'][0]
+    evidencias = _evidencias(red, X)
+    log_pe = RedesBa.log_probabilidad_lote(evidencias, red)
+    for valor, e in zip(log_pe, evidencias):
+        assert valor == pytest.approx(RedesBa.log_probabilidad_evidencia(e, red))
+    assert math.isinf(RedesBa.log_probabilidad_lote([{X: 'no existe'}], red)[0])
@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+
+import RedesBa
+from conftest import consultas
+
+def _conjunta(red):
+    """
+    Lista de (asignación completa, probabilidad) de toda la red.
+    """
+    rc = RedesBa.compilar_red(red)
+    filas = []
+    for comb in itertools.product(*[red['valores'][v] for v in red['variables']]):
+        asignacion = dict(zip(red['variables'], comb))
+        codigos = [rc.codificar(v, asignacion[v]) for v in rc.variables]
+        p = 1.0
+        for i in range(len(rc.variables)):
+            p *= rc.probabilidad(i, codigos)
+        filas.append((asignacion, p))
+    return filas
+
+def _consistentes(filas, e):
+    return [(a, p) for a, p in filas if all(a[k] == v for k, v in e.items())]
+
+def test_mpe_por_fuerza_bruta(red):
+    filas = _conjunta(red)
+    for _, e in consultas(red):
+        asignacion, p = RedesBa.mpe(e, red)
+        mejor = max(p for _, p in _consistentes(filas, e))
+        assert p == pytest.approx(mejor)
+        completa = {**asignacion, **e}
+        assert set(completa) == set(red['variables'])
+        assert _consistentes(filas, completa)[0][1] == pytest.approx(p)
+
+def test_map_marginal_por_fuerza_bruta(red):
+    filas = _conjunta(red)
+    for X, e in consultas(red):
+        vars_map = [X] + [v for v in red['variables'] if v != X and v not in e][:1]
+        asignacion, p = RedesBa.map_marginal(vars_map, e, red)
+        totales = {}
+        for a, q in _consistentes(filas, e):
+            clave = tuple(a[v] for v in vars_map)
+            totales[clave] = totales.get(clave, 0.0) + q
+        assert p == pytest.approx(max(totales.values()))
+        assert totales[tuple(asignacion[v] for v in vars_map)] == pytest.approx(p)
+
+@pytest.mark.parametrize('orden', RedesBa.HEURISTICAS_ORDEN)
+def test_mpe_no_depende_del_orden(red, orden):
+    e = consultas(red)[1][1]
+    assert RedesBa.mpe(e, red, orden)[1] == pytest.approx(RedesBa.mpe(e, red)[1])
@@ -0,0 +1,36 @@
+import pytest
+
+import AproximadaBa
+from conftest import consultas, referencia
+
+MUESTREADORES = [AproximadaBa.muestreo_logico, AproximadaBa.ponderacion_verosimilitud,
+                 AproximadaBa.muestreo_importancia_adaptativo]
+
+def _cerca_estadisticamente(resultado, esperado):
+    for valor, p in esperado.items():
+        assert abs(resultado['distribucion'][valor] - p) <= 0.02 + 5 * resultado['error_estandar'][valor]
+
+@pytest.mark.parametrize('muestreador', MUESTREADORES, ids=lambda f: f.__name__)
+def test_muestreadores_cerca_de_enumeracion(red, muestreador):
+    for X, e in consultas(red):
+        resultado = muestreador(X, e, red, n_muestras=20000, semilla=0)
+        assert resultado['muestras'] == 20000
+        _cerca_estadisticamente(resultado, referencia(X, e, red))
+
+@pytest.mark.parametrize('muestreador', MUESTREADORES, ids=lambda f: f.__name__)
+def test_semilla_reproduce_el_resultado(red, muestreador):
+    X, e = consultas(red)[1]
+    assert muestreador(X, e, red, n_muestras=2000, semilla=3) == muestreador(X, e, red, n_muestras=2000, semilla=3)
+
+def test_parada_por_ancho_del_intervalo(red):
+    X = red['variables'][0]
+    resultado = AproximadaBa.ponderacion_verosimilitud(X, {}, red, n_muestras=10 ** 6, ancho_ic=0.05,
+                                                       tam_lote=1000, semilla=0)
+    assert resultado['muestras'] < 10 ** 6
+    assert max(resultado['error_estandar'].values()) * 2 * AproximadaBa.Z_95 <= 0.05
+
+def test_valor_fuera_del_dominio(red):
+    X, Y = red['variables'][0], red['variables'][-1]
+    for podar in (True, False):
+        with pytest.raises(ValueError):
+            AproximadaBa.ponderacion_verosimilitud(X, {Y: 'no existe'}, red, n_muestras=100, podar=podar)
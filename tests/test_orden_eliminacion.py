@@ -0,0 +1,33 @@
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+@pytest.mark.parametrize('heuristica', RedesBa.HEURISTICAS_ORDEN)
+def test_heuristicas_coinciden_con_enumeracion(red, heuristica):
+    for X, e in consultas(red):
+        resultado = RedesBa.inferencia_eliminacion_variables(X, e, red, motor='numpy', orden=heuristica)
+        assert cerca(resultado, referencia(X, e, red))
+
+@pytest.mark.parametrize('heuristica', RedesBa.HEURISTICAS_ORDEN)
+def test_orden_es_una_permutacion(red, heuristica):
+    variables = red['variables'][1:]
+    orden = RedesBa.orden_eliminacion(red, variables, heuristica)
+    assert sorted(orden) == sorted(variables)
+
+def test_orden_explicito(red):
+    X = red['variables'][0]
+    orden = list(reversed(red['variables']))
+    assert cerca(RedesBa.inferencia_eliminacion_variables(X, {}, red, orden=orden), referencia(X, {}, red))
+
+def test_estimacion_y_limite_de_celdas(red):
+    X = red['variables'][-1]
+    plan = RedesBa.estimar_eliminacion(X, {}, red)
+    assert plan['max_celdas'] >= len(red['valores'][X])
+    assert sorted(plan['orden']) == sorted(v for v in red['variables'] if v != X)
+    with pytest.raises(MemoryError):
+        RedesBa.inferencia_eliminacion_variables(X, {}, red, podar=False, max_celdas=1)
+
+def test_heuristica_desconocida(red):
+    with pytest.raises(ValueError):
+        RedesBa.orden_eliminacion(red, red['variables'], 'otra')
@@ -0,0 +1,42 @@
+import pytest
+
+import RedesBa
+
+def test_orden_topologico(red):
+    orden = RedesBa.orden_topologico(red)
+    assert sorted(orden) == sorted(red['variables'])
+    posicion = {v: k for k, v in enumerate(orden)}
+    for var in red['variables']:
+        assert all(posicion[p] < posicion[var] for p in red['padres'][var])
+    assert RedesBa.orden_topologico(RedesBa.compilar_red(red)) == orden
+
+def test_hijos(red):
+    for var in red['variables']:
+        hijos = RedesBa.obtener_hijos(red, var)
+        assert set(hijos) == {v for v in red['variables'] if var in red['padres'][v]}
+
+def test_orden_se_recalcula_al_editar():
+    red = RedesBa.crear_red_bayesiana()
+    for var in ['A', 'B', 'C']:
+        RedesBa.agregar_variable(red, var, ['Si', 'No'])
+    assert RedesBa.orden_topologico(red) == ['A', 'B', 'C']
+    RedesBa.establecer_padres(red, 'A', ['C'])
+    assert RedesBa.orden_topologico(red) == ['B', 'C', 'A']
+
+def test_establecer_padres_rechaza_ciclos(capsys):
+    red = RedesBa.crear_red_bayesiana()
+    for var in ['A', 'B', 'C']:
+        RedesBa.agregar_variable(red, var, ['Si', 'No'])
+    RedesBa.establecer_padres(red, 'B', ['A'])
+    RedesBa.establecer_padres(red, 'C', ['B'])
+    version = RedesBa.version_red(red)
+    RedesBa.establecer_padres(red, 'A', ['C'])
+    assert 'ERROR' in capsys.readouterr().out
+    assert red['padres']['A'] == [] and RedesBa.version_red(red) == version
+
+def test_ciclo_en_el_diccionario(red):
+    hijo = next(v for v in red['variables'] if red['padres'][v])
+    padre = red['padres'][hijo][0]
+    red['padres'][padre] = red['padres'][padre] + [hijo]
+    with pytest.raises(ValueError):
+        RedesBa._ordenar_topologicamente(list(red['variables']), red['padres'])
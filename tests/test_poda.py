@@ -0,0 +1,31 @@
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia, ruta_red
+
+def test_poda_conserva_la_posterior(red):
+    for X, e in consultas(red):
+        red_podada, e_podada = RedesBa.podar_red(X, e, red)
+        assert X in red_podada['variables']
+        assert set(e_podada) <= set(e)
+        assert cerca(RedesBa.inferencia_enumeracion(X, e_podada, red_podada, memo=False, podar=False),
+                     referencia(X, e, red))
+
+def test_nodos_esteriles():
+    red = RedesBa.cargar_red(ruta_red('Ejemplo_Alarma.json'))
+    red_podada, _ = RedesBa.podar_red('Alarma', {}, red)
+    assert set(red_podada['variables']) == {'Robo', 'Terremoto', 'Alarma'}
+
+def test_evidencia_d_separada():
+    red = RedesBa.cargar_red(ruta_red('Ejemplo_Alarma.json'))
+    # Dada la alarma, JuanLlama no aporta nada sobre MariaLlama
+    red_podada, e_podada = RedesBa.podar_red('MariaLlama', {'Alarma': 'Si', 'JuanLlama': 'Si'}, red)
+    assert 'JuanLlama' not in red_podada['variables']
+    assert e_podada == {'Alarma': 'Si'}
+
+def test_valor_fuera_del_dominio_aunque_este_d_separado():
+    red = RedesBa.cargar_red(ruta_red('Ejemplo_Alarma.json'))
+    with pytest.raises(ValueError):
+        RedesBa.podar_red('MariaLlama', {'Alarma': 'Si', 'JuanLlama': 'Sii'}, red)
+    with pytest.raises(ValueError):
+        RedesBa.inferencia_eliminacion_variables('MariaLlama', {'Alarma': 'Si', 'JuanLlama': 'Sii'}, red)
@@ -0,0 +1,54 @@
+import pytest
+
+import AproximadaBa
+import RedesBa
+from conftest import cerca, consultas, referencia, ruta_red
+
+def _es_poliarbol(red):
+    """
+    True si el grafo no dirigido de la red no tiene ciclos.
+    """
+    componente = {v: v for v in red['variables']}
+
+    def raiz(v):
+        while componente[v] != v:
+            v = componente[v]
+        return v
+
+    for hijo in red['variables']:
+        for padre in red['padres'][hijo]:
+            a, b = raiz(padre), raiz(hijo)
+            if a == b:
+                return False
+            componente[a] = b
+    return True
+
+@pytest.mark.parametrize('planificacion', ['sincrona', 'residual'])
+def test_propagacion_frente_a_enumeracion(red, planificacion):
+    # Exacta en poliárboles; con ciclos solo se pide una aproximación razonable
+    tolerancia = 1e-9 if _es_poliarbol(red) else 0.1
+    for X, e in consultas(red):
+        resultado = AproximadaBa.propagacion_creencias(e, red, planificacion=planificacion)
+        assert resultado['convergio']
+        assert cerca(resultado['marginales'][X], referencia(X, e, red), tolerancia)
+
+def test_amortiguamiento_y_historial(red):
+    resultado = AproximadaBa.propagacion_creencias({}, red, amortiguamiento=0.5, planificacion='sincrona')
+    assert resultado['convergio']
+    assert resultado['iteraciones'] == len(resultado['historial'])
+    assert resultado['historial'][-1]['residuo'] < 1e-6
+
+def test_variables_observadas_reciben_su_indicador(red):
+    Y = red['variables'][-1]
+    valor = red['valores'][Y][0]
+    marginales = AproximadaBa.propagacion_creencias({Y: valor}, red)['marginales']
+    assert marginales[Y][valor] == 1.0
+    assert set(marginales) == set(red['variables'])
+
+def test_planificacion_desconocida(red):
+    with pytest.raises(ValueError):
+        AproximadaBa.propagacion_creencias({}, red, planificacion='otra')
+
+def test_poliarbol():
+    red = RedesBa.cargar_red(ruta_red('Ejemplo_Alarma.json'))
+    assert _es_poliarbol(red)
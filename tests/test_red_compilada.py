@@ -0,0 +1,53 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+def test_tablas_coinciden_con_el_diccionario(red):
+    rc = RedesBa.compilar_red(red)
+    for var in red['variables']:
+        tabla = rc.tabla(var)
+        padres = red['padres'][var]
+        for comb in itertools.product(*[red['valores'][p] for p in padres]):
+            codigos = tuple(rc.codificar(p, v) for p, v in zip(padres, comb))
+            for k, valor in enumerate(red['valores'][var]):
+                assert tabla[codigos + (k,)] == pytest.approx(red['TDP'][var][comb][valor])
+
+def test_codificar(red):
+    rc = RedesBa.compilar_red(red)
+    var = red['variables'][0]
+    for k, valor in enumerate(red['valores'][var]):
+        assert rc.codificar(var, valor) == k
+        assert rc.codificar(var, str(valor)) == k
+    assert rc.codificar(var, 'no existe') is None
+
+def test_red_compilada_es_de_solo_lectura(red):
+    rc = RedesBa.compilar_red(red)
+    with pytest.raises(ValueError):
+        rc.tablas[0][0] = 0.5
+    assert rc['TDP'] == red['TDP']
+
+def test_compilacion_en_cache_hasta_editar(red):
+    rc = RedesBa.compilar_red(red)
+    assert RedesBa.compilar_red(red) is rc
+    var = red['variables'][0]
+    RedesBa.establecer_padres(red, var, red['padres'][var])
+    nueva = RedesBa.compilar_red(red)
+    assert nueva is not rc and nueva.version > rc.version
+
+def test_motores_sobre_la_red_compilada(red):
+    rc = RedesBa.compilar_red(red)
+    for X, e in consultas(red):
+        esperado = referencia(X, e, red)
+        assert cerca(RedesBa.inferencia_enumeracion(X, e, rc), esperado)
+        assert cerca(RedesBa.inferencia_eliminacion_variables(X, e, rc, motor='numpy'), esperado)
+
+def test_subred_con_raices_uniformes(red):
+    rc = RedesBa.compilar_red(red)
+    ultima = red['variables'][-1]
+    sub = rc.subred(list(red['variables']), set(red['variables']) - {ultima})
+    assert sub.padres[ultima] == []
+    assert np.allclose(sub.tabla(ultima), 1.0 / len(red['valores'][ultima]))
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import math
+import pickle
+
+import numpy as np
+import pytest
+
+import AprendizajeBa
+import AproximadaBa
+import RedesBa
+import ServidorBa
+from conftest import cerca, referencia, ruta_red
+
+@pytest.fixture
+def llegar_tarde():
+    return RedesBa.cargar_red(ruta_red('LLegarTarde.json'))
+
+def _procesar(servidor, peticiones):
+    async def todas():
+        return await asyncio.gather(*[servidor.procesar(p) for p in peticiones])
+    return asyncio.run(todas())
+
+def test_red_publicada(llegar_tarde):
+    publicada = RedesBa.RedPublicada(llegar_tarde)
+    antes = publicada.instantanea()
+    uniforme = np.full((2,), 0.5)
+    despues = publicada.editar(lambda red: RedesBa.establecer_tabla(red, 'Trafico Pesado', uniforme))
+    assert publicada.generacion == 1 and publicada.instantanea() is despues
+    assert cerca(RedesBa.inferencia_eliminacion_variables('Trafico Pesado', {}, despues), {'Si': 0.5, 'No': 0.5})
+    assert cerca(RedesBa.inferencia_eliminacion_variables('Trafico Pesado', {}, antes),
+                 referencia('Trafico Pesado', {}, llegar_tarde))
+    publicada.publicar(llegar_tarde)
+    assert publicada.generacion == 2
+
+def test_consultas_agrupadas(llegar_tarde):
+    servidor = ServidorBa.ServidorConsultas(RedesBa.RedPublicada(llegar_tarde))
+    evidencias = [{}, {'Retrasos': 'Si'}, {'Retrasos': 'No', 'Combis Lentas': 'Si'}, {'Taxis Lentos': None}]
+    peticiones = [{'id': i, 'X': 'Llegar Tarde', 'e': e} for i, e in enumerate(evidencias)]
+    peticiones.append({'id': 'log', 'op': 'log_probabilidad', 'e': {'Retrasos': 'Si'}})
+    peticiones.append({'id': 'do', 'X': 'Llegar Tarde', 'do': {'Retrasos': 'Si'}})
+    respuestas = _procesar(servidor, peticiones)
+    for e, respuesta in zip(evidencias, respuestas):
+        e = {k: v for k, v in e.items() if v is not None}
+        assert cerca(respuesta['distribucion'], referencia('Llegar Tarde', e, llegar_tarde))
+    p_retrasos = referencia('Retrasos', {}, llegar_tarde)['Si']
+    assert respuestas[-2]['log_probabilidad'] == pytest.approx(math.log(p_retrasos))
+    esperado = RedesBa.inferencia_eliminacion_variables('Llegar Tarde', {}, llegar_tarde, do={'Retrasos': 'Si'})
+    assert cerca(respuestas[-1]['distribucion'], esperado)
+    # Las cuatro posterior sin do comparten un lote
+    assert servidor.agrupador.consultas == len(peticiones)
+    assert servidor.agrupador.lotes == 3
+
+def test_peticion_mala_no_afecta_al_lote(llegar_tarde):
+    servidor = ServidorBa.ServidorConsultas(RedesBa.RedPublicada(llegar_tarde))
+    peticiones = [
+        {'id': 'bien', 'X': 'Llegar Tarde', 'e': {'Retrasos': 'Si'}},
+        {'id': 'valor', 'X': 'Llegar Tarde', 'e': {'Retrasos': 'Quizas'}},
+        {'id': 'tipo', 'X': 'Llegar Tarde', 'e': {'Retrasos': ['Si']}},
+        {'id': 'variable', 'X': 'Llegar Tarde', 'e': {'Lluvia': 'Si'}},
+        {'id': 'do', 'X': 'Llegar Tarde', 'do': 'Retrasos'},
+        {'id': 'X', 'X': 'Lluvia'},
+        {'id': 'otra', 'X': 'Llegar Tarde', 'e': {}},
+    ]
+    respuestas = {r['id']: r for r in _procesar(servidor, peticiones)}
+    assert cerca(respuestas['bien']['distribucion'], referencia('Llegar Tarde', {'Retrasos': 'Si'}, llegar_tarde))
+    assert cerca(respuestas['otra']['distribucion'], referencia('Llegar Tarde', {}, llegar_tarde))
+    for id_ in ('valor', 'tipo', 'variable', 'do', 'X'):
+        assert 'ValueError' in respuestas[id_]['error'] and 'distribucion' not in respuestas[id_]
+    assert 'error' in _procesar(servidor, ['{no es json'])[0]
+
+def test_ida_y_vuelta_tcp(llegar_tarde):
+    async def sesion():
+        servidor = ServidorBa.ServidorConsultas(RedesBa.RedPublicada(llegar_tarde), puerto=0)
+        await servidor.iniciar()
+        try:
+            lector, escritor = await asyncio.open_connection('127.0.0.1', servidor.puerto)
+            for i in range(3):
+                escritor.write(json.dumps({'id': i, 'X': 'Retrasos'}).encode('utf-8') + b'\n')
+            escritor.write(b'{"id": "info", "op": "info"}\n')
+            await escritor.drain()
+            respuestas = [json.loads(await lector.readline()) for _ in range(4)]
+            escritor.close()
+        finally:
+            await servidor.cerrar()
+        return respuestas
+    respuestas = {r['id']: r for r in asyncio.run(sesion())}
+    for i in range(3):
+        assert cerca(respuestas[i]['distribucion'], referencia('Retrasos', {}, llegar_tarde))
+    assert respuestas['info']['variables'] == llegar_tarde['variables']
+
+def test_red_compilada_serializable_tras_intervenir(llegar_tarde):
+    rc = RedesBa.compilar_red(llegar_tarde)
+    RedesBa.inferencia_eliminacion_variables('Llegar Tarde', {}, rc, do={'Retrasos': 'Si'})
+    copia = pickle.loads(pickle.dumps(rc))
+    assert cerca(RedesBa.inferencia_eliminacion_variables('Llegar Tarde', {}, copia, do={'Retrasos': 'Si'}),
+                 RedesBa.inferencia_eliminacion_variables('Llegar Tarde', {}, rc, do={'Retrasos': 'Si'}))
+    resultado = AproximadaBa.muestreo_gibbs('Llegar Tarde', {}, llegar_tarde, n_iteraciones=300, quemado=50,
+                                            cadenas=2, cadenas_por_proceso=16, procesos=2, semilla=0,
+                                            do={'Retrasos': 'Si'})
+    esperado = RedesBa.inferencia_eliminacion_variables('Llegar Tarde', {}, llegar_tarde, do={'Retrasos': 'Si'})
+    assert cerca(resultado['distribucion'], esperado, tol=0.05)
+
+def test_em_con_procesos_tras_intervenir(llegar_tarde):
+    RedesBa.inferencia_eliminacion_variables('Llegar Tarde', {}, llegar_tarde, do={'Retrasos': 'Si'})
+    rc = RedesBa.compilar_red(llegar_tarde)
+    rng = np.random.default_rng(0)
+    datos, _ = AproximadaBa._muestrear(rc, {}, 2000, rng)
+    datos[rng.random(datos.shape) < 0.2] = -1
+    resultado = AprendizajeBa.algoritmo_em(llegar_tarde, datos, max_iteraciones=3, procesos=2)
+    assert len(resultado['log_verosimilitud']) >= 1
@@ -0,0 +1,48 @@
+import pytest
+
+import RedesBa
+from conftest import cerca, consultas, referencia
+
+def _comprobar(sesion, red):
+    for X in red['variables']:
+        if X not in sesion.evidencia:
+            assert cerca(sesion.posterior(X), referencia(X, sesion.evidencia, red))
+
+def test_evidencia_incremental(red):
+    sesion = RedesBa.SesionInferencia(red)
+    _comprobar(sesion, red)
+    for _, e in consultas(red):
+        for var, valor in e.items():
+            sesion.agregar_evidencia(var, valor)
+            _comprobar(sesion, red)
+        for var in e:
+            sesion.retirar_evidencia(var)
+            _comprobar(sesion, red)
+    assert sesion.evidencia == {}
+
+def test_reemplazar_una_observacion(red):
+    Y = red['variables'][-1]
+    sesion = RedesBa.SesionInferencia(red, {Y: red['valores'][Y][0]})
+    sesion.agregar_evidencia(Y, red['valores'][Y][1])
+    _comprobar(sesion, red)
+
+def test_sesion_se_reconstruye_al_editar_la_red(red):
+    X, Y = red['variables'][0], red['variables'][-1]
+    sesion = RedesBa.SesionInferencia(red, {Y: red['valores'][Y][0]})
+    n = len(red['valores'][X])
+    if red['padres'][X]:
+        pytest.skip("la primera variable no es raíz")
+    RedesBa.establecer_probabilidad(red, X, (), {v: 1.0 / n for v in red['valores'][X]})
+    _comprobar(sesion, red)
+
+def test_variable_desconocida(red):
+    with pytest.raises(ValueError):
+        RedesBa.SesionInferencia(red).agregar_evidencia('no existe', 'Si')
+
+def test_valor_fuera_del_dominio(red):
+    Y = red['variables'][-1]
+    sesion = RedesBa.SesionInferencia(red)
+    with pytest.raises(ValueError):
+        sesion.agregar_evidencia(Y, 'no existe')
+    assert sesion.evidencia == {}
+    _comprobar(sesion, red)
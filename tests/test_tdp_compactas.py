@@ -0,0 +1,101 @@
+import copy
+import itertools
+
+import numpy as np
+import pytest
+
+import AproximadaBa
+import RedesBa
+from conftest import cerca, referencia, ruta_red
+
+CAUSAS = ['C0', 'C1', 'C2', 'C3']
+
+def _red_base(tdp):
+    red = RedesBa.crear_red_bayesiana()
+    for k, causa in enumerate(CAUSAS):
+        RedesBa.agregar_variable(red, causa, ['No', 'Si'])
+        RedesBa.establecer_probabilidad(red, causa, (), {'Si': 0.1 + 0.1 * k, 'No': 0.9 - 0.1 * k})
+    RedesBa.agregar_variable(red, 'Y', ['No', 'Si'])
+    RedesBa.establecer_padres(red, 'Y', CAUSAS)
+    RedesBa.establecer_tdp_compacta(red, 'Y', tdp)
+    RedesBa.agregar_variable(red, 'Z', ['a', 'b', 'c'])
+    RedesBa.establecer_padres(red, 'Z', ['Y', 'C0'])
+    RedesBa.establecer_tabla(red, 'Z', np.array([[[.2, .3, .5], [.1, .1, .8]], [[.6, .3, .1], [.3, .3, .4]]]))
+    return red
+
+def _expandida(red):
+    expandida = copy.deepcopy({k: red[k] for k in ('variables', 'valores', 'padres', 'TDP')})
+    RedesBa.establecer_tabla(expandida, 'Y', red['compactas']['Y'].tabla())
+    return expandida
+
+TDPS = {
+    'ruido_or': lambda: RedesBa.ruido_or({c: {'Si': 0.5 + 0.1 * k} for k, c in enumerate(CAUSAS)},
+                                         ('No', 'Si'), fuga=0.05),
+    'maximo': lambda: RedesBa.maximo_determinista({c: {'Si': 'Si'} for c in CAUSAS}),
+    'determinista': lambda: RedesBa.TDPDeterminista(lambda *v: 'Si' if v.count('Si') >= 2 else 'No'),
+    'arbol': lambda: RedesBa.TDPArbol({'padre': 'C0', 'ramas': {
+        'Si': {'Si': 0.9, 'No': 0.1},
+        '*': {'padre': 'C1', 'ramas': {'Si': {'Si': 0.6, 'No': 0.4}, 'No': {'Si': 0.05, 'No': 0.95}}}}}),
+    'reglas': lambda: RedesBa.TDPReglas([({'C1': 'Si', 'C2': 'No'}, {'Si': 0.7, 'No': 0.3}),
+                                         ({'C0': 'Si'}, {'Si': 0.9, 'No': 0.1})], {'Si': 0.05, 'No': 0.95}),
+}
+
+CONSULTAS = [('C0', {'Y': 'Si'}), ('C3', {'Y': 'No', 'Z': 'b'}), ('Y', {'C1': 'Si'}), ('Z', {}),
+             ('C2', {'Z': 'c', 'C0': 'No'})]
+
+@pytest.mark.parametrize('tipo', list(TDPS))
+def test_motores_con_tdp_compacta(tipo):
+    red = _red_base(TDPS[tipo]())
+    expandida = _expandida(red)
+    for X, e in CONSULTAS:
+        esperado = referencia(X, e, expandida)
+        for motor in RedesBa.MOTORES_FACTOR:
+            assert cerca(RedesBa.inferencia_eliminacion_variables(X, e, red, motor=motor), esperado)
+        assert cerca(RedesBa.inferencia_enumeracion(X, e, red), esperado)
+        assert cerca(RedesBa.inferencia_arbol_uniones(X, e, red), esperado)
+        fila = RedesBa.inferencia_lote(X, [e], red)[0]
+        assert np.allclose(fila, [esperado[v] for v in red['valores'][X]])
+        muestreo = AproximadaBa.ponderacion_verosimilitud(X, e, red, n_muestras=50000, semilla=0)
+        assert cerca(muestreo['distribucion'], esperado, 0.02)
+
+def _ruido_max_tres_valores():
+    tdp = RedesBa.TDPRuidoMax({'C0': {'Si': {'medio': 0.6, 'bajo': 0.4}},
+                               'C1': {'Si': {'alto': 0.3, 'medio': 0.3, 'bajo': 0.4}}},
+                              fuga={'bajo': 0.9, 'medio': 0.1}, orden=['bajo', 'medio', 'alto'])
+    valores = {'C0': ['No', 'Si'], 'C1': ['No', 'Si'], 'G': ['alto', 'bajo', 'medio']}
+    return tdp.vincular('G', ['C0', 'C1'], valores)
+
+@pytest.mark.parametrize('tipo', list(TDPS) + ['ruido_max'])
+def test_probabilidad_escalar_coincide_con_la_tabla(tipo):
+    tdp = _ruido_max_tres_valores() if tipo == 'ruido_max' else _red_base(TDPS[tipo]())['compactas']['Y']
+    tabla = tdp.tabla()
+    for celda in itertools.product(*[range(n) for n in tabla.shape]):
+        assert tdp.probabilidad(list(celda[:-1]), celda[-1]) == pytest.approx(tabla[celda])
+
+def test_ruido_or_por_definicion():
+    tdp = _red_base(TDPS['ruido_or']())['compactas']['Y']
+    tabla = tdp.tabla()
+    for comb in itertools.product([0, 1], repeat=len(CAUSAS)):
+        inactivo = 0.95 * np.prod([1 - (0.5 + 0.1 * k) for k, c in enumerate(comb) if c == 1])
+        assert tabla[comb + (0,)] == pytest.approx(inactivo)
+
+def test_reglas_aplican_la_primera_que_se_cumple():
+    tabla = _red_base(TDPS['reglas']())['compactas']['Y'].tabla()
+    # C0=Si, C1=Si, C2=No: gana la primera regla
+    assert tabla[1, 1, 0, 0, 1] == pytest.approx(0.7)
+    assert tabla[1, 0, 0, 0, 1] == pytest.approx(0.9)
+    assert tabla[0, 0, 1, 1, 1] == pytest.approx(0.05)
+
+@pytest.mark.parametrize('tipo', ['ruido_or', 'maximo', 'arbol', 'reglas'])
+def test_json_ida_y_vuelta(tipo, tmp_path):
+    red = _red_base(TDPS[tipo]())
+    ruta = str(tmp_path / 'red.json')
+    RedesBa.guardar_red(red, ruta)
+    copia = RedesBa.cargar_red(ruta)
+    assert np.allclose(copia['compactas']['Y'].tabla(), red['compactas']['Y'].tabla())
+
+def test_tdp_compacta_con_padre_ajeno(capsys):
+    red = RedesBa.cargar_red(ruta_red('Ejemplo_Alarma.json'))
+    RedesBa.establecer_tdp_compacta(red, 'Alarma', RedesBa.ruido_or({'JuanLlama': {'Si': 0.5}}, ('No', 'Si')))
+    assert 'ERROR' in capsys.readouterr().out
+    assert 'Alarma' not in red.get('compactas', {})
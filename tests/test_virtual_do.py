@@ -0,0 +1,131 @@
+import copy
+import itertools
+
+import numpy as np
+import pytest
+
+import AproximadaBa
+import RedesBa
+from conftest import cerca
+
+def _intervenida(red, do):
+    """
+    Red mutilada construida a mano con las funciones de edición.
+    """
+    mutilada = copy.deepcopy({k: red[k] for k in ('variables', 'valores', 'padres', 'TDP')})
+    for var, valor in do.items():
+        RedesBa.establecer_padres(mutilada, var, [])
+        RedesBa.establecer_probabilidad(mutilada, var, (), {v: float(v == valor) for v in red['valores'][var]})
+    return mutilada
+
+def _referencia(X, e, red, virtual, do):
+    """
+    P(X | e, virtual, do) sumando la conjunta completa de la red mutilada.
+    """
+    mutilada = _intervenida(red, do)
+    rc = RedesBa.compilar_red(mutilada)
+    e = {**e, **do}
+    Q = dict.fromkeys(red['valores'][X], 0.0)
+    for comb in itertools.product(*[red['valores'][v] for v in red['variables']]):
+        asignacion = dict(zip(red['variables'], comb))
+        if any(asignacion[k] != v for k, v in e.items()):
+            continue
+        codigos = [rc.codificar(v, asignacion[v]) for v in rc.variables]
+        p = 1.0
+        for i in range(len(rc.variables)):
+            p *= rc.probabilidad(i, codigos)
+        for var, pesos in virtual.items():
+            p *= pesos.get(asignacion[var], 0.0)
+        Q[asignacion[X]] += p
+    return RedesBa.normaliza(Q)
+
+def _casos(red):
+    variables = red['variables']
+    V, D = variables[-1], variables[1]
+    virtual = {V: {red['valores'][V][0]: 0.8, red['valores'][V][1]: 0.3}}
+    do = {D: red['valores'][D][0]}
+    otra = variables[2]
+    casos = []
+    for X in variables:
+        if X == D:
+            continue
+        casos.append((X, {}, virtual, {}))
+        casos.append((X, {}, {}, do))
+        casos.append((X, {}, virtual, do))
+        if X != otra:
+            casos.append((X, {otra: red['valores'][otra][0]}, virtual, do))
+    return casos
+
+def test_motores_exactos(red):
+    for X, e, virtual, do in _casos(red):
+        esperado = _referencia(X, e, red, virtual, do)
+        opciones = dict(virtual=virtual, do=do)
+        assert cerca(RedesBa.inferencia_enumeracion(X, e, red, **opciones), esperado)
+        assert cerca(RedesBa.inferencia_enumeracion(X, e, red, log=True, **opciones), esperado)
+        for motor in RedesBa.MOTORES_FACTOR:
+            assert cerca(RedesBa.inferencia_eliminacion_variables(X, e, red, motor=motor, **opciones), esperado)
+        assert cerca(RedesBa.inferencia_arbol_uniones(X, e, red, **opciones), esperado)
+        assert cerca(RedesBa.consulta_multiple([X], e, red, **opciones)[X], esperado)
+        conjunta = RedesBa.consulta_multiple([X], e, red, conjunta=True, **opciones)
+        assert cerca({x: p for (x,), p in conjunta.items()}, esperado)
+        fila = RedesBa.inferencia_lote(X, [e], red, **opciones)[0]
+        assert np.allclose(fila, [esperado[v] for v in red['valores'][X]])
+        sesion = RedesBa.SesionInferencia(red, e, **opciones)
+        assert cerca(sesion.posterior(X), esperado)
+
+def test_sesion_agrega_y_retira_evidencia_virtual(red):
+    X, _, virtual, do = _casos(red)[2]
+    sesion = RedesBa.SesionInferencia(red, do=do)
+    (V, pesos), = virtual.items()
+    sesion.agregar_evidencia_virtual(V, pesos)
+    assert cerca(sesion.posterior(X), _referencia(X, {}, red, virtual, do))
+    sesion.retirar_evidencia(V)
+    assert cerca(sesion.posterior(X), _referencia(X, {}, red, {}, do))
+
+def test_mpe_y_map_con_virtual_y_do(red):
+    X, e, virtual, do = _casos(red)[-1]
+    mutilada = _intervenida(red, do)
+    asignacion, p = RedesBa.mpe(e, red, virtual=virtual, do=do)
+    (V, pesos), = virtual.items()
+    completa = {**asignacion, **e, **do}
+    # P(asignación, e) en la red mutilada por la verosimilitud virtual
+    esperado = RedesBa.log_probabilidad_evidencia(completa, mutilada)
+    assert p == pytest.approx(np.exp(esperado) * pesos.get(completa[V], 0.0))
+    conjunta = RedesBa.consulta_multiple([X], e, red, conjunta=True, virtual=virtual, do=do)
+    mejor = max(conjunta, key=conjunta.get)
+    assert RedesBa.map_marginal([X], e, red, virtual=virtual, do=do)[0] == {X: mejor[0]}
+
+def test_log_probabilidad_con_virtual_y_do(red):
+    X, e, virtual, do = _casos(red)[-1]
+    mutilada = _intervenida(red, do)
+    (V, pesos), = virtual.items()
+    esperado = sum(np.exp(RedesBa.log_probabilidad_evidencia({**e, V: v}, mutilada)) * w for v, w in pesos.items())
+    assert RedesBa.log_probabilidad_evidencia(e, red, virtual=virtual, do=do) == pytest.approx(np.log(esperado))
+
+@pytest.mark.parametrize('muestreador', [AproximadaBa.muestreo_logico, AproximadaBa.ponderacion_verosimilitud,
+                                         AproximadaBa.muestreo_importancia_adaptativo], ids=lambda f: f.__name__)
+def test_muestreadores(red, muestreador):
+    for X, e, virtual, do in _casos(red)[-4:]:
+        resultado = muestreador(X, e, red, n_muestras=50000, semilla=0, virtual=virtual, do=do)
+        assert cerca(resultado['distribucion'], _referencia(X, e, red, virtual, do), 0.02)
+
+def test_gibbs(red):
+    X, e, virtual, do = _casos(red)[-1]
+    resultado = AproximadaBa.muestreo_gibbs(X, e, red, n_iteraciones=400, quemado=100, cadenas=2,
+                                            cadenas_por_proceso=32, procesos=1, semilla=0, virtual=virtual, do=do)
+    assert cerca(resultado['distribucion'], _referencia(X, e, red, virtual, do), 0.03)
+
+def test_propagacion_creencias(red):
+    X, e, virtual, do = _casos(red)[-1]
+    marginales = AproximadaBa.propagacion_creencias(e, red, virtual=virtual, do=do)['marginales']
+    assert cerca(marginales[X], _referencia(X, e, red, virtual, do), 0.1)
+
+def test_intervencion_en_cache(red):
+    D = red['variables'][1]
+    do = {D: red['valores'][D][0]}
+    assert RedesBa.intervenir(red, do) is RedesBa.intervenir(red, dict(do))
+    assert RedesBa.intervenir(red, {}) is RedesBa.compilar_red(red)
+    with pytest.raises(ValueError):
+        RedesBa.intervenir(red, {D: 'no existe'})
+    with pytest.raises(ValueError):
+        RedesBa.inferencia_eliminacion_variables(D, {}, red, virtual={D: [1.0]})